@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'core.middleware.CRMAccessMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
      "django_browser_reload.middleware.BrowserReloadMiddleware",
@@ -90,6 +91,17 @@ DATABASES = {
     }
 }
 
+# A cache shared by every process is required: the dashboard cache (crm_analytics.cache)
+# keeps its invalidation generations and hit counters in it, and they are bumped from the
+# snapshot management commands as well as from the web workers. The default is the database
+# cache, whose table is created on deploy with `python manage.py createcachetable` after
+# `migrate` (it skips tables that already exist; `check --database default` warns while it is
+# missing). Set CACHE_URL to e.g. redis://127.0.0.1:6379/1 to use Redis. Never use a
+# per-process cache such as locmem here.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://crm_cache'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -201,8 +213,32 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
-# increase file size limit to 2 gb
-DATA_UPLOAD_MAX_MEMORY_SIZE = 2147483648  # 2 GB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 2147483648  # 2 GB
+# Request bodies other than file uploads (form fields) are held in memory, up to 10 MB.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
+# Uploads larger than this are spooled to a temporary file instead of RAM, so
+# large CSV imports are streamed from disk; there is no limit on the file size itself.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5 MB
+FILE_UPLOAD_TEMP_DIR = env('FILE_UPLOAD_TEMP_DIR', default=None)
 # Maximum number of files that can be uploaded
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
+
+# Per-request query instrumentation (core.middleware.QueryBudgetMiddleware)
+QUERY_BUDGET_ENABLED = env.bool('QUERY_BUDGET_ENABLED', default=env.bool('DEBUG', default=False))
+QUERY_BUDGET_WARN_COUNT = 50
+QUERY_BUDGET_WARN_DUPLICATES = 5
+
+# Seconds an uploaded, unconfirmed data-tools import stays staged (crm_data_tools.staging)
+DATA_IMPORT_STAGING_TTL = 24 * 60 * 60
+
+# Validate and commit data-tools imports in the run_import_jobs worker instead of the request.
+# Off by default, so imports run inline. Only turn it on where a worker runs alongside the
+# web processes, e.g. `python manage.py run_import_jobs --interval 5`; without one every
+# confirmed import stays queued.
+DATA_IMPORT_IN_BACKGROUND = env.bool('DATA_IMPORT_IN_BACKGROUND', default=False)
+
+# Worker processes that parse a large data-tools import in parallel (crm_data_tools.validation)
+DATA_IMPORT_VALIDATION_WORKERS = env.int('DATA_IMPORT_VALIDATION_WORKERS', default=os.cpu_count() or 1)
+
+# Territory level (division, region or area) MRs are ranked within for working_efficiency_score
+# (crm_analytics.scoring). Read by the snapshot refresh and score_mr_efficiency alike.
+MR_EFFICIENCY_TERRITORY = env('MR_EFFICIENCY_TERRITORY', default='region')
@@ -40,8 +40,13 @@ CRM_ANALYTICS_PERMISSION_RULES = {
     'doctor_performance': 'crm_analytics.view_doctorperformancesnapshot',
     'distributor_performance': 'crm_analytics.view_distributorperformancesnapshot',
     'product_performance': 'crm_analytics.view_productperformancesnapshot',
+    'mr_performance_export': 'crm_analytics.view_mrperformancesnapshot',
+    'doctor_performance_export': 'crm_analytics.view_doctorperformancesnapshot',
+    'distributor_performance_export': 'crm_analytics.view_distributorperformancesnapshot',
+    'product_performance_export': 'crm_analytics.view_productperformancesnapshot',
     'expiry_alerts': 'crm_analytics.view_expiryalert',
     'acknowledge_alert': 'crm_analytics.change_expiryalert',
+    'acknowledge_alerts_bulk': 'crm_analytics.change_expiryalert',
     'crm_user_list': 'auth.view_user',
     'crm_user_create': 'auth.add_user',
     'crm_user_edit': 'auth.change_user',
@@ -151,6 +156,12 @@ def _resolve_crm_permission_from_route(request):
 
 
 def get_crm_permission_groups():
+    # One query for every permission in the CRM apps, then dict lookups.
+    app_labels = {item['app_label'] for section in CRM_ROLE_PERMISSION_GROUPS for item in section['items']}
+    available = {}
+    for perm in Permission.objects.filter(content_type__app_label__in=app_labels).select_related('content_type'):
+        available.setdefault((perm.content_type.app_label, perm.codename), perm)
+
     grouped = []
     for section in CRM_ROLE_PERMISSION_GROUPS:
         section_items = []
@@ -158,10 +169,7 @@ def get_crm_permission_groups():
             perms = {}
             for action in ('view', 'add', 'change', 'delete'):
                 codename = f'{action}_{item["model"]}'
-                perm = Permission.objects.filter(
-                    content_type__app_label=item['app_label'],
-                    codename=codename,
-                ).first()
+                perm = available.get((item['app_label'], codename))
                 if perm:
                     perms[action] = perm
 
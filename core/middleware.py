@@ -1,6 +1,14 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
 
 from core.auth_utils import is_crm_user
+from core.query_budget import QueryRecorder
+
+
+logger = logging.getLogger('core.query_budget')
 
 
 class CRMAccessMiddleware:
@@ -13,3 +21,36 @@ class CRMAccessMiddleware:
             if not request.user.is_authenticated or not is_crm_user(request.user):
                 return redirect('crm_analytics:crm_login')
         return self.get_response(request)
+
+
+class QueryBudgetMiddleware:
+    """
+    Records query count, SQL time and repeated query fingerprints for every
+    request, reports them as X-Query-* response headers and logs a warning
+    when a request exceeds QUERY_BUDGET_WARN_COUNT queries or repeats one
+    fingerprint QUERY_BUDGET_WARN_DUPLICATES times.
+
+    Enabled by QUERY_BUDGET_ENABLED (defaults to DEBUG). Queries run while a
+    streaming response is consumed happen after the middleware returns and
+    are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.warn_count = getattr(settings, 'QUERY_BUDGET_WARN_COUNT', 50)
+        self.warn_duplicates = getattr(settings, 'QUERY_BUDGET_WARN_DUPLICATES', 5)
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        duplicates = recorder.duplicates()
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time-Ms'] = f'{recorder.total_ms:.1f}'
+        response['X-Query-Duplicates'] = str(len(duplicates))
+
+        if recorder.count > self.warn_count or (duplicates and duplicates[0][1] >= self.warn_duplicates):
+            logger.warning('%s %s: %s', request.method, request.path, recorder.summary())
+        return response
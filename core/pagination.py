@@ -0,0 +1,172 @@
+"""
+Keyset (seek) pagination for large CRM lists.
+
+``django.core.paginator.Paginator`` runs ``COUNT(*)`` and then
+``OFFSET n``, so deep pages get linearly slower. ``KeysetPaginator``
+instead filters on the ordering columns of the last row it returned:
+
+    paginator = KeysetPaginator(qs, ('-visit_date', '-visit_time', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
+
+The ordering must end in a unique column (normally ``id``/``-id``) and must
+only name non-nullable local fields. Cursors are signed, so they are opaque
+to clients and cannot be forged into arbitrary filters.
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+DEFAULT_COUNT_LIMIT = 10000
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def approximate_count(queryset, limit=DEFAULT_COUNT_LIMIT):
+    """
+    Count at most ``limit`` rows. Returns ``(count, exact)``; ``exact`` is
+    False when there are more than ``limit`` rows and ``count == limit``.
+    """
+    count = queryset.order_by().values('pk')[:limit + 1].count()
+    if count > limit:
+        return limit, False
+    return count, True
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page=20, approximate_total=False, count_limit=DEFAULT_COUNT_LIMIT):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.approximate_total = approximate_total
+        self.count_limit = count_limit
+        self._fields = [
+            (name.lstrip('-'), name.startswith('-'), queryset.model._meta.get_field(name.lstrip('-')))
+            for name in self.ordering
+        ]
+        self._total = None
+
+    # ------------------------------------------------------------
+    # Totals
+    # ------------------------------------------------------------
+
+    def _count(self):
+        if self._total is None:
+            if self.approximate_total:
+                self._total = approximate_count(self.queryset, self.count_limit)
+            else:
+                self._total = (self.queryset.count(), True)
+        return self._total
+
+    @property
+    def total(self):
+        return self._count()[0]
+
+    @property
+    def total_is_exact(self):
+        return self._count()[1]
+
+    # ------------------------------------------------------------
+    # Cursors
+    # ------------------------------------------------------------
+
+    def _encode(self, obj, direction):
+        values = [_json_value(getattr(obj, field.attname)) for _, _, field in self._fields]
+        return signing.dumps({'d': direction, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            values = payload['v']
+            if payload['d'] not in ('next', 'prev') or len(values) != len(self._fields):
+                return None
+            return payload['d'], [field.to_python(value) for (_, _, field), value in zip(self._fields, values)]
+        except (signing.BadSignature, KeyError, TypeError, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        """
+        Rows strictly after ``values`` in the ordering (or before them when
+        ``forward`` is False): (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        for i, (name, descending, _) in enumerate(self._fields):
+            after = descending != forward
+            clause = Q(**{prev_name: values[j] for j, (prev_name, _, _) in enumerate(self._fields[:i])})
+            clause &= Q(**{f'{name}__{"gt" if after else "lt"}': values[i]})
+            condition |= clause
+        return condition
+
+    # ------------------------------------------------------------
+    # Pages
+    # ------------------------------------------------------------
+
+    def get_page(self, cursor=None):
+        """Return the page after / before ``cursor``; the first page when it is missing or invalid."""
+        decoded = self._decode(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(
+                rows, self,
+                next_cursor=self._encode(rows[-1], 'next') if more else None,
+            )
+
+        direction, values = decoded
+        if direction == 'next':
+            qs = self.queryset.filter(self._seek(values, forward=True)).order_by(*self.ordering)
+            rows = list(qs[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(
+                rows, self,
+                next_cursor=self._encode(rows[-1], 'next') if more else None,
+                previous_cursor=self._encode(rows[0], 'prev') if rows else None,
+            )
+
+        reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        qs = self.queryset.filter(self._seek(values, forward=False)).order_by(*reversed_ordering)
+        rows = list(qs[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(
+            rows, self,
+            next_cursor=self._encode(rows[-1], 'next') if rows else None,
+            previous_cursor=self._encode(rows[0], 'prev') if more else None,
+        )
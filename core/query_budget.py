@@ -0,0 +1,94 @@
+"""
+Per-request SQL instrumentation.
+
+``QueryRecorder`` hooks every database connection with an execute wrapper
+and records each statement's SQL and duration:
+
+    with QueryRecorder() as recorder:
+        ...
+    recorder.count, recorder.total_ms, recorder.duplicates()
+
+Duplicates are grouped by fingerprint — the SQL with parameters left as
+placeholders, whitespace collapsed and ``IN (%s, %s, ...)`` lists folded —
+so the same query run once per row of a list (an N+1) shows up as one
+fingerprint with a high count.
+
+``QueryBudgetMiddleware`` (core/middleware.py) wraps every request in a
+recorder; ``assert_max_queries`` is the test-side equivalent.
+"""
+
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _LITERAL.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []           # (alias, sql, duration_ms)
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._wrapper(alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append((alias, sql, (time.perf_counter() - started) * 1000))
+        return record
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self, minimum=2):
+        """``[(fingerprint, count)]`` run at least ``minimum`` times, most repeated first."""
+        counts = Counter(fingerprint(sql) for _, sql, _ in self.queries)
+        return [(sql, n) for sql, n in counts.most_common() if n >= minimum]
+
+    def summary(self):
+        duplicates = self.duplicates()
+        lines = [f'{self.count} queries, {self.total_ms:.1f} ms SQL, {len(duplicates)} repeated fingerprint(s)']
+        lines += [f'  {n}× {sql[:200]}' for sql, n in duplicates[:10]]
+        return '\n'.join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(limit, using=None):
+    """Fail with the recorder summary when the block runs more than ``limit`` queries."""
+    with QueryRecorder(using) as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise QueryBudgetExceeded(f'Query budget of {limit} exceeded: {recorder.summary()}')
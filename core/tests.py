@@ -1,3 +1,450 @@
-from django.test import TestCase
+from datetime import time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from crm_analytics.models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                                  DistributorPerformanceSnapshot, ProductPerformanceSnapshot,
+                                  ExpiryAlert)
+from crm_distributors.models import Distributor, DistributorSalesValue, DistributorStockEntry
+from crm_doctors.models import (CompetitorInfo, Doctor, DoctorInvestment, DoctorPracticeLocation,
+                                DoctorVisit, PharmacyReference, VisitProductDetail)
+from crm_products.models import BatchManagement, CompanyStock, Division, ProductMaster
+from crm_products.stock_positions import refresh_stock_positions
+from crm_sales.models import Area, MedicalRepresentative, Region
+from crm_stores.models import MedicalStore, StoreProductTracking
+
+from .pagination import KeysetPaginator, approximate_count
+from .query_budget import QueryRecorder, assert_max_queries, fingerprint
+
+
+CRM_NAMESPACES = (
+    'crm_analytics', 'crm_data_tools', 'crm_products', 'crm_distributors',
+    'crm_sales', 'crm_doctors', 'crm_stores',
+)
+
+# Maximum queries for a GET of every CRM URL against CRMVolumeFixtures.
+# The fixture has enough rows per list / detail page that a per-row query
+# blows the budget; raise a number only together with the view change that
+# needs it.
+CRM_URL_QUERY_BUDGETS = {
+    'crm_analytics:dashboard': 40,
+    'crm_analytics:crm_login': 4,
+    'crm_analytics:crm_logout': 6,
+    'crm_analytics:crm_user_list': 6,
+    'crm_analytics:crm_user_create': 5,
+    'crm_analytics:crm_user_edit': 7,
+    'crm_analytics:crm_user_delete': 5,
+    'crm_analytics:crm_role_list': 5,
+    'crm_analytics:crm_role_create': 6,
+    'crm_analytics:crm_role_edit': 8,
+    'crm_analytics:crm_role_delete': 5,
+    'crm_analytics:mr_performance': 7,
+    'crm_analytics:doctor_performance': 7,
+    'crm_analytics:distributor_performance': 7,
+    'crm_analytics:product_performance': 6,
+    'crm_analytics:mr_performance_export': 5,
+    'crm_analytics:doctor_performance_export': 5,
+    'crm_analytics:distributor_performance_export': 5,
+    'crm_analytics:product_performance_export': 5,
+    'crm_analytics:expiry_alerts': 7,
+    'crm_analytics:acknowledge_alert': 5,
+    'crm_analytics:acknowledge_alerts_bulk': 4,
+    'crm_data_tools:export': 6,
+    'crm_data_tools:sample': 4,
+    'crm_data_tools:import': 4,
+    'crm_data_tools:import_preview': 5,
+    'crm_data_tools:import_status': 4,
+    'crm_products:division_list': 7,
+    'crm_products:division_create': 4,
+    'crm_products:division_edit': 5,
+    'crm_products:division_delete': 5,
+    'crm_products:product_list': 10,
+    'crm_products:product_create': 5,
+    'crm_products:product_detail': 8,
+    'crm_products:product_edit': 6,
+    'crm_products:product_delete': 5,
+    'crm_products:batch_list': 16,
+    'crm_products:batch_create': 5,
+    'crm_products:batch_detail': 6,
+    'crm_products:batch_edit': 6,
+    'crm_products:batch_delete': 5,
+    'crm_products:stock_list': 8,
+    'crm_products:stock_create': 6,
+    'crm_products:stock_edit': 9,
+    'crm_products:stock_delete': 7,
+    'crm_distributors:distributor_list': 9,
+    'crm_distributors:distributor_create': 4,
+    'crm_distributors:distributor_detail': 8,
+    'crm_distributors:distributor_edit': 7,
+    'crm_distributors:distributor_delete': 5,
+    'crm_distributors:stock_entry_list': 8,
+    'crm_distributors:stock_entry_create': 7,
+    'crm_distributors:stock_entry_detail': 8,
+    'crm_distributors:stock_entry_edit': 9,
+    'crm_distributors:stock_entry_delete': 7,
+    'crm_distributors:sales_value_list': 8,
+    'crm_distributors:sales_value_create': 6,
+    'crm_distributors:sales_value_delete': 7,
+    'crm_sales:region_list': 8,
+    'crm_sales:region_create': 5,
+    'crm_sales:region_edit': 8,
+    'crm_sales:region_delete': 5,
+    'crm_sales:area_list': 9,
+    'crm_sales:area_create': 5,
+    'crm_sales:area_edit': 8,
+    'crm_sales:area_delete': 5,
+    'crm_sales:mr_list': 9,
+    'crm_sales:mr_create': 8,
+    'crm_sales:mr_detail': 14,
+    'crm_sales:mr_edit': 9,
+    'crm_sales:mr_delete': 5,
+    'crm_doctors:doctor_list': 10,
+    'crm_doctors:doctor_create': 6,
+    'crm_doctors:doctor_detail': 15,
+    'crm_doctors:doctor_edit': 9,
+    'crm_doctors:doctor_delete': 5,
+    'crm_doctors:doctor_locations_api': 5,
+    'crm_doctors:doctor_last_visit_api': 10,
+    'crm_doctors:visit_list': 11,
+    'crm_doctors:visit_create': 8,
+    'crm_doctors:visit_detail': 10,
+    'crm_doctors:visit_edit': 15,
+    'crm_doctors:visit_delete': 7,
+    'crm_stores:store_list': 8,
+    'crm_stores:store_create': 7,
+    'crm_stores:store_detail': 10,
+    'crm_stores:store_edit': 9,
+    'crm_stores:store_delete': 5,
+    'crm_stores:store_product_add': 5,
+}
+
+
+class CRMVolumeFixtures:
+    """A CRM dataset with dozens of rows behind every list and detail page."""
+
+    MRS = 12
+    DOCTORS = 12
+    VISITS_PER_DOCTOR = 15
+    PRODUCTS = 10
+    DISTRIBUTORS = 6
+    STORES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        today = timezone.localdate()
+        month = today.replace(day=1)
+
+        divisions = [Division.objects.create(name=f'Division {i}') for i in range(3)]
+        regions = []
+        for i in range(4):
+            region = Region.objects.create(region_name=f'Region {i}')
+            region.division.set(divisions[:2])
+            regions.append(region)
+        areas = []
+        for i in range(6):
+            area = Area.objects.create(area_name=f'Area {i}')
+            area.region.set(regions[:2])
+            areas.append(area)
+
+        mrs = [
+            MedicalRepresentative.objects.create(
+                name=f'MR {i}', cnic=f'35202-000000{i:02d}-1', phone_number='0300',
+                division=divisions[i % 3], region=regions[i % 4], area=areas[i % 6],
+            )
+            for i in range(cls.MRS)
+        ]
+        products = [
+            ProductMaster.objects.create(
+                product_name=f'Product {i}', generic_name='Generic', brand_name='Brand',
+                category='tablet', strength='500mg', packing_size='10x10', division=divisions[i % 3],
+            )
+            for i in range(cls.PRODUCTS)
+        ]
+        batches = BatchManagement.objects.bulk_create([
+            BatchManagement(
+                batch_number=f'B{i:03d}', product=products[i % cls.PRODUCTS],
+                manufacturing_date=today - timedelta(days=200),
+                expiry_date=today + timedelta(days=20 * i),
+                quantity_manufactured=1000, quantity_sent_to_distributors=100 * (i % 10),
+            )
+            for i in range(2 * cls.PRODUCTS)
+        ])
+        CompanyStock.objects.bulk_create([
+            CompanyStock(product=batch.product, batch=batch, low_stock_threshold=950)
+            for batch in batches
+        ])
+        refresh_stock_positions()
+
+        doctors = [
+            Doctor.objects.create(
+                doctor_name=f'Doctor {i}', specialty='GP', city='Lahore', area=areas[i % 6],
+            )
+            for i in range(cls.DOCTORS)
+        ]
+        for doctor in doctors:
+            doctor.assigned_mrs.set(mrs[:3])
+        DoctorPracticeLocation.objects.bulk_create([
+            DoctorPracticeLocation(doctor=doctor, location_name=f'Clinic {i}')
+            for doctor in doctors for i in range(3)
+        ])
+        visits = DoctorVisit.objects.bulk_create([
+            DoctorVisit(
+                mr=mrs[(d + v) % cls.MRS], doctor=doctor,
+                visit_date=today - timedelta(days=v), visit_time=time(10, 0),
+                is_gps_verified=v % 2 == 0,
+            )
+            for d, doctor in enumerate(doctors) for v in range(cls.VISITS_PER_DOCTOR)
+        ])
+        VisitProductDetail.objects.bulk_create([
+            VisitProductDetail(visit=visit, product=products[(i + j) % cls.PRODUCTS], samples_given=2)
+            for i, visit in enumerate(visits) for j in range(2)
+        ])
+        DoctorInvestment.objects.bulk_create([
+            DoctorInvestment(visit=visit, investment_type='cash', amount=Decimal('500.00'))
+            for visit in visits
+        ])
+        CompetitorInfo.objects.bulk_create([
+            CompetitorInfo(visit=visit, competitor_product_name='Rival', competitor_company='Rival Co')
+            for visit in visits[:20]
+        ])
+        PharmacyReference.objects.bulk_create([
+            PharmacyReference(visit=visit, store_name='Pharmacy') for visit in visits[:20]
+        ])
+
+        distributors = [
+            Distributor.objects.create(
+                distributor_name=f'Distributor {i}', owner_name='Owner', contact_number='0300',
+                address='Street', city='Lahore', region='Punjab', license_number=f'LIC-{i}',
+            )
+            for i in range(cls.DISTRIBUTORS)
+        ]
+        DistributorStockEntry.objects.bulk_create([
+            DistributorStockEntry(
+                distributor=distributor, product=products[i % cls.PRODUCTS], batch=batches[i % len(batches)],
+                opening_stock=100, received_quantity=50, sold_quantity=80, unsold_quantity=70,
+                report_period_start=month, report_period_end=today,
+            )
+            for distributor in distributors for i in range(15)
+        ])
+        DistributorSalesValue.objects.bulk_create([
+            DistributorSalesValue(
+                distributor=distributor, product=products[i % cls.PRODUCTS],
+                quantity_sold=10 + i, price_per_unit=Decimal('12.50'), sale_date=today - timedelta(days=i),
+            )
+            for distributor in distributors for i in range(30)
+        ])
+
+        stores = [
+            MedicalStore.objects.create(
+                store_name=f'Store {i}', owner_name='Owner', address='Street', area=areas[i % 6],
+            )
+            for i in range(cls.STORES)
+        ]
+        StoreProductTracking.objects.bulk_create([
+            StoreProductTracking(store=store, product=product)
+            for store in stores for product in products
+        ])
+
+        MRPerformanceSnapshot.objects.bulk_create([
+            MRPerformanceSnapshot(mr=mr, snapshot_month=month, total_visits=10) for mr in mrs
+        ])
+        DoctorPerformanceSnapshot.objects.bulk_create([
+            DoctorPerformanceSnapshot(doctor=doctor, snapshot_month=month, total_visits_received=5)
+            for doctor in doctors
+        ])
+        DistributorPerformanceSnapshot.objects.bulk_create([
+            DistributorPerformanceSnapshot(distributor=distributor, snapshot_month=month, total_units_sold=40)
+            for distributor in distributors
+        ])
+        ProductPerformanceSnapshot.objects.bulk_create([
+            ProductPerformanceSnapshot(product=product, distributor=distributor, snapshot_month=month, units_sold=5)
+            for product in products for distributor in distributors
+        ])
+        ExpiryAlert.objects.bulk_create([
+            ExpiryAlert(
+                alert_type='3_months', source='batch', product=batch.product, batch_number=batch.batch_number,
+                expiry_date=batch.expiry_date, quantity_at_risk=10, recipient='admin',
+            )
+            for batch in batches
+        ])
+
+        role = cls.user.groups.create(name='CRM - Managers')
+        cls.objects = {
+            'division': divisions[0], 'region': regions[0], 'area': areas[0], 'mr': mrs[0],
+            'product': products[0], 'batch': batches[0], 'stock': CompanyStock.objects.first(),
+            'distributor': distributors[0], 'stock_entry': DistributorStockEntry.objects.first(),
+            'sales_value': DistributorSalesValue.objects.first(), 'doctor': doctors[0],
+            'visit': visits[0], 'store': stores[0], 'alert': ExpiryAlert.objects.first(),
+            'user': cls.user, 'role': role,
+        }
+
+    def setUp(self):
+        cache.clear()
+
+
+def _crm_url_names():
+    names = []
+    resolver = get_resolver()
+    for namespace in CRM_NAMESPACES:
+        _, sub_resolver = resolver.namespace_dict[namespace]
+        names += [
+            f'{namespace}:{pattern.name}'
+            for pattern in sub_resolver.url_patterns if pattern.name
+        ]
+    return names
+
+
+class QueryRecorderTests(TestCase):
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT  *\nFROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = \'a\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "x" = ? LIMIT ?',
+        )
+
+    def test_recorder_counts_duplicate_fingerprints(self):
+        Division.objects.create(name='North')
+        with QueryRecorder() as recorder:
+            for _ in range(3):
+                list(Division.objects.filter(pk=1))
+            Division.objects.count()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual([n for _, n in recorder.duplicates()], [3])
+        self.assertGreaterEqual(recorder.total_ms, 0)
+
+    def test_assert_max_queries_reports_summary(self):
+        with self.assertRaisesMessage(AssertionError, 'Query budget of 1 exceeded: 2 queries'):
+            with assert_max_queries(1):
+                Division.objects.count()
+                Division.objects.count()
+
+
+class KeysetPaginatorTests(TestCase):
+    ORDERING = ('specialty', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        # Three specialties over 11 doctors, so pages break inside runs of equal sort keys.
+        for i in range(11):
+            Doctor.objects.create(doctor_name=f'Doctor {i}', specialty='ABC'[i % 3], city='Lahore')
+
+    def _paginator(self, **kwargs):
+        return KeysetPaginator(Doctor.objects.all(), self.ORDERING, per_page=4, **kwargs)
+
+    def _pks(self, page):
+        return [doctor.pk for doctor in page]
+
+    def test_pages_forward_and_back_cover_every_row_once(self):
+        expected = list(Doctor.objects.order_by(*self.ORDERING).values_list('pk', flat=True))
+        paginator = self._paginator()
+
+        pages = [paginator.get_page()]
+        self.assertFalse(pages[0].has_previous())
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertEqual([pk for page in pages for pk in self._pks(page)], expected)
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.get_page(backwards[-1].previous_cursor))
+        self.assertEqual([self._pks(page) for page in reversed(backwards)], [self._pks(page) for page in pages])
+        self.assertFalse(backwards[-1].has_previous())
+        self.assertEqual(paginator.total, 11)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = self._paginator()
+        first = self._pks(paginator.get_page())
+        cursor = paginator.get_page().next_cursor
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+
+        for bad in (tampered, 'not-a-cursor', cursor + ':x'):
+            with self.subTest(cursor=bad):
+                page = paginator.get_page(bad)
+                self.assertEqual(self._pks(page), first)
+                self.assertFalse(page.has_previous())
+        # A cursor signed for a different ordering does not match this one's fields.
+        other = KeysetPaginator(Doctor.objects.all(), ('-id',), per_page=4).get_page().next_cursor
+        self.assertEqual(self._pks(paginator.get_page(other)), first)
+
+    def test_approximate_count_caps_at_the_limit(self):
+        self.assertEqual(approximate_count(Doctor.objects.all(), limit=5), (5, False))
+        self.assertEqual(approximate_count(Doctor.objects.all(), limit=11), (11, True))
+        self.assertEqual(approximate_count(Doctor.objects.filter(specialty='A'), limit=5), (4, True))
+        self.assertEqual(approximate_count(Doctor.objects.filter(specialty='A'), limit=3), (3, False))
+
+        paginator = KeysetPaginator(
+            Doctor.objects.filter(specialty='B'), self.ORDERING, approximate_total=True, count_limit=3,
+        )
+        self.assertEqual((paginator.total, paginator.total_is_exact), (3, False))
+
+
+# Budgets count the views' own queries, not the shared database cache's.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CRMQueryBudgetTests(CRMVolumeFixtures, TestCase):
+    URL_KWARGS = {
+        'crm_analytics:crm_user_edit': {'id': 'user'},
+        'crm_analytics:crm_user_delete': {'id': 'user'},
+        'crm_analytics:crm_role_edit': {'id': 'role'},
+        'crm_analytics:crm_role_delete': {'id': 'role'},
+        'crm_analytics:acknowledge_alert': {'pk': 'alert'},
+        'crm_doctors:doctor_locations_api': {'doctor_id': 'doctor'},
+        'crm_doctors:doctor_last_visit_api': {'doctor_id': 'doctor'},
+        'crm_stores:store_product_add': {'store_pk': 'store'},
+    }
+
+    def _kwargs(self, name):
+        if name.startswith('crm_data_tools:'):
+            return {'model_key': 'doctor'}
+        if name in self.URL_KWARGS:
+            return {key: self.objects[obj].pk for key, obj in self.URL_KWARGS[name].items()}
+        pattern = next(
+            p for p in get_resolver().namespace_dict[name.split(':')[0]][1].url_patterns
+            if p.name == name.split(':')[1]
+        )
+        if 'pk' not in pattern.pattern.converters:
+            return {}
+        url_name = name.split(':')[1]
+        for prefix in sorted(self.objects, key=len, reverse=True):
+            if url_name.startswith(f'{prefix}_'):
+                return {'pk': self.objects[prefix].pk}
+        raise AssertionError(f'No fixture object for {name}')
+
+    def test_every_crm_url_has_a_budget(self):
+        self.assertEqual(sorted(set(_crm_url_names()) - set(CRM_URL_QUERY_BUDGETS)), [])
+
+    def test_crm_urls_stay_within_query_budget(self):
+        for name, budget in CRM_URL_QUERY_BUDGETS.items():
+            with self.subTest(url=name):
+                # crm_logout ends the session, so log in again for every URL.
+                self.client.force_login(self.user)
+                url = reverse(name, kwargs=self._kwargs(name))
+                with assert_max_queries(budget):
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 500)
+
+    def test_paginated_lists_have_a_fixed_order(self):
+        # A GROUP BY drops Meta.ordering; an unordered queryset pages unstably.
+        self.client.force_login(self.user)
+        checked = []
+        for name in CRM_URL_QUERY_BUDGETS:
+            if name == 'crm_analytics:crm_logout':
+                continue
+            response = self.client.get(reverse(name, kwargs=self._kwargs(name)))
+            page = response.context.get('page_obj') if response.context else None
+            object_list = getattr(getattr(page, 'paginator', None), 'object_list', None)
+            if isinstance(object_list, QuerySet):
+                with self.subTest(url=name):
+                    self.assertTrue(object_list.ordered)
+                checked.append(name)
+        self.assertIn('crm_sales:mr_list', checked)
+        self.assertIn('crm_stores:store_list', checked)
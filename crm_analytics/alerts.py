@@ -0,0 +1,171 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/alerts.py
+# Expiry alert generation.
+# Stock lines are bucketed into expiry windows with a CASE expression in
+# SQL and read back as plain tuples; lines with an unacknowledged alert
+# for the same dedupe_key are filtered out by the same query, and the rest are written
+# with bulk_create. No BatchManagement / DistributorStockEntry instance
+# is ever loaded.
+# ============================================================
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (CharField, Case, Exists, F, IntegerField, OuterRef,
+                              Subquery, Value, When)
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.utils import timezone
+
+from crm_distributors.models import DistributorStockEntry
+from crm_products.models import BatchManagement
+
+from .cache import invalidate_live
+from .models import ExpiryAlert
+
+
+BATCH_SIZE = 2000
+
+# (alert_type, days until expiry); the first window that matches wins.
+EXPIRY_WINDOWS = [
+    ('expired', 0),
+    ('1_month', 30),
+    ('3_months', 90),
+    ('6_months', 180),
+]
+
+RECIPIENTS = {
+    'batch': 'admin',
+    'distributor_stock': 'distributor',
+}
+
+
+def _alert_type_expression(today, field):
+    return Case(
+        *[
+            When(**{f'{field}__lte': today + timedelta(days=days)}, then=Value(alert_type))
+            for alert_type, days in EXPIRY_WINDOWS
+        ],
+        default=Value(''),
+        output_field=CharField(),
+    )
+
+
+def _dedupe_key_expression(source, batch_number_field, distributor_field=None):
+    distributor = (
+        Coalesce(Cast(distributor_field, CharField()), Value(''))
+        if distributor_field else Value('')
+    )
+    return Concat(
+        Value(f'{source}:'), F(batch_number_field),
+        Value(':'), distributor,
+        Value(':'), F('alert_type'),
+        output_field=CharField(),
+    )
+
+
+def _not_yet_alerted():
+    return ~Exists(ExpiryAlert.objects.filter(dedupe_key=OuterRef('dedupe_key'), is_acknowledged=False))
+
+
+def batch_alert_rows(today):
+    """Company-held quantity of every batch expiring within the widest window."""
+    horizon = today + timedelta(days=EXPIRY_WINDOWS[-1][1])
+    return (
+        BatchManagement.objects
+        .filter(expiry_date__lte=horizon, quantity_manufactured__gt=F('quantity_sent_to_distributors'))
+        .annotate(
+            alert_type=_alert_type_expression(today, 'expiry_date'),
+            quantity=F('quantity_manufactured') - F('quantity_sent_to_distributors'),
+            dedupe_key=_dedupe_key_expression('batch', 'batch_number'),
+        )
+        .filter(_not_yet_alerted())
+        .order_by()
+        .values_list('product_id', 'batch_number', 'expiry_date', 'quantity', 'alert_type', 'dedupe_key')
+    )
+
+
+def distributor_stock_alert_rows(today):
+    """
+    Closing stock from the latest report per (distributor, batch) whose
+    batch expires within the widest window.
+    """
+    horizon = today + timedelta(days=EXPIRY_WINDOWS[-1][1])
+    latest_report = (
+        DistributorStockEntry.objects
+        .filter(distributor_id=OuterRef('distributor_id'), batch_id=OuterRef('batch_id'))
+        .order_by('-report_period_end', '-id')
+        .values('id')[:1]
+    )
+    return (
+        DistributorStockEntry.objects
+        .filter(batch__isnull=False, batch__expiry_date__lte=horizon, unsold_quantity__gt=0)
+        .filter(id=Subquery(latest_report, output_field=IntegerField()))
+        .annotate(
+            alert_type=_alert_type_expression(today, 'batch__expiry_date'),
+            dedupe_key=_dedupe_key_expression('distributor_stock', 'batch__batch_number', 'distributor_id'),
+        )
+        .filter(_not_yet_alerted())
+        .order_by()
+        .values_list('product_id', 'batch__batch_number', 'batch__expiry_date', 'unsold_quantity',
+                     'alert_type', 'dedupe_key', 'distributor_id')
+    )
+
+
+def _write(source, rows):
+    created = 0
+    pending = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        product_id, batch_number, expiry_date, quantity, alert_type, dedupe_key, *distributor = row
+        pending.append(ExpiryAlert(
+            alert_type=alert_type,
+            source=source,
+            product_id=product_id,
+            batch_number=batch_number,
+            expiry_date=expiry_date,
+            quantity_at_risk=quantity,
+            distributor_id=distributor[0] if distributor else None,
+            recipient=RECIPIENTS[source],
+            dedupe_key=dedupe_key,
+        ))
+        if len(pending) >= BATCH_SIZE:
+            created += _flush(pending)
+            pending = []
+    if pending:
+        created += _flush(pending)
+    return created
+
+
+def _flush(alerts):
+    """
+    Insert ``alerts`` and return how many rows were actually written.
+    ignore_conflicts covers a concurrent run inserting the same keys; the
+    rows it skips are not counted.
+    """
+    existing = ExpiryAlert.objects.filter(
+        dedupe_key__in=[alert.dedupe_key for alert in alerts], is_acknowledged=False,
+    )
+    before = existing.count()
+    ExpiryAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return existing.count() - before
+
+
+def generate_expiry_alerts(today=None, sources=None):
+    """
+    Create the missing expiry alerts for batches and distributor stock.
+    Returns ``{source: alerts_created}``.
+    """
+    today = today or timezone.localdate()
+    builders = {
+        'batch': batch_alert_rows,
+        'distributor_stock': distributor_stock_alert_rows,
+    }
+
+    results = {}
+    with transaction.atomic():
+        for source, build in builders.items():
+            if sources and source not in sources:
+                continue
+            results[source] = _write(source, build(today))
+    if any(results.values()):
+        invalidate_live()
+    return results
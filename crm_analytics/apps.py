@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CrmAnalyticsConfig(AppConfig):
     name = 'crm_analytics'
+
+    def ready(self):
+        from . import cache, signals  # noqa: F401
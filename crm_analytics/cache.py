@@ -0,0 +1,189 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/cache.py
+# Dashboard context cache.
+# Entries are keyed per (section, scope, month, permission set) and carry
+# a generation number in the key, so invalidation is a single cache.incr:
+#   - the "live" generation is bumped by any write to crm_doctors,
+#     crm_products, crm_distributors or ExpiryAlert; it covers the current
+#     month, the all-data scope and the master-data counters.
+#   - each closed month has its own generation, bumped only when the
+#     snapshot refresher / rebuild touches that month.
+# Generations are bumped from the snapshot management commands as well as
+# from web workers, so the default cache must be shared by every process
+# (settings.CACHES; checked by check_shared_cache below).
+# ============================================================
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.checks import Tags, Warning, register
+from django.db import connections, router
+from django.utils import timezone
+
+
+KEY_PREFIX = 'crm_dashboard'
+
+LIVE_TIMEOUT = 5 * 60              # current month, all-data scope, master counters
+CLOSED_MONTH_TIMEOUT = 30 * 24 * 60 * 60
+
+INVALIDATING_APPS = ('crm_doctors', 'crm_products', 'crm_distributors')
+
+HITS_KEY = f'{KEY_PREFIX}:stats:hits'
+MISSES_KEY = f'{KEY_PREFIX}:stats:misses'
+LIVE_GENERATION_KEY = f'{KEY_PREFIX}:generation:live'
+
+
+# ------------------------------------------------------------
+# Generations
+# ------------------------------------------------------------
+
+def _month_generation_key(month):
+    return f'{KEY_PREFIX}:generation:{month:%Y-%m}'
+
+
+def _bump(key):
+    """Increment a counter that never expires, creating it on first use."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First bump, or the counter was evicted; add() loses to a concurrent creator.
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def _generation(key):
+    return cache.get(key, 0)
+
+
+def invalidate_live():
+    """Drop every cached entry that depends on current data."""
+    _bump(LIVE_GENERATION_KEY)
+
+
+def invalidate_months(months):
+    """Drop the cached closed-month entries for ``months`` (and the live ones)."""
+    for key in {_month_generation_key(month) for month in months}:
+        _bump(key)
+    invalidate_live()
+
+
+# ------------------------------------------------------------
+# Keys
+# ------------------------------------------------------------
+
+def permission_fingerprint(user):
+    """Short stable identifier for the set of permissions ``user`` holds."""
+    if user.is_superuser:
+        return 'superuser'
+    perms = ','.join(sorted(user.get_all_permissions()))
+    return hashlib.md5(perms.encode()).hexdigest()[:16]
+
+
+def is_closed_month(period_start, today=None):
+    today = today or timezone.localdate()
+    return period_start is not None and period_start < today.replace(day=1)
+
+
+def live_key(user, today):
+    return ':'.join([
+        KEY_PREFIX, 'live', permission_fingerprint(user),
+        str(_generation(LIVE_GENERATION_KEY)), today.isoformat(),
+    ])
+
+
+def period_key(user, scope, period_start, today):
+    """Return ``(key, timeout)`` for the period section of the dashboard."""
+    perms = permission_fingerprint(user)
+    if is_closed_month(period_start, today):
+        generation = _generation(_month_generation_key(period_start))
+        key = ':'.join([KEY_PREFIX, 'period', scope, f'{period_start:%Y-%m}', perms, str(generation)])
+        return key, CLOSED_MONTH_TIMEOUT
+
+    month = f'{period_start:%Y-%m}' if period_start else 'all'
+    generation = _generation(LIVE_GENERATION_KEY)
+    # The current month rolls over at midnight, so today is part of the key.
+    key = ':'.join([KEY_PREFIX, 'period', scope, month, perms, str(generation), today.isoformat()])
+    return key, LIVE_TIMEOUT
+
+
+# ------------------------------------------------------------
+# Lookups and statistics
+# ------------------------------------------------------------
+
+def get_or_build(key, timeout, build):
+    """
+    Return ``(value, hit)`` for ``key``, calling ``build()`` and storing its
+    result on a miss.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _bump(HITS_KEY)
+        return value, True
+
+    _bump(MISSES_KEY)
+    value = build()
+    cache.set(key, value, timeout=timeout)
+    return value, False
+
+
+def get_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+# ------------------------------------------------------------
+# Configuration check
+# ------------------------------------------------------------
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint=(
+            'The dashboard cache is invalidated from the snapshot management commands and '
+            'other web workers; configure a shared backend such as the database cache or Redis.'
+        ),
+        id='crm_analytics.W001',
+    )]
+
+
+@register(Tags.database)
+def check_cache_table(app_configs, databases=None, **kwargs):
+    """The database cache's table is created by createcachetable, not by a migration."""
+    if settings.CACHES.get('default', {}).get('BACKEND') != 'django.core.cache.backends.db.DatabaseCache':
+        return []
+    db_cache = caches['default']
+    table = db_cache._table
+    warnings = []
+    for alias in databases or []:
+        if not router.allow_migrate_model(alias, db_cache.cache_model_class):
+            continue
+        if table in connections[alias].introspection.table_names():
+            continue
+        warnings.append(Warning(
+            f"The database cache table '{table}' does not exist on the '{alias}' database.",
+            hint='Run "python manage.py createcachetable" after migrating.',
+            id='crm_analytics.W002',
+        ))
+    return warnings
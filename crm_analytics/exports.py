@@ -0,0 +1,151 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/exports.py
+# Streaming CSV / NDJSON export of the performance snapshot tables.
+# Rows are read with values_list().iterator(chunk_size) and encoded one
+# at a time into a StreamingHttpResponse, so memory stays flat no matter
+# how much history a BI tool pulls.
+# ============================================================
+
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                     DistributorPerformanceSnapshot, ProductPerformanceSnapshot)
+from .periods import filter_period, period_from_params
+
+
+CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+@dataclass(frozen=True)
+class SnapshotExport:
+    model: type
+    entity_param: str           # GET parameter the performance page filters on
+    file_prefix: str
+    columns: tuple              # (header, lookup) pairs
+
+
+SNAPSHOT_EXPORTS = {
+    'mr': SnapshotExport(
+        model=MRPerformanceSnapshot,
+        entity_param='mr',
+        file_prefix='mr_performance',
+        columns=(
+            ('snapshot_month', 'snapshot_month'),
+            ('mr_id', 'mr__mr_id'),
+            ('mr_name', 'mr__name'),
+            ('total_visits', 'total_visits'),
+            ('gps_verified_visits', 'gps_verified_visits'),
+            ('total_doctors_covered', 'total_doctors_covered'),
+            ('unique_doctors_visited', 'unique_doctors_visited'),
+            ('total_prescription_value_generated', 'total_prescription_value_generated'),
+            ('total_investment_given', 'total_investment_given'),
+            ('gps_verified_percentage', 'gps_verified_percentage'),
+            ('working_efficiency_score', 'working_efficiency_score'),
+        ),
+    ),
+    'doctor': SnapshotExport(
+        model=DoctorPerformanceSnapshot,
+        entity_param='doctor',
+        file_prefix='doctor_performance',
+        columns=(
+            ('snapshot_month', 'snapshot_month'),
+            ('doctor_id', 'doctor__doctor_id'),
+            ('doctor_name', 'doctor__doctor_name'),
+            ('specialty', 'doctor__specialty'),
+            ('city', 'doctor__city'),
+            ('total_visits_received', 'total_visits_received'),
+            ('estimated_prescription_per_month', 'estimated_prescription_per_month'),
+            ('total_investment_given', 'total_investment_given'),
+        ),
+    ),
+    'distributor': SnapshotExport(
+        model=DistributorPerformanceSnapshot,
+        entity_param='distributor',
+        file_prefix='distributor_performance',
+        columns=(
+            ('snapshot_month', 'snapshot_month'),
+            ('distributor_id', 'distributor__distributor_id'),
+            ('distributor_name', 'distributor__distributor_name'),
+            ('city', 'distributor__city'),
+            ('total_sales_value', 'total_sales_value'),
+            ('total_units_sold', 'total_units_sold'),
+            ('total_unsold_stock', 'total_unsold_stock'),
+            ('total_expired_stock', 'total_expired_stock'),
+            ('efficiency_percentage', 'efficiency_percentage'),
+        ),
+    ),
+    'product': SnapshotExport(
+        model=ProductPerformanceSnapshot,
+        entity_param='product',
+        file_prefix='product_performance',
+        columns=(
+            ('snapshot_month', 'snapshot_month'),
+            ('product_id', 'product__product_id'),
+            ('product_name', 'product__product_name'),
+            ('distributor_id', 'distributor__distributor_id'),
+            ('region', 'region__region_name'),
+            ('mr_id', 'mr__mr_id'),
+            ('units_sold', 'units_sold'),
+            ('revenue', 'revenue'),
+            ('growth_percentage', 'growth_percentage'),
+        ),
+    ),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(export, params):
+    """
+    Snapshot rows as tuples in export column order, filtered like the
+    performance pages (month / quarter / year and the entity select).
+    """
+    qs = filter_period(export.model.objects.all(), period_from_params(params))
+    entity_id = params.get(export.entity_param, '')
+    if entity_id:
+        qs = qs.filter(**{f'{export.entity_param}_id': entity_id})
+    # (snapshot_month, id) follows the month indexes and gives BI tools a stable order.
+    return (
+        qs.order_by('snapshot_month', 'id')
+        .values_list(*[lookup for _, lookup in export.columns])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def streaming_export_response(export, params, fmt='csv'):
+    content_type, suffix = EXPORT_FORMATS[fmt]
+    headers = [header for header, _ in export.columns]
+    rows = export_rows(export, params)
+    lines = _csv_lines(headers, rows) if fmt == 'csv' else _ndjson_lines(headers, rows)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    filename = f'{export.file_prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{suffix}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,48 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/facts.py
+# Range reports over DailyVisitFact.
+# Any [start, end) date range is answered from the pre-aggregated daily
+# rows; DoctorVisit and its details/investments are never joined.
+# ============================================================
+
+from django.db.models import Sum
+
+from .models import DailyVisitFact
+
+
+FACT_MEASURES = ('visit_count', 'gps_verified_count', 'samples_given', 'estimated_value', 'investment')
+
+GROUP_FIELDS = {
+    'date': 'fact_date',
+    'mr': 'mr_id',
+    'doctor': 'doctor_id',
+    'area': 'area_id',
+}
+
+
+def visit_fact_queryset(start, end, mr_ids=None, doctor_ids=None, area_ids=None):
+    qs = DailyVisitFact.objects.filter(fact_date__gte=start, fact_date__lt=end)
+    if mr_ids is not None:
+        qs = qs.filter(mr_id__in=mr_ids)
+    if doctor_ids is not None:
+        qs = qs.filter(doctor_id__in=doctor_ids)
+    if area_ids is not None:
+        qs = qs.filter(area_id__in=area_ids)
+    return qs
+
+
+def summarize_visit_facts(start, end, group_by=(), **filters):
+    """
+    Sum the fact measures over ``[start, end)``.
+    ``group_by`` takes any of 'date', 'mr', 'doctor', 'area'; without it a
+    single totals dict is returned, otherwise a list of rows.
+    """
+    qs = visit_fact_queryset(start, end, **filters)
+    totals = {measure: Sum(measure) for measure in FACT_MEASURES}
+
+    if not group_by:
+        row = qs.aggregate(**totals)
+        return {measure: row[measure] or 0 for measure in FACT_MEASURES}
+
+    fields = [GROUP_FIELDS[name] for name in group_by]
+    return list(qs.values(*fields).annotate(**totals).order_by(*fields))
@@ -0,0 +1,210 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/forecasting.py
+# Monthly product demand forecasts for batch manufacturing planning.
+# Unit sales history is loaded as one (series × month) numpy matrix and
+# every series is fitted in the same pass: simple exponential smoothing
+# over an alpha grid and a seasonal naive model, keeping whichever has
+# the lower one-step-ahead error. Results are written to DemandForecast.
+# ============================================================
+
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from crm_distributors.models import DistributorSalesValue
+
+from .models import DemandForecast, ProductPerformanceSnapshot
+from .snapshots import add_months, iter_months, month_start
+
+
+BATCH_SIZE = 2000
+
+DEFAULT_HORIZON = 6
+
+SEASON_LENGTH = 12
+
+# Smoothing factors tried for every series; the best in-sample fit wins.
+ALPHA_GRID = np.round(np.arange(0.1, 1.0, 0.1), 1)
+
+# Seasonal naive is only considered once two full seasons are available.
+MIN_SEASONAL_HISTORY = 2 * SEASON_LENGTH
+
+
+@dataclass
+class SalesHistory:
+    keys: list              # (product_id, region_id) per row; region None = all regions
+    months: list            # first day of every column
+    units: np.ndarray       # shape (len(keys), len(months))
+    start: np.ndarray       # index of each series' first month with sales
+
+
+def load_sales_history(last_month, first_month=None):
+    """
+    Monthly units per (product, region) up to ``last_month`` inclusive.
+
+    Snapshot rows with a distributor carry the national totals and rows with
+    a region (and no distributor) the regional drill-down. Months after the
+    newest snapshot are read from DistributorSalesValue, so a lagging
+    snapshot refresh does not shorten the history.
+    """
+    snapshots = ProductPerformanceSnapshot.objects.filter(snapshot_month__lte=last_month)
+    if first_month is not None:
+        snapshots = snapshots.filter(snapshot_month__gte=first_month)
+
+    totals = defaultdict(int)
+    for product_id, month, units in (
+        snapshots.filter(distributor__isnull=False)
+        .values_list('product_id', 'snapshot_month').annotate(units=Sum('units_sold')).order_by()
+    ):
+        totals[(product_id, None, month)] += units or 0
+    for product_id, region_id, month, units in (
+        snapshots.filter(distributor__isnull=True, region__isnull=False)
+        .values_list('product_id', 'region_id', 'snapshot_month').annotate(units=Sum('units_sold')).order_by()
+    ):
+        totals[(product_id, region_id, month)] += units or 0
+
+    newest = max((month for _, _, month in totals), default=None)
+    sales = DistributorSalesValue.objects.filter(sale_date__lt=add_months(last_month, 1))
+    if newest is not None:
+        sales = sales.filter(sale_date__gte=add_months(newest, 1))
+    elif first_month is not None:
+        sales = sales.filter(sale_date__gte=first_month)
+    for product_id, month, units in (
+        sales.annotate(month=TruncMonth('sale_date'))
+        .values_list('product_id', 'month').annotate(units=Sum('quantity_sold')).order_by()
+    ):
+        totals[(product_id, None, month_start(month))] += units or 0
+
+    if not totals:
+        return SalesHistory([], [], np.zeros((0, 0)), np.zeros(0, dtype=np.int64))
+
+    months = list(iter_months(first_month or min(month for _, _, month in totals), last_month))
+    column = {month: i for i, month in enumerate(months)}
+    keys = sorted({(product_id, region_id) for product_id, region_id, _ in totals},
+                  key=lambda key: (key[0], key[1] is not None, key[1] or 0))
+    row = {key: i for i, key in enumerate(keys)}
+
+    units = np.zeros((len(keys), len(months)))
+    for (product_id, region_id, month), value in totals.items():
+        units[row[(product_id, region_id)], column[month]] = value
+    # Months before a product's first sale are not history, just absence.
+    has_sales = units > 0
+    start = np.where(has_sales.any(axis=1), has_sales.argmax(axis=1), len(months))
+    return SalesHistory(keys, months, units, start)
+
+
+def fit_exponential_smoothing(units, start, alphas=ALPHA_GRID):
+    """
+    Simple exponential smoothing for every (series, alpha) pair at once.
+    Returns ``(level, mae)`` with shape (series, alphas); ``mae`` is the mean
+    absolute one-step-ahead error, NaN when there is only one observation.
+    """
+    n_series, n_months = units.shape
+    alphas = np.asarray(alphas)[np.newaxis, :]
+    level = np.zeros((n_series, alphas.shape[1]))
+    abs_error = np.zeros_like(level)
+    count = np.zeros((n_series, 1))
+    for t in range(n_months):
+        y = units[:, t:t + 1]
+        first = (start == t)[:, np.newaxis]
+        active = (start < t)[:, np.newaxis]
+        level = np.where(first, y, level)
+        error = y - level
+        abs_error += np.where(active, np.abs(error), 0)
+        count += active
+        level = np.where(active, level + alphas * error, level)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = abs_error / count
+    return level, mae
+
+
+def fit_seasonal_naive(units, start, season=SEASON_LENGTH):
+    """
+    Mean absolute error of "same month last year" for every series; NaN
+    where fewer than MIN_SEASONAL_HISTORY months are available.
+    """
+    n_series, n_months = units.shape
+    if n_months <= season:
+        return np.full(n_series, np.nan)
+    error = np.abs(units[:, season:] - units[:, :-season])
+    months = np.arange(season, n_months)[np.newaxis, :]
+    valid = months >= (start[:, np.newaxis] + season)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.where(valid, error, 0).sum(axis=1) / count
+    mae[n_months - start < MIN_SEASONAL_HISTORY] = np.nan
+    return mae
+
+
+def forecast(history, horizon=DEFAULT_HORIZON):
+    """
+    Fit every series and return ``(values, methods, alphas, mae)``; ``values``
+    has shape (series, horizon).
+    """
+    units, start = history.units, history.start
+    level, ses_mae = fit_exponential_smoothing(units, start)
+    # Series with a single observation have no error yet; take the middle alpha.
+    scored = np.where(np.isnan(ses_mae), np.inf, ses_mae)
+    best = np.where(np.isinf(scored).all(axis=1), len(ALPHA_GRID) // 2, scored.argmin(axis=1))
+    rows = np.arange(len(units))
+    ses_level = level[rows, best]
+    ses_mae = ses_mae[rows, best]
+
+    seasonal_mae = fit_seasonal_naive(units, start)
+    seasonal = ~np.isnan(seasonal_mae) & (seasonal_mae < np.nan_to_num(ses_mae, nan=np.inf))
+
+    values = np.repeat(ses_level[:, np.newaxis], horizon, axis=1)
+    if seasonal.any():
+        n_months = units.shape[1]
+        lags = n_months - SEASON_LENGTH + np.arange(horizon) % SEASON_LENGTH
+        values[seasonal] = units[seasonal][:, lags]
+
+    methods = np.where(seasonal, 'seasonal_naive', 'ses')
+    alphas = np.where(seasonal, np.nan, ALPHA_GRID[best])
+    mae = np.where(seasonal, seasonal_mae, ses_mae)
+    return np.clip(values, 0, None), methods, alphas, mae
+
+
+def _decimal(value):
+    return None if np.isnan(value) else Decimal(f'{value:.2f}')
+
+
+@transaction.atomic
+def generate_demand_forecasts(last_month=None, horizon=DEFAULT_HORIZON, first_month=None):
+    """
+    Replace DemandForecast with forecasts for the ``horizon`` months after
+    ``last_month`` (default: the last complete month).
+    Returns the number of series forecast.
+    """
+    last_month = last_month or add_months(month_start(timezone.localdate()), -1)
+    history = load_sales_history(last_month, first_month)
+    DemandForecast.objects.all().delete()
+    if not history.keys:
+        return 0
+
+    active = history.start < len(history.months)
+    values, methods, alphas, mae = forecast(history, horizon)
+    targets = [add_months(last_month, step) for step in range(1, horizon + 1)]
+    forecasts = [
+        DemandForecast(
+            product_id=product_id,
+            region_id=region_id,
+            forecast_month=target,
+            method=methods[i],
+            forecast_units=int(round(values[i, step])),
+            alpha=_decimal(alphas[i]),
+            mean_absolute_error=_decimal(mae[i]),
+            history_months=len(history.months) - int(history.start[i]),
+            based_on_month=last_month,
+        )
+        for i, (product_id, region_id) in enumerate(history.keys) if active[i]
+        for step, target in enumerate(targets)
+    ]
+    DemandForecast.objects.bulk_create(forecasts, batch_size=BATCH_SIZE)
+    return int(active.sum())
@@ -0,0 +1,156 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/kpis.py
+# Dashboard KPI service.
+# Every source table is read exactly once: all of its counters are
+# computed in a single aggregate(Count(..., filter=Q(...))) pass.
+# ============================================================
+
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q
+
+from core.models import Contact, News, Teams, Cities, Subscribers
+from hr.models import Employee, Department
+from crm_products.models import ProductMaster, BatchManagement
+from crm_distributors.models import Distributor
+from crm_sales.models import MedicalRepresentative, Region, Area
+from crm_doctors.models import Doctor, DoctorVisit
+
+from .models import ExpiryAlert
+
+
+@dataclass
+class DashboardKPIs:
+    counters: dict = field(default_factory=dict)
+    query_count: int = 0
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook that counts executed statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _date_range(start, end, prefix='visit_date'):
+    return Q(**{f'{prefix}__gte': start, f'{prefix}__lt': end})
+
+
+def _live_visit_aggregates(today):
+    month_start = today.replace(day=1)
+    current_month = Q(visit_date__gte=month_start)
+    aggregates = {
+        'visits_today': Count('id', filter=Q(visit_date=today)),
+        'visits_month': Count('id', filter=current_month),
+        'gps_verified_month': Count('id', filter=current_month & Q(is_gps_verified=True)),
+    }
+    return aggregates, month_start
+
+
+def _period_visit_aggregates(period_start, period_end, previous_start, previous_end):
+    if period_start is None:
+        aggregates = {
+            'period_visit_count': Count('id'),
+            'period_gps_verified': Count('id', filter=Q(is_gps_verified=True)),
+            'period_doctors_covered': Count('doctor_id', distinct=True),
+            'period_mrs_active': Count('mr_id', distinct=True),
+        }
+        return aggregates, None
+
+    period = _date_range(period_start, period_end)
+    previous = _date_range(previous_start, previous_end)
+    aggregates = {
+        'period_visit_count': Count('id', filter=period),
+        'period_gps_verified': Count('id', filter=period & Q(is_gps_verified=True)),
+        'period_doctors_covered': Count('doctor_id', distinct=True, filter=period),
+        'period_mrs_active': Count('mr_id', distinct=True, filter=period),
+        'previous_visit_count': Count('id', filter=previous),
+        'previous_gps_verified': Count('id', filter=previous & Q(is_gps_verified=True)),
+    }
+    return aggregates, previous_start
+
+
+def _visit_counters(*parts):
+    """
+    Fold the aggregates of every part into one DoctorVisit query. When every
+    part has a lower date bound, older visits are never scanned.
+    """
+    aggregates = {}
+    lower_bounds = []
+    for part_aggregates, lower_bound in parts:
+        aggregates.update(part_aggregates)
+        lower_bounds.append(lower_bound)
+
+    qs = DoctorVisit.objects.all()
+    if None not in lower_bounds:
+        qs = qs.filter(visit_date__gte=min(lower_bounds))
+    return qs.aggregate(**aggregates)
+
+
+def _table_counters():
+    counters = {
+        'total_products': ProductMaster.objects.aggregate(n=Count('id', filter=Q(status='active')))['n'],
+        'total_distributors': Distributor.objects.aggregate(n=Count('id', filter=Q(status='active')))['n'],
+        'total_mrs': MedicalRepresentative.objects.aggregate(n=Count('id', filter=Q(status='active')))['n'],
+        'total_doctors': Doctor.objects.aggregate(n=Count('id', filter=Q(status='active')))['n'],
+        'total_employees': Employee.objects.aggregate(n=Count('id', filter=Q(is_active=True)))['n'],
+        'total_departments': Department.objects.aggregate(n=Count('id', filter=Q(is_active=True)))['n'],
+        'total_regions': Region.objects.aggregate(n=Count('id', filter=Q(is_active=True)))['n'],
+        'total_areas': Area.objects.aggregate(n=Count('id', filter=Q(is_active=True)))['n'],
+        'total_news': News.objects.aggregate(n=Count('id', filter=Q(is_published=True)))['n'],
+        'total_teams': Teams.objects.aggregate(n=Count('id', filter=Q(is_active=True)))['n'],
+        'total_cities': Cities.objects.aggregate(n=Count('id'))['n'],
+        'total_subscribers': Subscribers.objects.aggregate(n=Count('id'))['n'],
+        'total_users': User.objects.aggregate(n=Count('id'))['n'],
+        'unread_contacts': Contact.objects.aggregate(n=Count('id', filter=Q(is_read=False)))['n'],
+        'expiry_alerts_count': ExpiryAlert.objects.aggregate(n=Count('id', filter=Q(is_acknowledged=False)))['n'],
+    }
+    counters.update(BatchManagement.objects.aggregate(
+        near_expiry_batches=Count('id', filter=Q(batch_status='near_expiry')),
+        expired_batches=Count('id', filter=Q(batch_status='expired')),
+    ))
+    return counters
+
+
+def compute_live_kpis(today):
+    """Counters that do not depend on the selected period (master data, today, this month)."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        counters = _table_counters()
+        counters.update(_visit_counters(_live_visit_aggregates(today)))
+    return DashboardKPIs(counters=counters, query_count=counter.count)
+
+
+def compute_period_kpis(period_start=None, period_end=None, previous_start=None, previous_end=None):
+    """Visit counters for the selected period and the month before it."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        counters = _visit_counters(
+            _period_visit_aggregates(period_start, period_end, previous_start, previous_end)
+        )
+    counters.setdefault('previous_visit_count', 0)
+    counters.setdefault('previous_gps_verified', 0)
+    return DashboardKPIs(counters=counters, query_count=counter.count)
+
+
+def compute_dashboard_kpis(today, period_start=None, period_end=None, previous_start=None, previous_end=None):
+    """
+    Compute every dashboard counter with one query per source table.
+    Pass ``period_start=None`` for the all-data scope.
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        counters = _table_counters()
+        counters.update(_visit_counters(
+            _live_visit_aggregates(today),
+            _period_visit_aggregates(period_start, period_end, previous_start, previous_end),
+        ))
+    counters.setdefault('previous_visit_count', 0)
+    counters.setdefault('previous_gps_verified', 0)
+    return DashboardKPIs(counters=counters, query_count=counter.count)
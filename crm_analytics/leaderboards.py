@@ -0,0 +1,324 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/leaderboards.py
+# Precomputed top-K leaderboards per (metric, period, territory).
+# A full build runs one GROUP BY per (metric, period) and ranks every
+# territory board from the same rows with heapq.nlargest. The snapshot
+# refresh then updates boards incrementally: only the changed entities
+# are re-aggregated and merged into the stored lists, and a board is
+# rebuilt from scratch only when the merge cannot prove its top-K.
+# Dashboard widgets read the first K rows of a board.
+# ============================================================
+
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, F, Max, Q, Sum
+
+from .models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                     DistributorPerformanceSnapshot, ProductPerformanceSnapshot,
+                     LeaderboardEntry)
+
+
+BATCH_SIZE = 2000
+
+# Entries stored per board. Widgets read a prefix; the extra depth lets most
+# incremental updates prove the top-K without a rebuild.
+LEADERBOARD_DEPTH = 20
+
+ALL_TIME = 'all'
+
+NATIONWIDE = ('all', 0)
+
+
+@dataclass(frozen=True)
+class LeaderboardSpec:
+    model: type
+    entity: str                 # grouping field on the snapshot model
+    score: str                  # annotation the board is ranked by
+    annotations: dict
+    decimal_fields: tuple = ()
+    territories: dict = field(default_factory=dict)   # level → entity's territory id path
+
+
+LEADERBOARDS = {
+    'mr_visits': LeaderboardSpec(
+        model=MRPerformanceSnapshot,
+        entity='mr',
+        score='total_visits',
+        annotations={
+            'mr_name': F('mr__name'),
+            'mr_code': F('mr__mr_id'),
+            'total_visits': Sum('total_visits'),
+            'gps_verified_visits': Sum('gps_verified_visits'),
+            'total_doctors_covered': Sum('total_doctors_covered'),
+            'total_prescription_value_generated': Sum('total_prescription_value_generated'),
+            'total_investment_given': Sum('total_investment_given'),
+            'efficiency_score': Avg('working_efficiency_score'),
+        },
+        decimal_fields=('total_prescription_value_generated', 'total_investment_given', 'efficiency_score'),
+        territories={
+            'division': 'mr__division_id',
+            'region': 'mr__region_id',
+            'area': 'mr__area_id',
+        },
+    ),
+    'doctor_visits': LeaderboardSpec(
+        model=DoctorPerformanceSnapshot,
+        entity='doctor',
+        score='total_visits_received',
+        annotations={
+            'doctor_name': F('doctor__doctor_name'),
+            'doctor_code': F('doctor__doctor_id'),
+            'specialty': F('doctor__specialty'),
+            'city': F('doctor__city'),
+            'total_visits_received': Sum('total_visits_received'),
+            'estimated_prescription_per_month': Sum('estimated_prescription_per_month'),
+            'total_investment_given': Sum('total_investment_given'),
+        },
+        decimal_fields=('estimated_prescription_per_month', 'total_investment_given'),
+        territories={
+            'area': 'doctor__area_id',
+        },
+    ),
+    'distributor_sales': LeaderboardSpec(
+        model=DistributorPerformanceSnapshot,
+        entity='distributor',
+        score='total_sales_value',
+        annotations={
+            'distributor_name': F('distributor__distributor_name'),
+            'city': F('distributor__city'),
+            'total_sales_value': Sum('total_sales_value'),
+            'total_units_sold': Sum('total_units_sold'),
+            'total_unsold_stock': Sum('total_unsold_stock'),
+            'total_expired_stock': Sum('total_expired_stock'),
+            'efficiency_percentage': Avg('efficiency_percentage'),
+        },
+        decimal_fields=('total_sales_value', 'efficiency_percentage'),
+    ),
+    'product_revenue': LeaderboardSpec(
+        model=ProductPerformanceSnapshot,
+        entity='product',
+        score='total_revenue',
+        annotations={
+            'product_name': F('product__product_name'),
+            'strength': F('product__strength'),
+            'category': F('product__category'),
+            'total_units_sold': Sum('units_sold'),
+            'total_revenue': Sum('revenue'),
+            'growth_percentage': Avg('growth_percentage'),
+        },
+        decimal_fields=('total_revenue', 'growth_percentage'),
+    ),
+}
+
+# Snapshot builder entity → leaderboard metric it feeds.
+SNAPSHOT_METRICS = {
+    'mr': 'mr_visits',
+    'doctor': 'doctor_visits',
+    'distributor': 'distributor_sales',
+    'product': 'product_revenue',
+}
+
+
+def period_key(month):
+    """Snapshot month → ``period`` value; None means all time."""
+    return month.strftime('%Y-%m') if month else ALL_TIME
+
+
+def _territory_key(level):
+    return f'territory_{level}'
+
+
+def _aggregate_rows(spec, month, entity_ids=None):
+    """Per-entity aggregates for ``month`` (all time when None), one row per entity."""
+    qs = spec.model.objects.all()
+    if month is not None:
+        qs = qs.filter(snapshot_month=month)
+    if entity_ids is not None:
+        qs = qs.filter(**{f'{spec.entity}__in': entity_ids})
+    return qs.values(spec.entity).annotate(
+        **{_territory_key(level): F(path) for level, path in spec.territories.items()},
+        **spec.annotations,
+        latest_month=Max('snapshot_month'),
+    ).order_by()
+
+
+def _rank_key(spec, row):
+    # Same order as the dashboard's ORDER BY score DESC, latest_month DESC,
+    # with the entity id as the final tie-breaker so the order is total.
+    return (row[spec.score] or 0, row['latest_month'], -row[spec.entity])
+
+
+def _top(spec, rows):
+    return heapq.nlargest(LEADERBOARD_DEPTH, rows, key=lambda row: _rank_key(spec, row))
+
+
+def _board_rows(spec, month, board):
+    level, territory_id = board
+    qs = _aggregate_rows(spec, month)
+    if board != NATIONWIDE:
+        qs = qs.filter(**{spec.territories[level]: territory_id})
+    return qs.iterator()
+
+
+def _boards_of(spec, row):
+    yield NATIONWIDE
+    for level in spec.territories:
+        territory_id = row[_territory_key(level)]
+        if territory_id is not None:
+            yield level, territory_id
+
+
+def _decode(spec, row):
+    for name in spec.decimal_fields:
+        if row.get(name) is not None:
+            row[name] = Decimal(row[name])
+    row['latest_month'] = date.fromisoformat(row['latest_month'])
+    return row
+
+
+def _write_boards(metric, period, boards):
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(
+            metric=metric,
+            period=period,
+            territory_level=level,
+            territory_id=territory_id,
+            rank=rank,
+            entity_id=row[LEADERBOARDS[metric].entity],
+            row=row,
+        )
+        for (level, territory_id), rows in boards.items()
+        for rank, row in enumerate(rows, start=1)
+    ], batch_size=BATCH_SIZE)
+
+
+def _board_filter(boards):
+    by_level = defaultdict(list)
+    for level, territory_id in boards:
+        by_level[level].append(territory_id)
+    condition = Q()
+    for level, territory_ids in by_level.items():
+        condition |= Q(territory_level=level, territory_id__in=territory_ids)
+    return condition
+
+
+# ------------------------------------------------------------
+# Building
+# ------------------------------------------------------------
+
+@transaction.atomic
+def rebuild_leaderboard(metric, month=None):
+    """
+    Recompute every board of ``metric`` for ``month`` (all time when None)
+    from one GROUP BY. Returns the number of boards written.
+    """
+    spec = LEADERBOARDS[metric]
+    members = defaultdict(list)
+    for row in _aggregate_rows(spec, month).iterator():
+        for board in _boards_of(spec, row):
+            members[board].append(row)
+    boards = {board: _top(spec, rows) for board, rows in members.items()}
+    period = period_key(month)
+    LeaderboardEntry.objects.filter(metric=metric, period=period).delete()
+    _write_boards(metric, period, boards)
+    return len(boards)
+
+
+@transaction.atomic
+def update_leaderboard(metric, month, entity_ids, include_stored=False):
+    """
+    Merge fresh aggregates for ``entity_ids`` into the stored boards of
+    ``metric`` for ``month`` (all time when None).
+
+    Entities outside a full board rank no higher than its last stored row,
+    so a merged board is exact as long as its first LEADERBOARD_DEPTH rows
+    all rank at or above that row. Otherwise that board is re-ranked from
+    the snapshots of its territory.
+    ``include_stored`` also refreshes every entity already on a board, for
+    values that change without moving the ranking (efficiency scores).
+    Returns the number of boards written.
+    """
+    spec = LEADERBOARDS[metric]
+    period = period_key(month)
+    entries = LeaderboardEntry.objects.filter(metric=metric, period=period)
+    if not entries.filter(territory_level=NATIONWIDE[0]).exists():
+        return rebuild_leaderboard(metric, month)
+
+    entity_ids = set(entity_ids)
+    if include_stored:
+        entity_ids.update(entries.values_list('entity_id', flat=True).distinct())
+    if not entity_ids:
+        return 0
+
+    additions = defaultdict(list)
+    for row in _aggregate_rows(spec, month, entity_ids):
+        for board in _boards_of(spec, row):
+            additions[board].append(row)
+    affected = set(additions) | set(
+        entries.filter(entity_id__in=entity_ids)
+        .values_list('territory_level', 'territory_id').distinct()
+    )
+
+    stored = defaultdict(list)
+    for level, territory_id, row in (
+        entries.filter(_board_filter(affected))
+        .order_by('territory_level', 'territory_id', 'rank')
+        .values_list('territory_level', 'territory_id', 'row')
+    ):
+        stored[(level, territory_id)].append(_decode(spec, row))
+
+    boards = {}
+    for board in affected:
+        previous = stored.get(board, [])
+        rows = [row for row in previous if row[spec.entity] not in entity_ids]
+        rows += additions.get(board, [])
+        top = _top(spec, rows)
+        if len(previous) >= LEADERBOARD_DEPTH:
+            cutoff = _rank_key(spec, previous[-1])
+            if len(top) < LEADERBOARD_DEPTH or _rank_key(spec, top[-1]) < cutoff:
+                # A row fell below the stored depth; re-rank just this board.
+                top = _top(spec, _board_rows(spec, month, board))
+        boards[board] = top
+
+    entries.filter(_board_filter(affected)).delete()
+    _write_boards(metric, period, {board: rows for board, rows in boards.items() if rows})
+    return len(boards)
+
+
+# ------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------
+
+def top_rows(metric, month=None, k=5, territory_level='all', territory_id=0):
+    """
+    The first ``k`` rows of a board, best first. Falls back to ranking the
+    snapshots directly when the period has not been built yet or ``k`` is
+    deeper than the stored boards.
+    """
+    spec = LEADERBOARDS[metric]
+    period = period_key(month)
+    if k <= LEADERBOARD_DEPTH:
+        rows = [
+            _decode(spec, row) for row in
+            LeaderboardEntry.objects.filter(
+                metric=metric, period=period,
+                territory_level=territory_level, territory_id=territory_id,
+            ).order_by('rank').values_list('row', flat=True)[:k]
+        ]
+        # An empty nationwide board means the period was never built (or has
+        # no snapshots, which the fallback answers just as cheaply).
+        if rows or (
+            (territory_level, territory_id) != NATIONWIDE
+            and LeaderboardEntry.objects.filter(metric=metric, period=period, territory_level=NATIONWIDE[0]).exists()
+        ):
+            return rows
+
+    qs = _aggregate_rows(spec, month)
+    if (territory_level, territory_id) != NATIONWIDE:
+        qs = qs.filter(**{spec.territories[territory_level]: territory_id})
+    return list(qs.order_by(f'-{spec.score}', '-latest_month', spec.entity)[:k])
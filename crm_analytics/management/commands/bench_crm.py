@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import Group, Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryRecorder
+from crm_data_tools.config import DATA_MODELS, export_queryset, export_value
+from crm_doctors.models import Doctor, DoctorVisit
+from crm_sales.models import MedicalRepresentative
+
+
+SUPERUSER = "bench_superuser"
+RESTRICTED_USER = "bench_field_manager"
+RESTRICTED_ROLE = "CRM - Bench Field Manager"
+
+# View access to the doctor pages and the analytics they feed; no admin sections.
+RESTRICTED_PERMISSIONS = [
+    ("crm_doctors", "view_doctor"),
+    ("crm_doctors", "view_doctorvisit"),
+    ("crm_analytics", "view_mrperformancesnapshot"),
+    ("crm_analytics", "view_doctorperformancesnapshot"),
+    ("crm_analytics", "view_expiryalert"),
+]
+
+SCENARIOS = ["dashboard", "visit_list", "doctor_detail", "doctor_last_visit_api", "data_export", "data_import"]
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    data: dict = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the CRM hot paths in-process with the Django test client and a thread pool, "
+        "as a CRM superuser and as a restricted role, and print latency percentiles, throughput "
+        "and queries per request as JSON. Run it against a seeded database (seed_scale_data); "
+        "it creates the two benchmark users if they do not exist and never commits an import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per scenario and user (default: 50).")
+        parser.add_argument(
+            "--export-requests",
+            type=int,
+            default=3,
+            help="Timed requests for data_export, which streams a whole table (default: 3).",
+        )
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent clients (default: 4).")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per scenario and user (default: 2).")
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            help="Restrict the run to one scenario. Can be repeated.",
+        )
+        parser.add_argument(
+            "--user",
+            action="append",
+            choices=["superuser", "restricted"],
+            help="Restrict the run to one user. Can be repeated.",
+        )
+        parser.add_argument(
+            "--data-model",
+            default="doctor",
+            choices=sorted(DATA_MODELS),
+            help="Data-tools data set to export and import (default: doctor).",
+        )
+        parser.add_argument("--import-rows", type=int, default=500, help="Rows in the uploaded import file (default: 500).")
+        parser.add_argument("--seed", type=int, default=42, help="Seed for picking doctors, MRs and filters (default: 42).")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["requests"] < 1:
+            raise CommandError("--threads and --requests must be positive.")
+        doctor_ids = list(Doctor.objects.order_by("pk").values_list("pk", flat=True))
+        if not doctor_ids:
+            raise CommandError("No doctors found; seed the database first (seed_scale_data).")
+
+        self.rng = random.Random(options["seed"])
+        self.doctor_ids = self.rng.sample(doctor_ids, min(len(doctor_ids), 500))
+        self.mr_ids = list(MedicalRepresentative.objects.filter(status="active").values_list("pk", flat=True)[:500])
+        self.last_visit = DoctorVisit.objects.aggregate(last=Max("visit_date"))["last"]
+        self.data_model = options["data_model"]
+        self.upload = self._import_file(options["import_rows"])
+        users = self._users()
+
+        results = []
+        # The harness records queries itself; the per-request middleware would only add noise.
+        # Imports run inline so the upload scenario still times their validation.
+        with override_settings(QUERY_BUDGET_ENABLED=False, DATA_IMPORT_IN_BACKGROUND=False):
+            for scenario in options["scenario"] or SCENARIOS:
+                count = options["export_requests"] if scenario == "data_export" else options["requests"]
+                for role in options["user"] or ["superuser", "restricted"]:
+                    result = self._run(scenario, role, users[role], count, options["threads"], options["warmup"])
+                    results.append(result)
+                    self.stderr.write(
+                        f"{scenario:<22} {role:<10} p50={result['p50_ms']:>8.1f}ms "
+                        f"p95={result['p95_ms']:>8.1f}ms rps={result['throughput_rps']:>7.1f} "
+                        f"queries={result['queries_per_request']:.1f}"
+                    )
+
+        report = {
+            "commit": self._git_commit(),
+            "database": connection.vendor,
+            "threads": options["threads"],
+            "seed": options["seed"],
+            "rows": {
+                "doctors": len(doctor_ids),
+                "visits": DoctorVisit.objects.count(),
+                "mrs": MedicalRepresentative.objects.count(),
+            },
+            "scenarios": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output + "\n")
+            self.stderr.write(f"Report written to {options['output']}.")
+        else:
+            self.stdout.write(output)
+
+    # ------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------
+
+    def _users(self):
+        superuser, created = User.objects.get_or_create(username=SUPERUSER, defaults={"is_superuser": True, "is_staff": True})
+        if created:
+            superuser.set_unusable_password()
+            superuser.save(update_fields=["password"])
+
+        role, _ = Group.objects.get_or_create(name=RESTRICTED_ROLE)
+        role.permissions.set(Permission.objects.filter(
+            content_type__app_label__in={app for app, _ in RESTRICTED_PERMISSIONS},
+            codename__in={codename for _, codename in RESTRICTED_PERMISSIONS},
+        ))
+        restricted, created = User.objects.get_or_create(username=RESTRICTED_USER)
+        if created:
+            restricted.set_unusable_password()
+            restricted.save(update_fields=["password"])
+        restricted.groups.add(role)
+        return {"superuser": superuser, "restricted": restricted}
+
+    def _import_file(self, rows):
+        """CSV in the import layout, built from existing rows of --data-model."""
+        config = DATA_MODELS[self.data_model]
+        headers = [column.header for column in config["import_columns"]]
+        stream = io.StringIO()
+        writer = csv.DictWriter(stream, fieldnames=headers, extrasaction="ignore")
+        writer.writeheader()
+        for obj in export_queryset(config["model"], config["export_columns"]).order_by("pk")[:rows]:
+            writer.writerow({column.header: export_value(column, obj) for column in config["export_columns"]})
+        return stream.getvalue().encode("utf-8")
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    # ------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------
+
+    def _requests(self, scenario, count):
+        """``count`` requests for ``scenario``, drawn from the seeded RNG."""
+        rng = self.rng
+        for _ in range(count):
+            if scenario == "dashboard":
+                yield Request("get", reverse("crm_analytics:dashboard"))
+            elif scenario == "visit_list":
+                filters = rng.choice(["none", "mr", "gps", "type", "dates", "search"])
+                params = {
+                    "none": {},
+                    "mr": {"mr": rng.choice(self.mr_ids)} if self.mr_ids else {},
+                    "gps": {"gps": rng.choice(["0", "1"])},
+                    "type": {"type": rng.choice(DoctorVisit.VISIT_TYPE_CHOICES)[0]},
+                    "dates": self._date_range(rng),
+                    "search": {"q": rng.choice(["Khan", "Ali", "Malik"])},
+                }[filters]
+                yield Request("get", reverse("crm_doctors:visit_list"), params)
+            elif scenario == "doctor_detail":
+                yield Request("get", reverse("crm_doctors:doctor_detail", args=[rng.choice(self.doctor_ids)]))
+            elif scenario == "doctor_last_visit_api":
+                yield Request("get", reverse("crm_doctors:doctor_last_visit_api", args=[rng.choice(self.doctor_ids)]))
+            elif scenario == "data_export":
+                yield Request("get", reverse("crm_data_tools:export", args=[self.data_model]))
+            elif scenario == "data_import":
+                # Upload and preview only; the confirm step is never posted.
+                yield Request("post", reverse("crm_data_tools:import", args=[self.data_model]))
+
+    def _date_range(self, rng):
+        if self.last_visit is None:
+            return {}
+        start = self.last_visit - timedelta(days=rng.randrange(7, 90))
+        return {"date_from": start.isoformat(), "date_to": (start + timedelta(days=30)).isoformat()}
+
+    def _send(self, client, request):
+        if request.method == "post":
+            upload = SimpleUploadedFile(f"{self.data_model}.csv", self.upload, content_type="text/csv")
+            # The upload stages the file and redirects to the first preview page.
+            return client.post(request.path, {"data_file": upload}, follow=True)
+        return client.get(request.path, request.data or {})
+
+    def _worker(self, user, requests, warmup):
+        """Run ``requests`` on one client; returns ``[(status, ms, queries)]`` for the timed ones."""
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        samples = []
+        try:
+            for n, request in enumerate(requests):
+                with QueryRecorder() as recorder:
+                    started = time.perf_counter()
+                    response = self._send(client, request)
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    elapsed = (time.perf_counter() - started) * 1000
+                if n >= warmup:
+                    samples.append((response.status_code, elapsed, recorder.count))
+        finally:
+            connections.close_all()
+        return samples
+
+    def _run(self, scenario, role, user, count, threads, warmup):
+        threads = min(threads, count)
+        requests = list(self._requests(scenario, count + warmup * threads))
+        # Round-robin shares; the first `warmup` requests of every thread are not timed.
+        shares = [requests[i::threads] for i in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            batches = list(pool.map(lambda share: self._worker(user, share, warmup), shares))
+        wall = time.perf_counter() - started
+
+        samples = [sample for batch in batches for sample in batch]
+        statuses = [status for status, _, _ in samples]
+        latencies = np.array([ms for _, ms, _ in samples])
+        queries = np.array([n for _, _, n in samples])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "scenario": scenario,
+            "user": role,
+            "requests": len(samples),
+            "errors": sum(1 for status in statuses if status >= 500),
+            "status_codes": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_ms": round(float(latencies.mean()), 2),
+            # Wall time includes the warmup requests, so this slightly understates steady state.
+            "throughput_rps": round(len(samples) / wall, 2),
+            "queries_per_request": round(float(queries.mean()), 2),
+            "max_queries": int(queries.max()),
+        }
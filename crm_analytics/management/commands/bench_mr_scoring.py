@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from crm_analytics.scoring import WEIGHTS, compute_scores
+
+
+def _python_scores(columns):
+    """Row-at-a-time reference implementation used as the benchmark baseline."""
+    n = len(columns["id"])
+    by_territory = {}
+    for i in range(n):
+        by_territory.setdefault(int(columns["territory"][i]), []).append(i)
+
+    metrics = {
+        "visits": [float(v) for v in columns["total_visits"]],
+        "coverage": [
+            (columns["unique_doctors_visited"][i] / columns["total_doctors_covered"][i])
+            if columns["total_doctors_covered"][i] else 0.0
+            for i in range(n)
+        ],
+        "gps": [float(v) for v in columns["gps_verified_percentage"]],
+        "net_value": [
+            float(columns["total_prescription_value_generated"][i] - columns["total_investment_given"][i])
+            for i in range(n)
+        ],
+    }
+    scores = [0.0] * n
+    for members in by_territory.values():
+        for name, weight in WEIGHTS.items():
+            values = metrics[name]
+            for i in members:
+                if len(members) == 1:
+                    rank = 0.5
+                else:
+                    below = sum(1 for j in members if values[j] < values[i])
+                    equal = sum(1 for j in members if values[j] == values[i])
+                    rank = (below + (equal - 1) / 2) / (len(members) - 1)
+                scores[i] += weight * rank
+    return [round(score * 100, 2) for score in scores]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorized MR efficiency scorer on synthetic columns against a row-at-a-time baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mrs", type=int, default=5000, help="Number of MR snapshots to simulate (default: 5000).")
+        parser.add_argument("--territories", type=int, default=50, help="Number of territories (default: 50).")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs of the vectorized scorer (default: 5).")
+        parser.add_argument("--skip-baseline", action="store_true", help="Do not run the slow pure-Python baseline.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        n = options["mrs"]
+        covered = rng.integers(0, 120, n).astype(np.float64)
+        columns = {
+            "id": np.arange(1, n + 1),
+            "territory": rng.integers(0, options["territories"], n),
+            "total_visits": rng.integers(0, 300, n).astype(np.float64),
+            "unique_doctors_visited": np.minimum(rng.integers(0, 120, n), covered),
+            "total_doctors_covered": covered,
+            "gps_verified_percentage": np.round(rng.uniform(0, 100, n), 2),
+            "total_prescription_value_generated": np.round(rng.uniform(0, 5e6, n), 2),
+            "total_investment_given": np.round(rng.uniform(0, 1e6, n), 2),
+        }
+
+        timings = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            scores = compute_scores(columns)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"vectorized: {n} MRs in {1000 * min(timings):.2f} ms (best of {options['repeat']}), "
+            f"{1000 * sum(timings) / len(timings):.2f} ms avg"
+        )
+
+        if options["skip_baseline"]:
+            return
+        started = time.perf_counter()
+        baseline = _python_scores(columns)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"row-at-a-time: {1000 * elapsed:.1f} ms")
+        self.stdout.write(f"max |difference|: {np.max(np.abs(np.array(baseline) - scores)):.4f}")
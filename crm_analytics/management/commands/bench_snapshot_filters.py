@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from crm_analytics.models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                                  DistributorPerformanceSnapshot, ProductPerformanceSnapshot)
+from crm_analytics.periods import filter_period, month_period, quarter_period, year_period
+
+
+SNAPSHOT_MODELS = {
+    'mr': (MRPerformanceSnapshot, 'mr_id'),
+    'doctor': (DoctorPerformanceSnapshot, 'doctor_id'),
+    'distributor': (DistributorPerformanceSnapshot, 'distributor_id'),
+    'product': (ProductPerformanceSnapshot, 'product_id'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query plans and timings of the legacy snapshot_month__startswith "
+        "filter against the half-open range filter used by the analytics pages. "
+        "Run it against a populated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Month to filter on (YYYY-MM). Defaults to the latest MR snapshot month.")
+        parser.add_argument(
+            "--granularity",
+            choices=["month", "quarter", "year"],
+            default="month",
+            help="Range to benchmark around --month (default: month). The legacy filter is always a month prefix "
+                 "or, for year, a year prefix.",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Timed executions per query (default: 20).")
+
+    def handle(self, *args, **options):
+        month = options["month"]
+        if not month:
+            latest = MRPerformanceSnapshot.objects.order_by("-snapshot_month").values_list("snapshot_month", flat=True).first()
+            if latest is None:
+                raise CommandError("No snapshots found; pass --month or populate the database first.")
+            month = latest.strftime("%Y-%m")
+
+        try:
+            period = month_period(month)
+        except ValueError:
+            raise CommandError(f"Invalid --month: {month}")
+        prefix = month
+        if options["granularity"] == "quarter":
+            period = quarter_period(period.start.year, (period.start.month - 1) // 3 + 1)
+            prefix = None
+        elif options["granularity"] == "year":
+            period = year_period(period.start.year)
+            prefix = month[:4]
+
+        self.stdout.write(f"Database: {connection.vendor}; period: {period.label} [{period.start}, {period.end})\n")
+        for kind, (model, entity_field) in SNAPSHOT_MODELS.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {model.__name__} =="))
+            base = model.objects.order_by().values_list(entity_field, flat=True)
+            if prefix:
+                self._report("startswith", base.filter(snapshot_month__startswith=prefix), options["repeat"])
+            self._report("range", filter_period(base, period), options["repeat"])
+
+    def _report(self, label, queryset, repeat):
+        plan = queryset.explain()
+        rows = len(list(queryset.all()))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            # .all() clones the queryset so every pass hits the database.
+            list(queryset.all())
+        elapsed_ms = (time.perf_counter() - started) * 1000 / max(repeat, 1)
+        self.stdout.write(f"-- {label}: {rows} row(s), {elapsed_ms:.2f} ms avg")
+        for line in plan.splitlines():
+            self.stdout.write(f"   {line}")
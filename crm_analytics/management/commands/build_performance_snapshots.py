@@ -0,0 +1,59 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm_analytics.snapshots import SNAPSHOT_BUILDERS, add_months, rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild MR, doctor, distributor and product performance snapshots for a month range."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from",
+            dest="first_month",
+            help="First month to rebuild (YYYY-MM). Defaults to --months before the current month.",
+        )
+        parser.add_argument(
+            "--to",
+            dest="last_month",
+            help="Last month to rebuild (YYYY-MM). Defaults to the current month.",
+        )
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=12,
+            help="Number of trailing months to rebuild when --from is not given (default: 12).",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=sorted(SNAPSHOT_BUILDERS),
+            help="Restrict the rebuild to one snapshot type. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        last_month = self._parse_month(options["last_month"]) or timezone.localdate().replace(day=1)
+        first_month = self._parse_month(options["first_month"]) or add_months(last_month, 1 - options["months"])
+        if first_month > last_month:
+            raise CommandError("--from must not be after --to.")
+
+        started = time.perf_counter()
+        results = rebuild_snapshots(first_month, last_month, kinds=options["only"])
+        elapsed = time.perf_counter() - started
+
+        for kind, (written, pruned) in results.items():
+            self.stdout.write(f"{kind}: {written} snapshot(s) written, {pruned} stale row(s) removed")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {first_month:%b %Y} – {last_month:%b %Y} in {elapsed:.2f}s."
+        ))
+
+    def _parse_month(self, value):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(f"{value}-01")
+        except ValueError:
+            raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
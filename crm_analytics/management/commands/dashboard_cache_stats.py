@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from crm_analytics.cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show the CRM dashboard cache hit/miss counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.2%}"
+        )
+        if options["reset"]:
+            reset_cache_stats()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,56 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_analytics.cache import invalidate_live
+from crm_analytics.forecasting import DEFAULT_HORIZON, generate_demand_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit demand models for every product (and region with regional history) "
+        "from monthly unit sales and rewrite the DemandForecast table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--as-of",
+            dest="last_month",
+            help="Last month of history to fit on (YYYY-MM). Defaults to the last complete month.",
+        )
+        parser.add_argument(
+            "--from",
+            dest="first_month",
+            help="First month of history (YYYY-MM). Defaults to the earliest month with sales.",
+        )
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=DEFAULT_HORIZON,
+            help=f"Months to forecast (default: {DEFAULT_HORIZON}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["horizon"] < 1:
+            raise CommandError("--horizon must be at least 1.")
+        last_month = self._parse_month(options["last_month"])
+        first_month = self._parse_month(options["first_month"])
+        if first_month and last_month and first_month > last_month:
+            raise CommandError("--from must not be after --as-of.")
+
+        started = time.perf_counter()
+        series = generate_demand_forecasts(last_month, options["horizon"], first_month)
+        elapsed = time.perf_counter() - started
+        invalidate_live()
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {series} series × {options['horizon']} month(s) in {elapsed:.2f}s."
+        ))
+
+    def _parse_month(self, value):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(f"{value}-01")
+        except ValueError:
+            raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
@@ -0,0 +1,39 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_analytics.alerts import generate_expiry_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Create 6-month, 3-month, 1-month and expired alerts for batches and distributor stock. "
+        "Safe to run repeatedly: existing alerts are never duplicated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Evaluate expiry windows as of this date (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=["batch", "distributor_stock"],
+            help="Limit to one source. Can be given more than once.",
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"]:
+            try:
+                today = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError(f"Invalid --date: {options['date']}")
+
+        started = time.monotonic()
+        results = generate_expiry_alerts(today=today, sources=options["only"])
+        for source, created in results.items():
+            self.stdout.write(f"{source}: {created} alert(s) created")
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.1f}s."))
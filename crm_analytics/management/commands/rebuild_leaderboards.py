@@ -0,0 +1,55 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm_analytics.cache import invalidate_months
+from crm_analytics.leaderboards import LEADERBOARDS, rebuild_leaderboard
+from crm_analytics.snapshots import add_months, iter_months
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed top-K leaderboards from the snapshot tables. "
+        "The snapshot refresh keeps them current; run this after bulk edits that bypass it, "
+        "such as reassigning MRs or doctors to another territory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first_month", help="First month (YYYY-MM). Defaults to --months before --to.")
+        parser.add_argument("--to", dest="last_month", help="Last month (YYYY-MM). Defaults to the current month.")
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=12,
+            help="Number of trailing months to rebuild when --from is not given (default: 12).",
+        )
+        parser.add_argument(
+            "--metric",
+            action="append",
+            choices=sorted(LEADERBOARDS),
+            help="Restrict the rebuild to one metric. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        last_month = self._parse_month(options["last_month"]) or timezone.localdate().replace(day=1)
+        first_month = self._parse_month(options["first_month"]) or add_months(last_month, 1 - options["months"])
+        if first_month > last_month:
+            raise CommandError("--from must not be after --to.")
+
+        months = list(iter_months(first_month, last_month))
+        for metric in options["metric"] or LEADERBOARDS:
+            started = time.perf_counter()
+            boards = sum(rebuild_leaderboard(metric, month) for month in months)
+            boards += rebuild_leaderboard(metric)
+            self.stdout.write(f"{metric}: {boards} board(s) in {time.perf_counter() - started:.2f}s")
+        invalidate_months(months)
+
+    def _parse_month(self, value):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(f"{value}-01")
+        except ValueError:
+            raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from crm_analytics.snapshots import refresh_dirty_snapshots
+
+
+class Command(BaseCommand):
+    help = "Recompute performance snapshots for the (entity, month) keys queued by recent writes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10000,
+            help="Maximum number of dirty keys to process per pass (default: 10000).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and poll for new dirty keys every N seconds. Runs a single pass when omitted.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = refresh_dirty_snapshots(limit=options["limit"])
+            # Drain a backlog before sleeping.
+            while processed == options["limit"]:
+                self.stdout.write(f"Refreshed {processed} dirty key(s).")
+                processed = refresh_dirty_snapshots(limit=options["limit"])
+            if processed:
+                self.stdout.write(f"Refreshed {processed} dirty key(s).")
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
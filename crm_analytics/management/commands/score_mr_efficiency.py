@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from crm_analytics.cache import invalidate_months
+from crm_analytics.leaderboards import update_leaderboard
+from crm_analytics.scoring import compute_scores, load_month_columns, write_scores
+from crm_analytics.snapshots import iter_months, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute MR working_efficiency_score (percentile ranks within the territory level set by "
+        "MR_EFFICIENCY_TERRITORY) for one or more months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first_month", help="First month (YYYY-MM). Defaults to the current month.")
+        parser.add_argument("--to", dest="last_month", help="Last month (YYYY-MM). Defaults to --from.")
+
+    def handle(self, *args, **options):
+        try:
+            first = month_start(f"{options['first_month']}-01") if options["first_month"] else month_start(timezone.localdate())
+            last = month_start(f"{options['last_month']}-01") if options["last_month"] else first
+        except ValueError:
+            raise CommandError("Months must be given as YYYY-MM.")
+
+        months = list(iter_months(first, last))
+        for month in months:
+            started = time.perf_counter()
+            columns = load_month_columns(month)
+            loaded = time.perf_counter()
+            scores = compute_scores(columns)
+            computed = time.perf_counter()
+            with transaction.atomic():
+                write_scores(columns["id"], scores)
+            written = time.perf_counter()
+            self.stdout.write(
+                f"{month:%Y-%m}: {len(scores)} MR(s) scored — load {1000 * (loaded - started):.1f} ms, "
+                f"compute {1000 * (computed - loaded):.1f} ms, write {1000 * (written - computed):.1f} ms"
+            )
+            # Refresh the efficiency figures shown on the MR leaderboards.
+            update_leaderboard("mr_visits", month, [], include_stored=True)
+
+        if months:
+            update_leaderboard("mr_visits", None, [], include_stored=True)
+            invalidate_months(months)
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0001_initial'),
+        ('crm_distributors', '0001_initial'),
+        ('crm_products', '0003_alter_productmaster_product_name'),
+        ('crm_sales', '0004_remove_area_region_area_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productperformancesnapshot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddConstraint(
+            model_name='productperformancesnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'distributor', 'snapshot_month'), name='unique_product_distributor_snapshot_month'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0002_product_snapshot_upsert_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotDirtyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('mr', 'Medical Representative'), ('doctor', 'Doctor'), ('distributor', 'Distributor'), ('product', 'Product')], max_length=15)),
+                ('entity_id', models.PositiveBigIntegerField()),
+                ('snapshot_month', models.DateField()),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Dirty Key',
+                'verbose_name_plural': 'Snapshot Dirty Keys',
+                'ordering': ['marked_at'],
+                'unique_together': {('entity', 'entity_id', 'snapshot_month')},
+            },
+        ),
+    ]
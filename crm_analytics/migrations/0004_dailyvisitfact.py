@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0003_snapshotdirtykey'),
+        ('crm_doctors', '0004_alter_doctorvisit_visit_type'),
+        ('crm_sales', '0004_remove_area_region_area_region'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='snapshotdirtykey',
+            name='entity',
+            field=models.CharField(choices=[('mr', 'Medical Representative'), ('doctor', 'Doctor'), ('distributor', 'Distributor'), ('product', 'Product'), ('visit_fact', 'Daily Visit Facts (per MR)')], max_length=15),
+        ),
+        migrations.CreateModel(
+            name='DailyVisitFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fact_date', models.DateField()),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('gps_verified_count', models.PositiveIntegerField(default=0)),
+                ('samples_given', models.PositiveIntegerField(default=0)),
+                ('estimated_value', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('investment', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_visit_facts', to='crm_sales.area')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visit_facts', to='crm_doctors.doctor')),
+                ('mr', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visit_facts', to='crm_sales.medicalrepresentative')),
+            ],
+            options={
+                'verbose_name': 'Daily Visit Fact',
+                'verbose_name_plural': 'Daily Visit Facts',
+                'ordering': ['-fact_date'],
+                'indexes': [models.Index(fields=['mr', 'fact_date'], name='visitfact_mr_date_idx'), models.Index(fields=['doctor', 'fact_date'], name='visitfact_doctor_date_idx'), models.Index(fields=['area', 'fact_date'], name='visitfact_area_date_idx')],
+                'unique_together': {('fact_date', 'mr', 'doctor')},
+            },
+        ),
+    ]
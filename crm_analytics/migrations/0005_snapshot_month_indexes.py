@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0004_dailyvisitfact'),
+        ('crm_distributors', '0001_initial'),
+        ('crm_doctors', '0004_alter_doctorvisit_visit_type'),
+        ('crm_products', '0004_stockposition'),
+        ('crm_sales', '0004_remove_area_region_area_region'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='distributorperformancesnapshot',
+            index=models.Index(fields=['snapshot_month', 'distributor'], name='distsnap_month_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorperformancesnapshot',
+            index=models.Index(fields=['snapshot_month', 'doctor'], name='doctorsnap_month_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mrperformancesnapshot',
+            index=models.Index(fields=['snapshot_month', 'mr'], name='mrsnap_month_mr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productperformancesnapshot',
+            index=models.Index(fields=['snapshot_month', 'product'], name='productsnap_month_product_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0005_snapshot_month_indexes'),
+        ('crm_distributors', '0001_initial'),
+        ('crm_products', '0004_stockposition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expiryalert',
+            name='dedupe_key',
+            field=models.CharField(blank=True, editable=False, max_length=120, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expiryalert',
+            constraint=models.UniqueConstraint(fields=('dedupe_key',), name='unique_expiry_alert_dedupe_key'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:37
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0006_expiryalert_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('mr_visits', 'MRs by Visits'), ('doctor_visits', 'Doctors by Visits Received'), ('distributor_sales', 'Distributors by Sales Value'), ('product_revenue', 'Products by Revenue')], max_length=20)),
+                ('period', models.CharField(max_length=7)),
+                ('territory_level', models.CharField(choices=[('all', 'All Territories'), ('division', 'Division'), ('region', 'Region'), ('area', 'Area')], default='all', max_length=10)),
+                ('territory_id', models.PositiveBigIntegerField(default=0)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('entity_id', models.PositiveBigIntegerField()),
+                ('row', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Leaderboard Entry',
+                'verbose_name_plural': 'Leaderboard Entries',
+                'ordering': ['metric', 'period', 'territory_level', 'territory_id', 'rank'],
+                'indexes': [models.Index(fields=['metric', 'period', 'entity_id'], name='leaderboard_entity_idx')],
+                'unique_together': {('metric', 'period', 'territory_level', 'territory_id', 'rank')},
+            },
+        ),
+    ]
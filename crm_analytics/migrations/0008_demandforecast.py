@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0007_leaderboardentry'),
+        ('crm_products', '0004_stockposition'),
+        ('crm_sales', '0004_remove_area_region_area_region'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forecast_month', models.DateField()),
+                ('method', models.CharField(choices=[('ses', 'Exponential Smoothing'), ('seasonal_naive', 'Seasonal Naive')], max_length=20)),
+                ('forecast_units', models.PositiveIntegerField(default=0)),
+                ('alpha', models.DecimalField(blank=True, decimal_places=2, help_text='Smoothing factor (exponential smoothing only)', max_digits=3, null=True)),
+                ('mean_absolute_error', models.DecimalField(blank=True, decimal_places=2, help_text='Mean absolute one-step-ahead error over the history, in units', max_digits=12, null=True)),
+                ('history_months', models.PositiveSmallIntegerField(default=0)),
+                ('based_on_month', models.DateField(help_text='Last month of history the forecast was fitted on')),
+                ('generated_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='crm_products.productmaster')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='crm_sales.region')),
+            ],
+            options={
+                'verbose_name': 'Demand Forecast',
+                'verbose_name_plural': 'Demand Forecasts',
+                'ordering': ['forecast_month', 'product__product_name'],
+                'indexes': [models.Index(fields=['forecast_month', 'region', 'product'], name='forecast_month_region_idx'), models.Index(fields=['product', 'forecast_month'], name='forecast_product_month_idx')],
+            },
+        ),
+    ]
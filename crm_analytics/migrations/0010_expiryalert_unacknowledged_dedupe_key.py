@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_analytics', '0009_create_cache_table'),
+        ('crm_distributors', '0001_initial'),
+        ('crm_products', '0004_stockposition'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='expiryalert',
+            name='unique_expiry_alert_dedupe_key',
+        ),
+        migrations.AddConstraint(
+            model_name='expiryalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_acknowledged', False)), fields=('dedupe_key',), name='unique_expiry_alert_dedupe_key'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from crm_products.models import ProductMaster, Division
 from crm_sales.models import MedicalRepresentative, Region, Area
@@ -70,6 +71,9 @@ class MRPerformanceSnapshot(models.Model):
     class Meta:
         unique_together = ('mr', 'snapshot_month')
         ordering = ['-snapshot_month', 'mr__name']
+        indexes = [
+            models.Index(fields=['snapshot_month', 'mr'], name='mrsnap_month_mr_idx'),
+        ]
         verbose_name = 'MR Performance Snapshot'
         verbose_name_plural = 'MR Performance Snapshots'
 
@@ -121,6 +125,9 @@ class DoctorPerformanceSnapshot(models.Model):
     class Meta:
         unique_together = ('doctor', 'snapshot_month')
         ordering = ['-snapshot_month']
+        indexes = [
+            models.Index(fields=['snapshot_month', 'doctor'], name='doctorsnap_month_doctor_idx'),
+        ]
         verbose_name = 'Doctor Performance Snapshot'
         verbose_name_plural = 'Doctor Performance Snapshots'
 
@@ -169,6 +176,9 @@ class DistributorPerformanceSnapshot(models.Model):
     class Meta:
         unique_together = ('distributor', 'snapshot_month')
         ordering = ['-snapshot_month']
+        indexes = [
+            models.Index(fields=['snapshot_month', 'distributor'], name='distsnap_month_dist_idx'),
+        ]
         verbose_name = 'Distributor Performance Snapshot'
         verbose_name_plural = 'Distributor Performance Snapshots'
 
@@ -178,6 +188,15 @@ class DistributorPerformanceSnapshot(models.Model):
             f"{self.snapshot_month.strftime('%b %Y')}"
         )
 
+    def compute_efficiency_percentage(self):
+        total_stock = self.total_units_sold + self.total_unsold_stock + self.total_expired_stock
+        if total_stock > 0:
+            self.efficiency_percentage = round(
+                (self.total_units_sold / total_stock) * 100, 2
+            )
+        else:
+            self.efficiency_percentage = 0.00
+
 
 class ProductPerformanceSnapshot(models.Model):
     """
@@ -225,9 +244,21 @@ class ProductPerformanceSnapshot(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-snapshot_month', 'product__product_name']
+        constraints = [
+            # Rows without a distributor (region / MR drill-downs) are left
+            # unconstrained because NULLs never conflict.
+            models.UniqueConstraint(
+                fields=['product', 'distributor', 'snapshot_month'],
+                name='unique_product_distributor_snapshot_month',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['snapshot_month', 'product'], name='productsnap_month_product_idx'),
+        ]
         verbose_name = 'Product Performance Snapshot'
         verbose_name_plural = 'Product Performance Snapshots'
 
@@ -245,7 +276,7 @@ class ProductPerformanceSnapshot(models.Model):
 class ExpiryAlert(models.Model):
     """
     System-generated expiry alerts for company stock, distributor stock, and batches.
-    Created automatically by scheduled tasks (Celery / management command).
+    Created by the generate_expiry_alerts management command (crm_analytics/alerts.py).
     """
 
     ALERT_TYPE_CHOICES = [
@@ -296,8 +327,19 @@ class ExpiryAlert(models.Model):
 
     alert_sent_at = models.DateTimeField(auto_now_add=True)
 
+    # source:batch:distributor:alert_type — one pending alert per window per
+    # stock line; once acknowledged, the line can be alerted again.
+    # NULL for manually created alerts, which are never deduplicated.
+    dedupe_key = models.CharField(max_length=120, blank=True, null=True, editable=False)
+
     class Meta:
         ordering = ['-alert_sent_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(is_acknowledged=False),
+                name='unique_expiry_alert_dedupe_key',
+            ),
+        ]
         verbose_name = 'Expiry Alert'
         verbose_name_plural = 'Expiry Alerts'
 
@@ -311,4 +353,218 @@ class ExpiryAlert(models.Model):
         self.is_acknowledged = True
         self.acknowledged_at = timezone.now()
         self.acknowledged_by = user_name
-        self.save(update_fields=['is_acknowledged', 'acknowledged_at', 'acknowledged_by'])
\ No newline at end of file
+        self.save(update_fields=['is_acknowledged', 'acknowledged_at', 'acknowledged_by'])
+
+# ============================================================
+# DAILY VISIT FACTS
+# ============================================================
+
+class DailyVisitFact(models.Model):
+    """
+    Visit activity pre-aggregated per (date, MR, doctor, area).
+    Lets week / quarter / YTD / custom-range reports sum a few hundred rows
+    instead of joining DoctorVisit with its product details and investments.
+    ``area`` is the doctor's area when the row was built.
+    """
+
+    fact_date = models.DateField()
+    mr = models.ForeignKey(
+        MedicalRepresentative,
+        on_delete=models.CASCADE,
+        related_name='daily_visit_facts'
+    )
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name='daily_visit_facts'
+    )
+    area = models.ForeignKey(
+        Area,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='daily_visit_facts'
+    )
+
+    visit_count = models.PositiveIntegerField(default=0)
+    gps_verified_count = models.PositiveIntegerField(default=0)
+    samples_given = models.PositiveIntegerField(default=0)
+    estimated_value = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0.00
+    )
+    investment = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0.00
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # area follows from doctor, so it is not needed for uniqueness.
+        unique_together = ('fact_date', 'mr', 'doctor')
+        ordering = ['-fact_date']
+        indexes = [
+            models.Index(fields=['mr', 'fact_date'], name='visitfact_mr_date_idx'),
+            models.Index(fields=['doctor', 'fact_date'], name='visitfact_doctor_date_idx'),
+            models.Index(fields=['area', 'fact_date'], name='visitfact_area_date_idx'),
+        ]
+        verbose_name = 'Daily Visit Fact'
+        verbose_name_plural = 'Daily Visit Facts'
+
+    def __str__(self):
+        return f"{self.fact_date} — MR #{self.mr_id} / Dr. #{self.doctor_id}"
+
+
+# ============================================================
+# SNAPSHOT REFRESH QUEUE
+# ============================================================
+
+class SnapshotDirtyKey(models.Model):
+    """
+    (entity, month) keys whose performance snapshot is out of date.
+    Written by model signals on every save/delete of the source tables and
+    drained by the refresh_dirty_snapshots management command.
+    """
+
+    ENTITY_CHOICES = [
+        ('mr', 'Medical Representative'),
+        ('doctor', 'Doctor'),
+        ('distributor', 'Distributor'),
+        ('product', 'Product'),
+        ('visit_fact', 'Daily Visit Facts (per MR)'),
+    ]
+
+    entity = models.CharField(max_length=15, choices=ENTITY_CHOICES)
+    entity_id = models.PositiveBigIntegerField()
+    snapshot_month = models.DateField()
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('entity', 'entity_id', 'snapshot_month')
+        ordering = ['marked_at']
+        verbose_name = 'Snapshot Dirty Key'
+        verbose_name_plural = 'Snapshot Dirty Keys'
+
+    def __str__(self):
+        return f"{self.entity} #{self.entity_id} — {self.snapshot_month.strftime('%b %Y')}"
+
+
+# ============================================================
+# LEADERBOARDS
+# ============================================================
+
+class LeaderboardEntry(models.Model):
+    """
+    One ranked row of a precomputed top-K list per (metric, period, territory).
+    ``period`` is ``YYYY-MM`` or ``all``; the nationwide board uses
+    territory_level ``all`` with territory_id 0. ``row`` holds the aggregated
+    snapshot values the dashboard widgets render, so a read is K rows.
+    Maintained by crm_analytics/leaderboards.py.
+    """
+
+    METRIC_CHOICES = [
+        ('mr_visits', 'MRs by Visits'),
+        ('doctor_visits', 'Doctors by Visits Received'),
+        ('distributor_sales', 'Distributors by Sales Value'),
+        ('product_revenue', 'Products by Revenue'),
+    ]
+
+    TERRITORY_LEVEL_CHOICES = [
+        ('all', 'All Territories'),
+        ('division', 'Division'),
+        ('region', 'Region'),
+        ('area', 'Area'),
+    ]
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    period = models.CharField(max_length=7)
+    territory_level = models.CharField(max_length=10, choices=TERRITORY_LEVEL_CHOICES, default='all')
+    territory_id = models.PositiveBigIntegerField(default=0)
+    rank = models.PositiveSmallIntegerField()
+
+    entity_id = models.PositiveBigIntegerField()
+    row = models.JSONField(encoder=DjangoJSONEncoder)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('metric', 'period', 'territory_level', 'territory_id', 'rank')
+        ordering = ['metric', 'period', 'territory_level', 'territory_id', 'rank']
+        indexes = [
+            models.Index(fields=['metric', 'period', 'entity_id'], name='leaderboard_entity_idx'),
+        ]
+        verbose_name = 'Leaderboard Entry'
+        verbose_name_plural = 'Leaderboard Entries'
+
+    def __str__(self):
+        return f"{self.metric} {self.period} {self.territory_level}#{self.territory_id} — #{self.rank}"
+
+
+# ============================================================
+# DEMAND FORECASTS
+# ============================================================
+
+class DemandForecast(models.Model):
+    """
+    Forecast monthly unit demand per product (and region when regional
+    history exists; null = all regions) for batch manufacturing planning.
+    Regenerated as a whole by the forecast_product_demand command.
+    """
+
+    METHOD_CHOICES = [
+        ('ses', 'Exponential Smoothing'),
+        ('seasonal_naive', 'Seasonal Naive'),
+    ]
+
+    product = models.ForeignKey(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        related_name='demand_forecasts'
+    )
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='demand_forecasts'
+    )
+    forecast_month = models.DateField()
+
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES)
+    forecast_units = models.PositiveIntegerField(default=0)
+    alpha = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Smoothing factor (exponential smoothing only)"
+    )
+    mean_absolute_error = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Mean absolute one-step-ahead error over the history, in units"
+    )
+    history_months = models.PositiveSmallIntegerField(default=0)
+    based_on_month = models.DateField(help_text="Last month of history the forecast was fitted on")
+
+    generated_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['forecast_month', 'product__product_name']
+        indexes = [
+            models.Index(fields=['forecast_month', 'region', 'product'], name='forecast_month_region_idx'),
+            models.Index(fields=['product', 'forecast_month'], name='forecast_product_month_idx'),
+        ]
+        verbose_name = 'Demand Forecast'
+        verbose_name_plural = 'Demand Forecasts'
+
+    def __str__(self):
+        return (
+            f"{self.product.product_name} — "
+            f"{self.forecast_month.strftime('%b %Y')}: {self.forecast_units} units"
+        )
@@ -0,0 +1,108 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/periods.py
+# Shared period filter layer for the analytics pages.
+# Month / quarter / year selectors become half-open [start, end) date
+# ranges, so snapshot_month filters stay sargable and use the
+# (snapshot_month, entity) indexes instead of a LIKE on a cast.
+# Week, year-to-date and custom ranges need not align with months; their
+# visit totals come from DailyVisitFact (see crm_analytics/facts.py).
+# ============================================================
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from .snapshots import add_months, month_start
+
+
+QUARTER_CHOICES = [(1, 'Q1'), (2, 'Q2'), (3, 'Q3'), (4, 'Q4')]
+
+
+@dataclass(frozen=True)
+class Period:
+    start: date
+    end: date           # exclusive
+    label: str
+
+
+def month_period(value):
+    """``'YYYY-MM'`` → Period. Raises ValueError on bad input."""
+    start = date.fromisoformat(f'{value}-01')
+    return Period(start, add_months(start, 1), start.strftime('%B %Y'))
+
+
+def quarter_period(year, quarter):
+    year, quarter = int(year), int(quarter)
+    if not 1 <= quarter <= 4:
+        raise ValueError(f'Invalid quarter: {quarter}')
+    start = date(year, 3 * (quarter - 1) + 1, 1)
+    return Period(start, add_months(start, 3), f'Q{quarter} {year}')
+
+
+def year_period(year):
+    year = int(year)
+    return Period(date(year, 1, 1), date(year + 1, 1, 1), str(year))
+
+
+def week_period(value):
+    """``'YYYY-Www'`` (ISO week, as sent by ``<input type="week">``) → Period."""
+    year, week = value.split('-W')
+    start = date.fromisocalendar(int(year), int(week), 1)
+    return Period(start, start + timedelta(days=7), f'Week {int(week)} {year}')
+
+
+def ytd_period(today=None):
+    """1 January up to and including ``today``."""
+    today = today or timezone.localdate()
+    return Period(date(today.year, 1, 1), today + timedelta(days=1), f'{today.year} to date')
+
+
+def custom_period(start, end):
+    """Inclusive ``start`` / ``end`` ISO dates → Period. Raises ValueError on bad input."""
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    if end < start:
+        raise ValueError(f'Range ends before it starts: {start} – {end}')
+    return Period(start, end + timedelta(days=1), f'{start:%d %b %Y} – {end:%d %b %Y}')
+
+
+def period_from_params(params):
+    """
+    Resolve ``start``/``end`` (a custom range), ``week`` (YYYY-Www),
+    ``month`` (YYYY-MM), ``quarter`` (1-4, with ``year``), ``ytd`` or
+    ``year`` from a QueryDict, most specific first. Returns None when no
+    valid selector is present.
+    """
+    start = params.get('start', '')
+    end = params.get('end', '')
+    week = params.get('week', '')
+    month = params.get('month', '')
+    year = params.get('year', '')
+    quarter = params.get('quarter', '')
+    try:
+        if start and end:
+            return custom_period(start, end)
+        if week:
+            return week_period(week)
+        if month:
+            return month_period(month)
+        if year and quarter:
+            return quarter_period(year, quarter)
+        if params.get('ytd'):
+            return ytd_period()
+        if year:
+            return year_period(year)
+    except ValueError:
+        pass
+    return None
+
+
+def filter_period(queryset, period, field='snapshot_month'):
+    """
+    Restrict ``queryset`` to the snapshot months overlapping ``period``.
+    Month-aligned periods match exactly; a week or custom range keeps the
+    whole months it touches.
+    """
+    if period is None:
+        return queryset
+    return queryset.filter(**{f'{field}__gte': month_start(period.start), f'{field}__lt': period.end})
@@ -0,0 +1,145 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/scoring.py
+# MR working-efficiency scoring.
+# A month's MR snapshots are loaded as columnar numpy arrays, every metric
+# is turned into a percentile rank within the MR's territory in one
+# vectorized pass, and the weighted composite (0–100) is written back
+# with bulk_update.
+# The territory level comes from settings.MR_EFFICIENCY_TERRITORY, so the
+# snapshot refresh and the score_mr_efficiency command rank alike.
+# ============================================================
+
+from decimal import Decimal
+
+import numpy as np
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import MRPerformanceSnapshot
+
+
+BATCH_SIZE = 2000
+
+# Metric weights for working_efficiency_score; they sum to 1.
+WEIGHTS = {
+    'visits': 0.30,
+    'coverage': 0.25,
+    'gps': 0.20,
+    'net_value': 0.25,
+}
+
+TERRITORY_FIELDS = {
+    'division': 'mr__division_id',
+    'region': 'mr__region_id',
+    'area': 'mr__area_id',
+}
+
+SNAPSHOT_COLUMNS = (
+    'id', 'territory', 'total_visits', 'unique_doctors_visited', 'total_doctors_covered',
+    'gps_verified_percentage', 'total_prescription_value_generated', 'total_investment_given',
+)
+
+
+def territory_field(territory=None):
+    """Snapshot lookup of ``territory`` (settings.MR_EFFICIENCY_TERRITORY when None)."""
+    territory = territory or settings.MR_EFFICIENCY_TERRITORY
+    try:
+        return TERRITORY_FIELDS[territory]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'MR_EFFICIENCY_TERRITORY must be one of {", ".join(sorted(TERRITORY_FIELDS))}, not {territory!r}.'
+        ) from None
+
+
+def load_month_columns(month, territory=None):
+    """Return ``{column: ndarray}`` for every MR snapshot of ``month``."""
+    rows = list(
+        MRPerformanceSnapshot.objects.filter(snapshot_month=month)
+        .order_by()
+        .values_list('id', territory_field(territory), *SNAPSHOT_COLUMNS[2:])
+    )
+    if not rows:
+        return {name: np.empty(0) for name in SNAPSHOT_COLUMNS}
+    columns = list(zip(*rows))
+    arrays = {
+        'id': np.fromiter(columns[0], dtype=np.int64),
+        # MRs without a territory are ranked together.
+        'territory': np.array([-1 if t is None else t for t in columns[1]], dtype=np.int64),
+    }
+    for name, values in zip(SNAPSHOT_COLUMNS[2:], columns[2:]):
+        arrays[name] = np.array(values, dtype=np.float64)
+    return arrays
+
+
+def grouped_percentile_ranks(groups, values):
+    """
+    Percentile rank (0–1) of every value within its group, ties sharing
+    their average rank. Single-member groups rank 0.5.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    positions = np.arange(n, dtype=np.float64)
+
+    group_break = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    tie_break = group_break | np.r_[True, sorted_values[1:] != sorted_values[:-1]]
+
+    tie_id = np.cumsum(tie_break) - 1
+    tie_start = positions[tie_break]
+    tie_size = np.bincount(tie_id)
+    average_position = tie_start[tie_id] + (tie_size[tie_id] - 1) / 2
+
+    group_id = np.cumsum(group_break) - 1
+    group_start = positions[group_break][group_id]
+    group_size = np.bincount(group_id)[group_id]
+
+    ranks = np.full(n, 0.5)
+    multi = group_size > 1
+    ranks[multi] = (average_position[multi] - group_start[multi]) / (group_size[multi] - 1)
+
+    result = np.empty(n)
+    result[order] = ranks
+    return result
+
+
+def compute_scores(columns):
+    """Vectorized composite score (0–100, two decimals) for the loaded columns."""
+    groups = columns['territory']
+    covered = columns['total_doctors_covered']
+    coverage = np.divide(
+        columns['unique_doctors_visited'], covered,
+        out=np.zeros_like(covered), where=covered > 0,
+    )
+    metrics = {
+        'visits': columns['total_visits'],
+        'coverage': coverage,
+        'gps': columns['gps_verified_percentage'],
+        'net_value': columns['total_prescription_value_generated'] - columns['total_investment_given'],
+    }
+    score = sum(weight * grouped_percentile_ranks(groups, metrics[name]) for name, weight in WEIGHTS.items())
+    return np.round(score * 100, 2)
+
+
+def write_scores(ids, scores):
+    """Bulk-update working_efficiency_score for the given snapshot ids."""
+    snapshots = [
+        MRPerformanceSnapshot(id=int(pk), working_efficiency_score=Decimal(f'{score:.2f}'))
+        for pk, score in zip(ids, scores)
+    ]
+    MRPerformanceSnapshot.objects.bulk_update(snapshots, ['working_efficiency_score'], batch_size=BATCH_SIZE)
+    return len(snapshots)
+
+
+def score_mr_month(month, territory=None):
+    """
+    Recompute working_efficiency_score for every MR snapshot of ``month``.
+    Returns the number of snapshots updated.
+    """
+    columns = load_month_columns(month, territory)
+    if not len(columns['id']):
+        return 0
+    return write_scores(columns['id'], compute_scores(columns))
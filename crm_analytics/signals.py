@@ -0,0 +1,255 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/signals.py
+# Queues snapshot dirty keys whenever a source row is saved or deleted,
+# or a doctor's assigned MRs change.
+# Keys are collected per transaction and written when it commits: a
+# single INSERT into SnapshotDirtyKey however many rows the transaction
+# touched. The snapshot rows themselves are recomputed by
+# refresh_dirty_snapshots.
+# Any write to the CRM source apps also invalidates the live dashboard
+# cache, once per transaction.
+# ============================================================
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.utils import timezone
+
+from crm_distributors.models import DistributorSalesValue, DistributorStockEntry
+from crm_doctors.models import Doctor, DoctorInvestment, DoctorVisit, VisitProductDetail
+
+from .cache import INVALIDATING_APPS, invalidate_live
+from .models import ExpiryAlert
+from .snapshots import add_months, mark_dirty, month_start
+
+
+# Fields that decide which (entity, month) keys a row contributes to.
+KEY_FIELDS = {
+    DoctorVisit: ('mr_id', 'doctor_id', 'visit_date'),
+    VisitProductDetail: ('visit_id',),
+    DoctorInvestment: ('visit_id',),
+    DistributorStockEntry: ('distributor_id', 'report_period_start'),
+    DistributorSalesValue: ('distributor_id', 'product_id', 'sale_date'),
+}
+
+
+# ------------------------------------------------------------
+# Per-transaction queue
+# ------------------------------------------------------------
+
+class _PendingWork:
+    """Keys, visits and cache invalidation queued by one atomic block."""
+
+    def __init__(self, savepoint_ids=()):
+        self.savepoint_ids = savepoint_ids
+        self.keys = set()
+        self.visit_ids = set()
+        self.invalidate = False
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+        keys = list(self.keys)
+        if self.visit_ids:
+            # Product details and investments take their visit's keys, read
+            # once for the whole transaction.
+            for visit in DoctorVisit.objects.filter(pk__in=self.visit_ids).values_list('mr_id', 'doctor_id', 'visit_date'):
+                keys += _visit_keys(*visit)
+        mark_dirty(keys)
+        if self.invalidate:
+            invalidate_live()
+
+
+def _pending(using=None):
+    """
+    The work queued by the current atomic block on ``using``, registered to
+    run once the transaction commits. Outside a transaction the caller
+    flushes it now.
+
+    One batch is kept per savepoint, so a rolled-back savepoint takes only
+    its own batch with it (on_commit drops its callbacks).
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return _PendingWork()
+    savepoint_ids = tuple(connection.savepoint_ids)
+    pending = getattr(connection, '_snapshot_pending_work', None)
+    if (
+        pending is None
+        or pending.flushed
+        or pending.savepoint_ids != savepoint_ids
+        or not any(func == pending.flush for _, func, _ in connection.run_on_commit)
+    ):
+        pending = connection._snapshot_pending_work = _PendingWork(savepoint_ids)
+        transaction.on_commit(pending.flush, using=using)
+    return pending
+
+
+def _queue(using=None, keys=(), visit_ids=(), invalidate=False):
+    connection = transaction.get_connection(using)
+    pending = _pending(using)
+    pending.keys.update(keys)
+    pending.visit_ids.update(visit_id for visit_id in visit_ids if visit_id is not None)
+    pending.invalidate |= invalidate
+    if not connection.in_atomic_block:
+        pending.flush()
+
+
+def invalidate_dashboard_on_commit(using=None):
+    """Invalidate the live dashboard cache once the current transaction commits."""
+    _queue(using, invalidate=True)
+
+
+def queue_coverage_keys(mr_ids, using=None):
+    """Queue the current month of MRs whose assigned doctors changed."""
+    today = timezone.localdate()
+    _queue(using, keys=[('mr', mr_id, month_start(today)) for mr_id in mr_ids])
+
+
+# ------------------------------------------------------------
+# Keys
+# ------------------------------------------------------------
+
+def _visit_keys(mr_id, doctor_id, visit_date):
+    if visit_date is None:
+        return []
+    month = month_start(visit_date)
+    return [('mr', mr_id, month), ('doctor', doctor_id, month), ('visit_fact', mr_id, month)]
+
+
+def _keys_for(model, values):
+    """``(keys, visit_ids)`` for a row's key field values."""
+    if model is DoctorVisit:
+        return _visit_keys(*values), []
+
+    if model in (VisitProductDetail, DoctorInvestment):
+        return [], list(values)
+
+    if model is DistributorStockEntry:
+        distributor_id, period_start = values
+        return ([('distributor', distributor_id, month_start(period_start))] if period_start else []), []
+
+    distributor_id, product_id, sale_date = values
+    if not sale_date:
+        return [], []
+    month = month_start(sale_date)
+    # The following month's growth_percentage depends on this month's revenue.
+    return [
+        ('distributor', distributor_id, month),
+        ('product', product_id, month),
+        ('product', product_id, add_months(month, 1)),
+    ], []
+
+
+def _current_values(instance):
+    if isinstance(instance, (VisitProductDetail, DoctorInvestment)) and type(instance).visit.is_cached(instance):
+        visit = instance.visit
+        return (visit.mr_id, visit.doctor_id, visit.visit_date), DoctorVisit
+    return tuple(getattr(instance, field) for field in KEY_FIELDS[type(instance)]), type(instance)
+
+
+def _changed_keys(model, instance, current_values, current_model):
+    """Keys and visit ids for ``instance`` now and, if its key fields moved, where it was."""
+    keys, visit_ids = _keys_for(current_model, current_values)
+    current = tuple(getattr(instance, field) for field in KEY_FIELDS[model])
+    origin = getattr(instance, '_snapshot_origin', None)
+    if origin and None not in origin and origin != current:
+        old_keys, old_visit_ids = _keys_for(model, origin)
+        keys, visit_ids = keys + old_keys, visit_ids + old_visit_ids
+    instance._snapshot_origin = current
+    return keys, visit_ids
+
+
+def remember_snapshot_keys(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    # Read straight from __dict__ so deferred fields are never loaded here.
+    instance._snapshot_origin = tuple(instance.__dict__.get(field) for field in KEY_FIELDS[sender])
+
+
+def queue_saved_snapshot_keys(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    values, keys_model = _current_values(instance)
+    keys, visit_ids = _changed_keys(sender, instance, values, keys_model)
+    _queue(using, keys, visit_ids)
+
+
+def queue_bulk_snapshot_keys(model, instances, using=None):
+    """
+    queue_saved_snapshot_keys for rows written with bulk_create / bulk_update,
+    which send no post_save.
+    """
+    keys, visit_ids = [], []
+    for instance in instances:
+        current = tuple(getattr(instance, field) for field in KEY_FIELDS[model])
+        instance_keys, instance_visit_ids = _changed_keys(model, instance, current, model)
+        keys += instance_keys
+        visit_ids += instance_visit_ids
+    _queue(using, keys, visit_ids)
+
+
+def queue_deleted_snapshot_keys(sender, instance, using=None, **kwargs):
+    # A visit deleted along with its details (a cascade) is gone by commit
+    # time, but its own post_delete has queued the same keys.
+    values, keys_model = _current_values(instance)
+    keys, visit_ids = _keys_for(keys_model, values)
+    _queue(using, keys, visit_ids)
+
+
+def queue_coverage_snapshot_keys(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """
+    Doctor.assigned_mrs feeds MRPerformanceSnapshot.total_doctors_covered,
+    which holds the current coverage, so the MRs' current month is queued.
+    """
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_mr_ids = list(instance.assigned_mrs.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        mr_ids = [instance.pk]
+    elif action == 'post_clear':
+        mr_ids = getattr(instance, '_cleared_mr_ids', [])
+    else:
+        mr_ids = pk_set or []
+    queue_coverage_keys(mr_ids, using)
+
+
+for _model in KEY_FIELDS:
+    post_init.connect(remember_snapshot_keys, sender=_model, dispatch_uid=f'snapshot_origin_{_model.__name__}')
+    post_save.connect(queue_saved_snapshot_keys, sender=_model, dispatch_uid=f'snapshot_save_{_model.__name__}')
+    post_delete.connect(queue_deleted_snapshot_keys, sender=_model, dispatch_uid=f'snapshot_delete_{_model.__name__}')
+
+m2m_changed.connect(
+    queue_coverage_snapshot_keys, sender=Doctor.assigned_mrs.through, dispatch_uid='snapshot_doctor_coverage',
+)
+
+
+# ------------------------------------------------------------
+# Dashboard cache
+# ------------------------------------------------------------
+
+def invalidate_dashboard_cache(sender, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard_on_commit(using)
+
+
+def invalidate_dashboard_cache_m2m(sender, action, using=None, **kwargs):
+    if action.startswith('post_'):
+        invalidate_dashboard_on_commit(using)
+
+
+_dashboard_sources = [ExpiryAlert]
+for _label in INVALIDATING_APPS:
+    _dashboard_sources.extend(apps.get_app_config(_label).get_models())
+
+for _model in _dashboard_sources:
+    post_save.connect(invalidate_dashboard_cache, sender=_model, dispatch_uid=f'dashboard_cache_save_{_model.__name__}')
+    post_delete.connect(invalidate_dashboard_cache, sender=_model, dispatch_uid=f'dashboard_cache_delete_{_model.__name__}')
+    for _m2m in _model._meta.local_many_to_many:
+        m2m_changed.connect(
+            invalidate_dashboard_cache_m2m, sender=_m2m.remote_field.through,
+            dispatch_uid=f'dashboard_cache_m2m_{_model.__name__}_{_m2m.name}',
+        )
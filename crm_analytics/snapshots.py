@@ -0,0 +1,527 @@
+# ============================================================
+# CRM ANALYTICS APP — crm_analytics/snapshots.py
+# Set-based builders for the monthly performance snapshot tables.
+# Every builder runs a fixed number of GROUP BY queries for the whole
+# month range and writes the result with a single bulk upsert.
+# Writes to the source tables only queue (entity, month) dirty keys;
+# refresh_dirty_snapshots() recomputes just those rows.
+# ============================================================
+
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from crm_distributors.models import DistributorSalesValue, DistributorStockEntry
+from crm_doctors.models import Doctor, DoctorInvestment, DoctorVisit, VisitProductDetail
+
+from .cache import invalidate_months
+from .models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                     DistributorPerformanceSnapshot, ProductPerformanceSnapshot,
+                     DailyVisitFact, SnapshotDirtyKey)
+from .leaderboards import SNAPSHOT_METRICS, rebuild_leaderboard, update_leaderboard
+from .scoring import score_mr_month
+
+
+BATCH_SIZE = 2000
+
+ZERO = Decimal('0.00')
+
+MAX_GROWTH_PERCENTAGE = Decimal('9999.99')
+
+
+def month_start(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif isinstance(value, datetime):
+        value = value.date()
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + (value.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(first_month, last_month):
+    """Yield the 1st of every month from ``first_month`` to ``last_month`` inclusive."""
+    current = month_start(first_month)
+    last_month = month_start(last_month)
+    while current <= last_month:
+        yield current
+        current = add_months(current, 1)
+
+
+def _as_month(value):
+    # TruncMonth returns a datetime on some backends when the source is a DateField.
+    return value.date() if hasattr(value, 'date') else value
+
+
+def _rows_by_key(queryset, key_fields):
+    rows = {}
+    for row in queryset:
+        key = tuple(row[field] for field in key_fields[:-1]) + (_as_month(row[key_fields[-1]]),)
+        rows[key] = row
+    return rows
+
+
+def _upsert(model, objs, unique_fields, update_fields):
+    model.objects.bulk_create(
+        objs,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields + ['updated_at'],
+    )
+
+
+def _prune(model, months, started_at, extra_filter=None):
+    """Delete snapshot rows in ``months`` that the current run did not touch."""
+    qs = model.objects.filter(snapshot_month__in=months, updated_at__lt=started_at)
+    if extra_filter is not None:
+        qs = qs.filter(extra_filter)
+    return qs.delete()[0]
+
+
+# ------------------------------------------------------------
+# MR snapshots
+# ------------------------------------------------------------
+
+def build_mr_snapshots(first_month, last_month, mr_ids=None):
+    months = list(iter_months(first_month, last_month))
+    start, end = months[0], add_months(months[-1], 1)
+    started_at = timezone.now()
+
+    visits = DoctorVisit.objects.filter(visit_date__gte=start, visit_date__lt=end)
+    details = VisitProductDetail.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    investments = DoctorInvestment.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    coverage = Doctor.assigned_mrs.through.objects.filter(doctor__status='active')
+    if mr_ids is not None:
+        visits = visits.filter(mr_id__in=mr_ids)
+        details = details.filter(visit__mr_id__in=mr_ids)
+        investments = investments.filter(visit__mr_id__in=mr_ids)
+        coverage = coverage.filter(medicalrepresentative_id__in=mr_ids)
+
+    visit_rows = _rows_by_key(
+        visits.annotate(month=TruncMonth('visit_date'))
+        .values('mr_id', 'month')
+        .annotate(
+            total_visits=Count('id'),
+            gps_verified_visits=Count('id', filter=Q(is_gps_verified=True)),
+            unique_doctors_visited=Count('doctor_id', distinct=True),
+        ).order_by(),
+        ('mr_id', 'month'),
+    )
+    value_rows = _rows_by_key(
+        details.annotate(month=TruncMonth('visit__visit_date'))
+        .values('visit__mr_id', 'month')
+        .annotate(total=Sum('estimated_value_per_month')).order_by(),
+        ('visit__mr_id', 'month'),
+    )
+    investment_rows = _rows_by_key(
+        investments.annotate(month=TruncMonth('visit__visit_date'))
+        .values('visit__mr_id', 'month')
+        .annotate(total=Sum('amount')).order_by(),
+        ('visit__mr_id', 'month'),
+    )
+    doctors_covered = dict(
+        coverage.values('medicalrepresentative_id')
+        .annotate(total=Count('doctor_id', distinct=True))
+        .values_list('medicalrepresentative_id', 'total')
+        .order_by()
+    )
+
+    snapshots = []
+    for key in visit_rows.keys() | value_rows.keys() | investment_rows.keys():
+        mr_id, month = key
+        visit_row = visit_rows.get(key, {})
+        snapshot = MRPerformanceSnapshot(
+            mr_id=mr_id,
+            snapshot_month=month,
+            total_visits=visit_row.get('total_visits', 0),
+            gps_verified_visits=visit_row.get('gps_verified_visits', 0),
+            unique_doctors_visited=visit_row.get('unique_doctors_visited', 0),
+            total_doctors_covered=doctors_covered.get(mr_id, 0),
+            total_prescription_value_generated=value_rows.get(key, {}).get('total') or ZERO,
+            total_investment_given=investment_rows.get(key, {}).get('total') or ZERO,
+        )
+        snapshot.compute_gps_percentage()
+        snapshots.append(snapshot)
+
+    # working_efficiency_score is owned by scoring.score_mr_month and survives rebuilds.
+    _upsert(MRPerformanceSnapshot, snapshots, ['mr', 'snapshot_month'], [
+        'total_visits', 'gps_verified_visits', 'unique_doctors_visited', 'total_doctors_covered',
+        'total_prescription_value_generated', 'total_investment_given', 'gps_verified_percentage',
+    ])
+    pruned = _prune(
+        MRPerformanceSnapshot, months, started_at,
+        Q(mr_id__in=mr_ids) if mr_ids is not None else None,
+    )
+    return len(snapshots), pruned
+
+
+# ------------------------------------------------------------
+# Doctor snapshots
+# ------------------------------------------------------------
+
+def build_doctor_snapshots(first_month, last_month, doctor_ids=None):
+    months = list(iter_months(first_month, last_month))
+    start, end = months[0], add_months(months[-1], 1)
+    started_at = timezone.now()
+
+    visits = DoctorVisit.objects.filter(visit_date__gte=start, visit_date__lt=end)
+    details = VisitProductDetail.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    investments = DoctorInvestment.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    if doctor_ids is not None:
+        visits = visits.filter(doctor_id__in=doctor_ids)
+        details = details.filter(visit__doctor_id__in=doctor_ids)
+        investments = investments.filter(visit__doctor_id__in=doctor_ids)
+
+    visit_rows = _rows_by_key(
+        visits.annotate(month=TruncMonth('visit_date'))
+        .values('doctor_id', 'month')
+        .annotate(total=Count('id')).order_by(),
+        ('doctor_id', 'month'),
+    )
+    value_rows = _rows_by_key(
+        details.annotate(month=TruncMonth('visit__visit_date'))
+        .values('visit__doctor_id', 'month')
+        .annotate(total=Sum('estimated_value_per_month')).order_by(),
+        ('visit__doctor_id', 'month'),
+    )
+    investment_rows = _rows_by_key(
+        investments.annotate(month=TruncMonth('visit__visit_date'))
+        .values('visit__doctor_id', 'month')
+        .annotate(total=Sum('amount')).order_by(),
+        ('visit__doctor_id', 'month'),
+    )
+
+    snapshots = [
+        DoctorPerformanceSnapshot(
+            doctor_id=key[0],
+            snapshot_month=key[1],
+            total_visits_received=visit_rows.get(key, {}).get('total', 0),
+            estimated_prescription_per_month=value_rows.get(key, {}).get('total') or ZERO,
+            total_investment_given=investment_rows.get(key, {}).get('total') or ZERO,
+        )
+        for key in visit_rows.keys() | value_rows.keys() | investment_rows.keys()
+    ]
+
+    _upsert(DoctorPerformanceSnapshot, snapshots, ['doctor', 'snapshot_month'], [
+        'total_visits_received', 'estimated_prescription_per_month', 'total_investment_given',
+    ])
+    pruned = _prune(
+        DoctorPerformanceSnapshot, months, started_at,
+        Q(doctor_id__in=doctor_ids) if doctor_ids is not None else None,
+    )
+    return len(snapshots), pruned
+
+
+# ------------------------------------------------------------
+# Distributor snapshots
+# ------------------------------------------------------------
+
+def _sales_value_expression():
+    return Sum(
+        F('quantity_sold') * F('price_per_unit'),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def build_distributor_snapshots(first_month, last_month, distributor_ids=None):
+    months = list(iter_months(first_month, last_month))
+    start, end = months[0], add_months(months[-1], 1)
+    started_at = timezone.now()
+
+    entries = DistributorStockEntry.objects.filter(
+        report_period_start__gte=start, report_period_start__lt=end,
+    )
+    sales = DistributorSalesValue.objects.filter(sale_date__gte=start, sale_date__lt=end)
+    if distributor_ids is not None:
+        entries = entries.filter(distributor_id__in=distributor_ids)
+        sales = sales.filter(distributor_id__in=distributor_ids)
+
+    stock_rows = _rows_by_key(
+        entries.annotate(month=TruncMonth('report_period_start'))
+        .values('distributor_id', 'month')
+        .annotate(
+            sold=Sum('sold_quantity'),
+            unsold=Sum('unsold_quantity'),
+            expired=Sum('expired_quantity'),
+        ).order_by(),
+        ('distributor_id', 'month'),
+    )
+    sales_rows = _rows_by_key(
+        sales.annotate(month=TruncMonth('sale_date'))
+        .values('distributor_id', 'month')
+        .annotate(total=_sales_value_expression()).order_by(),
+        ('distributor_id', 'month'),
+    )
+
+    snapshots = []
+    for key in stock_rows.keys() | sales_rows.keys():
+        stock_row = stock_rows.get(key, {})
+        snapshot = DistributorPerformanceSnapshot(
+            distributor_id=key[0],
+            snapshot_month=key[1],
+            total_sales_value=sales_rows.get(key, {}).get('total') or ZERO,
+            total_units_sold=stock_row.get('sold') or 0,
+            total_unsold_stock=stock_row.get('unsold') or 0,
+            total_expired_stock=stock_row.get('expired') or 0,
+        )
+        snapshot.compute_efficiency_percentage()
+        snapshots.append(snapshot)
+
+    _upsert(DistributorPerformanceSnapshot, snapshots, ['distributor', 'snapshot_month'], [
+        'total_sales_value', 'total_units_sold', 'total_unsold_stock',
+        'total_expired_stock', 'efficiency_percentage',
+    ])
+    pruned = _prune(
+        DistributorPerformanceSnapshot, months, started_at,
+        Q(distributor_id__in=distributor_ids) if distributor_ids is not None else None,
+    )
+    return len(snapshots), pruned
+
+
+# ------------------------------------------------------------
+# Product snapshots
+# ------------------------------------------------------------
+
+def _growth_percentage(current, previous):
+    if not previous:
+        return ZERO
+    growth = ((Decimal(current) - Decimal(previous)) / Decimal(previous) * 100).quantize(Decimal('0.01'))
+    return max(-MAX_GROWTH_PERCENTAGE, min(MAX_GROWTH_PERCENTAGE, growth))
+
+
+def build_product_snapshots(first_month, last_month, product_ids=None):
+    """
+    Product snapshots are written at (product, distributor, month) grain from
+    DistributorSalesValue. One extra month is aggregated so the first month in
+    the range still gets a month-over-month growth figure.
+    """
+    months = list(iter_months(first_month, last_month))
+    start, end = months[0], add_months(months[-1], 1)
+    started_at = timezone.now()
+
+    sales = DistributorSalesValue.objects.filter(
+        sale_date__gte=add_months(start, -1), sale_date__lt=end,
+    )
+    if product_ids is not None:
+        sales = sales.filter(product_id__in=product_ids)
+
+    sales_rows = _rows_by_key(
+        sales.annotate(month=TruncMonth('sale_date'))
+        .values('product_id', 'distributor_id', 'month')
+        .annotate(units=Sum('quantity_sold'), revenue=_sales_value_expression())
+        .order_by(),
+        ('product_id', 'distributor_id', 'month'),
+    )
+
+    snapshots = []
+    for (product_id, distributor_id, month), row in sales_rows.items():
+        if month < start:
+            continue
+        previous = sales_rows.get((product_id, distributor_id, add_months(month, -1)), {})
+        snapshots.append(ProductPerformanceSnapshot(
+            product_id=product_id,
+            distributor_id=distributor_id,
+            snapshot_month=month,
+            units_sold=row['units'] or 0,
+            revenue=row['revenue'] or ZERO,
+            growth_percentage=_growth_percentage(row['revenue'] or 0, previous.get('revenue')),
+        ))
+
+    _upsert(ProductPerformanceSnapshot, snapshots, ['product', 'distributor', 'snapshot_month'], [
+        'units_sold', 'revenue', 'growth_percentage',
+    ])
+    extra_filter = Q(distributor__isnull=False)
+    if product_ids is not None:
+        extra_filter &= Q(product_id__in=product_ids)
+    pruned = _prune(ProductPerformanceSnapshot, months, started_at, extra_filter)
+    return len(snapshots), pruned
+
+
+# ------------------------------------------------------------
+# Daily visit facts
+# ------------------------------------------------------------
+
+def build_daily_visit_facts(first_month, last_month, mr_ids=None):
+    """
+    Rebuild DailyVisitFact rows for every day of the month range. Facts are
+    keyed per MR so the dirty-key queue can refresh one MR-month at a time.
+    """
+    months = list(iter_months(first_month, last_month))
+    start, end = months[0], add_months(months[-1], 1)
+    started_at = timezone.now()
+
+    visits = DoctorVisit.objects.filter(visit_date__gte=start, visit_date__lt=end)
+    details = VisitProductDetail.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    investments = DoctorInvestment.objects.filter(visit__visit_date__gte=start, visit__visit_date__lt=end)
+    if mr_ids is not None:
+        visits = visits.filter(mr_id__in=mr_ids)
+        details = details.filter(visit__mr_id__in=mr_ids)
+        investments = investments.filter(visit__mr_id__in=mr_ids)
+
+    visit_rows = {
+        (row['visit_date'], row['mr_id'], row['doctor_id']): row
+        for row in visits.values('visit_date', 'mr_id', 'doctor_id', 'doctor__area_id').annotate(
+            visit_count=Count('id'),
+            gps_verified_count=Count('id', filter=Q(is_gps_verified=True)),
+        ).order_by()
+    }
+    detail_rows = {
+        (row['visit__visit_date'], row['visit__mr_id'], row['visit__doctor_id']): row
+        for row in details.values('visit__visit_date', 'visit__mr_id', 'visit__doctor_id').annotate(
+            samples_given=Sum('samples_given'),
+            estimated_value=Sum('estimated_value_per_month'),
+        ).order_by()
+    }
+    investment_rows = dict(
+        ((row['visit__visit_date'], row['visit__mr_id'], row['visit__doctor_id']), row['total'])
+        for row in investments.values('visit__visit_date', 'visit__mr_id', 'visit__doctor_id')
+        .annotate(total=Sum('amount')).order_by()
+    )
+
+    # Details and investments always hang off a visit, so visit_rows holds every key.
+    facts = []
+    for key, visit_row in visit_rows.items():
+        fact_date, mr_id, doctor_id = key
+        detail_row = detail_rows.get(key, {})
+        facts.append(DailyVisitFact(
+            fact_date=fact_date,
+            mr_id=mr_id,
+            doctor_id=doctor_id,
+            area_id=visit_row['doctor__area_id'],
+            visit_count=visit_row['visit_count'],
+            gps_verified_count=visit_row['gps_verified_count'],
+            samples_given=detail_row.get('samples_given') or 0,
+            estimated_value=detail_row.get('estimated_value') or ZERO,
+            investment=investment_rows.get(key) or ZERO,
+        ))
+
+    _upsert(DailyVisitFact, facts, ['fact_date', 'mr', 'doctor'], [
+        'area', 'visit_count', 'gps_verified_count', 'samples_given', 'estimated_value', 'investment',
+    ])
+    stale = DailyVisitFact.objects.filter(fact_date__gte=start, fact_date__lt=end, updated_at__lt=started_at)
+    if mr_ids is not None:
+        stale = stale.filter(mr_id__in=mr_ids)
+    return len(facts), stale.delete()[0]
+
+
+SNAPSHOT_BUILDERS = {
+    'mr': build_mr_snapshots,
+    'doctor': build_doctor_snapshots,
+    'distributor': build_distributor_snapshots,
+    'product': build_product_snapshots,
+    'visit_fact': build_daily_visit_facts,
+}
+
+
+@transaction.atomic
+def rebuild_snapshots(first_month, last_month, kinds=None):
+    """
+    Rebuild every snapshot table for the given month range.
+    Returns ``{kind: (rows_written, rows_pruned)}``.
+    """
+    results = {}
+    for kind, builder in SNAPSHOT_BUILDERS.items():
+        if kinds and kind not in kinds:
+            continue
+        results[kind] = builder(first_month, last_month)
+    months = list(iter_months(first_month, last_month))
+    if 'mr' in results:
+        for month in months:
+            score_mr_month(month)
+    for kind in results:
+        if kind in SNAPSHOT_METRICS:
+            for month in months:
+                rebuild_leaderboard(SNAPSHOT_METRICS[kind], month)
+            rebuild_leaderboard(SNAPSHOT_METRICS[kind])
+    transaction.on_commit(lambda: invalidate_months(months))
+    return results
+
+
+# ------------------------------------------------------------
+# Incremental refresh
+# ------------------------------------------------------------
+
+def mark_dirty(keys):
+    """
+    Queue ``(entity, entity_id, month)`` keys for refresh in one INSERT.
+    Re-marking an already queued key only bumps its ``marked_at``.
+    """
+    rows = {
+        (entity, entity_id, month_start(month))
+        for entity, entity_id, month in keys
+        if entity_id is not None and month is not None
+    }
+    if not rows:
+        return
+    SnapshotDirtyKey.objects.bulk_create(
+        [
+            SnapshotDirtyKey(entity=entity, entity_id=entity_id, snapshot_month=month)
+            for entity, entity_id, month in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['entity', 'entity_id', 'snapshot_month'],
+        update_fields=['marked_at'],
+    )
+
+
+def _update_leaderboards(groups):
+    """Merge the refreshed entities into their month and all-time leaderboards."""
+    all_time = defaultdict(set)
+    for (entity, month), entity_ids in sorted(groups.items()):
+        if entity not in SNAPSHOT_METRICS:
+            continue
+        # Rescoring moves every MR's efficiency score, not only the refreshed ones.
+        update_leaderboard(SNAPSHOT_METRICS[entity], month, entity_ids, include_stored=entity == 'mr')
+        all_time[entity].update(entity_ids)
+    for entity, entity_ids in all_time.items():
+        update_leaderboard(SNAPSHOT_METRICS[entity], None, entity_ids, include_stored=entity == 'mr')
+
+
+def refresh_dirty_snapshots(limit=10000):
+    """
+    Recompute the snapshot rows for up to ``limit`` queued dirty keys.
+    Keys are grouped per (entity, month) so each group costs one builder call.
+    Returns the number of keys processed.
+
+    The keys are claimed with SELECT ... FOR UPDATE SKIP LOCKED in the same
+    transaction that rebuilds and deletes them: a writer re-marking a
+    claimed key waits for the rebuild to commit and queues it again, so no
+    change is lost between reading the source rows and deleting the key,
+    and keys another refresher holds are skipped.
+
+    Those guarantees hold only on backends with row locks (PostgreSQL,
+    MySQL, Oracle). SQLite ignores the clause and has only its
+    database-wide write lock, so concurrent refreshers may claim the same
+    keys or fail with "database is locked"; run a single refresher there.
+    """
+    with transaction.atomic():
+        keys = list(
+            SnapshotDirtyKey.objects.select_for_update(skip_locked=True)
+            .order_by('marked_at')
+            .values_list('pk', 'entity', 'entity_id', 'snapshot_month')[:limit]
+        )
+        if not keys:
+            return 0
+
+        groups = defaultdict(list)
+        for _, entity, entity_id, month in keys:
+            groups[(entity, month)].append(entity_id)
+
+        for (entity, month), entity_ids in sorted(groups.items()):
+            SNAPSHOT_BUILDERS[entity](month, month, entity_ids)
+        # Scores are relative within a territory, so the whole month is rescored.
+        for month in sorted({month for entity, month in groups if entity == 'mr'}):
+            score_mr_month(month)
+        _update_leaderboards(groups)
+        SnapshotDirtyKey.objects.filter(pk__in=[pk for pk, *_ in keys]).delete()
+    invalidate_months(month for _, month in groups)
+    return len(keys)
@@ -1,3 +1,998 @@
-from django.test import TestCase
+import io
+import json
+from collections import defaultdict
+from datetime import date, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from crm_distributors.models import Distributor, DistributorSalesValue, DistributorStockEntry
+from crm_products.models import BatchManagement, Division, ProductMaster
+from crm_sales.models import MedicalRepresentative, Region
+from crm_doctors.models import Doctor, DoctorInvestment, DoctorVisit, VisitProductDetail
+
+from .alerts import _flush, generate_expiry_alerts
+from .cache import check_cache_table, check_shared_cache, get_cache_stats, invalidate_months
+from .facts import summarize_visit_facts
+from .forecasting import SEASON_LENGTH, SalesHistory, forecast
+from .kpis import compute_dashboard_kpis
+from .leaderboards import LEADERBOARD_DEPTH, rebuild_leaderboard, update_leaderboard
+from .models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
+                     DistributorPerformanceSnapshot, ProductPerformanceSnapshot,
+                     DailyVisitFact, ExpiryAlert, LeaderboardEntry, SnapshotDirtyKey)
+from .periods import (Period, custom_period, filter_period, month_period, period_from_params, quarter_period,
+                      week_period, year_period, ytd_period)
+from .scoring import grouped_percentile_ranks, score_mr_month
+from .snapshots import (build_daily_visit_facts, build_distributor_snapshots, build_doctor_snapshots,
+                        build_mr_snapshots, build_product_snapshots, month_start, rebuild_snapshots,
+                        refresh_dirty_snapshots)
+
+
+DASHBOARD_QUERY_BUDGET = 40
+
+# Query counts measure the dashboard's own queries; the shared database cache
+# would add its reads and writes to them.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class DashboardFixtures:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        division = Division.objects.create(name='North')
+        cls.mr = MedicalRepresentative.objects.create(
+            name='Test MR', cnic='12345-1234567-1', phone_number='0300', division=division,
+        )
+        cls.doctors = [
+            Doctor.objects.create(doctor_name=f'Doctor {i}', specialty='GP', city='Lahore')
+            for i in range(3)
+        ]
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        cache.clear()
+
+    def _add_visits(self, count, visit_date, gps=False):
+        DoctorVisit.objects.bulk_create([
+            DoctorVisit(
+                mr=self.mr,
+                doctor=self.doctors[i % len(self.doctors)],
+                visit_date=visit_date,
+                visit_time=time(10, 0),
+                is_gps_verified=gps,
+            )
+            for i in range(count)
+        ])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardKPITests(DashboardFixtures, TestCase):
+    def test_counters_use_one_query_per_table(self):
+        month_start = self.today.replace(day=1)
+        previous_start = (month_start - timedelta(days=1)).replace(day=1)
+        self._add_visits(4, self.today, gps=True)
+        self._add_visits(2, previous_start)
+
+        kpis = compute_dashboard_kpis(
+            self.today,
+            month_start, (month_start + timedelta(days=32)).replace(day=1),
+            previous_start, month_start,
+        )
+
+        self.assertEqual(kpis.query_count, 17)
+        self.assertEqual(kpis.counters['total_mrs'], 1)
+        self.assertEqual(kpis.counters['total_doctors'], 3)
+        self.assertEqual(kpis.counters['visits_today'], 4)
+        self.assertEqual(kpis.counters['period_visit_count'], 4)
+        self.assertEqual(kpis.counters['period_gps_verified'], 4)
+        self.assertEqual(kpis.counters['period_doctors_covered'], 3)
+        self.assertEqual(kpis.counters['previous_visit_count'], 2)
+        self.assertEqual(kpis.counters['previous_gps_verified'], 0)
+
+    def test_all_scope_counts_every_visit(self):
+        self._add_visits(3, self.today - timedelta(days=400))
+        self._add_visits(1, self.today)
+
+        kpis = compute_dashboard_kpis(self.today)
+
+        self.assertEqual(kpis.counters['period_visit_count'], 4)
+        self.assertEqual(kpis.counters['previous_visit_count'], 0)
+
+    def test_dashboard_stays_within_query_budget(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_analytics:dashboard')
+
+        self._add_visits(5, self.today)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self._add_visits(200, self.today)
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertLessEqual(len(large), DASHBOARD_QUERY_BUDGET)
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DashboardCacheTests(DashboardFixtures, TestCase):
+    def test_repeat_request_is_served_from_cache(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_analytics:dashboard')
+
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            second = self.client.get(url)
+
+        self.assertEqual(first['X-Dashboard-Cache'], 'MISS')
+        self.assertEqual(second['X-Dashboard-Cache'], 'HIT')
+        self.assertLess(len(cached), 5)
+        self.assertEqual(get_cache_stats()['hits'], 2)
+        self.assertEqual(get_cache_stats()['misses'], 2)
+
+    def test_current_month_is_invalidated_by_writes(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_analytics:dashboard')
+
+        self.assertEqual(self.client.get(url).context['period_visit_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorVisit.objects.create(mr=self.mr, doctor=self.doctors[0], visit_date=self.today, visit_time=time(9, 0))
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Dashboard-Cache'], 'MISS')
+        self.assertEqual(response.context['period_visit_count'], 1)
+
+    def test_closed_month_survives_live_writes(self):
+        self.client.force_login(self.user)
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        url = reverse('crm_analytics:dashboard') + f'?month={last_month:%Y-%m}'
+
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorVisit.objects.create(mr=self.mr, doctor=self.doctors[0], visit_date=last_month, visit_time=time(9, 0))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Dashboard-Cache'], 'MISS')  # live half only
+        self.assertEqual(response.context['period_visit_count'], 0)
+
+        # The snapshot refresher invalidates the months it recomputes.
+        invalidate_months([last_month])
+        self.assertEqual(self.client.get(url).context['period_visit_count'], 1)
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['crm_analytics.W001'])
+
+    def test_missing_cache_table_is_flagged(self):
+        db_cache = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache'}
+        with self.settings(CACHES={'default': {**db_cache, 'LOCATION': 'crm_cache'}}):
+            self.assertEqual(check_cache_table(None, databases=['default']), [])
+        with self.settings(CACHES={'default': {**db_cache, 'LOCATION': 'no_such_cache_table'}}):
+            self.assertEqual(
+                [warning.id for warning in check_cache_table(None, databases=['default'])], ['crm_analytics.W002'],
+            )
+
+
+class SnapshotExportTests(DashboardFixtures, TestCase):
+    def test_entity_filter(self):
+        other = MedicalRepresentative.objects.create(
+            name='Other MR', cnic='12345-1234567-2', phone_number='0301', division=self.mr.division,
+        )
+        month = self.today.replace(day=1)
+        MRPerformanceSnapshot.objects.create(mr=self.mr, snapshot_month=month, total_visits=4)
+        MRPerformanceSnapshot.objects.create(mr=other, snapshot_month=month, total_visits=7)
+        self.client.force_login(self.user)
+        url = reverse('crm_analytics:mr_performance_export')
+
+        response = self.client.get(url, {'mr': self.mr.pk, 'format': 'ndjson'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(row)['total_visits'] for row in rows], [4])
+
+        self.assertEqual(self.client.get(url, {'mr': 'abc'}).status_code, 400)
+
+
+JAN, FEB, MAR = date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)
+
+
+class SnapshotFixtures:
+    """Two MRs and two doctors with visits, product details and investments
+    in January and February, and one distributor selling two products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        division = Division.objects.create(name='North')
+        cls.mrs = [
+            MedicalRepresentative.objects.create(
+                name=f'MR {i}', cnic=f'12345-123456{i}-1', phone_number='0300', division=division,
+            )
+            for i in range(2)
+        ]
+        cls.doctors = [
+            Doctor.objects.create(doctor_name=f'Doctor {i}', specialty='GP', city='Lahore') for i in range(2)
+        ]
+        cls.doctors[0].assigned_mrs.set(cls.mrs)
+        cls.doctors[1].assigned_mrs.set(cls.mrs[:1])
+        cls.products = [
+            ProductMaster.objects.create(
+                product_name=f'Product {i}', generic_name='Generic', brand_name='Brand',
+                category='tablet', strength='500mg', packing_size='10x10', division=division,
+            )
+            for i in range(2)
+        ]
+
+        plan = [
+            # (mr, doctor, visit_date, gps, detail values, investment)
+            (0, 0, date(2025, 1, 10), True, ['100.00', '50.00'], '500.00'),
+            (0, 1, date(2025, 1, 20), False, ['25.00'], None),
+            (0, 0, date(2025, 1, 31), True, [], '200.00'),
+            (1, 0, date(2025, 2, 3), False, ['80.00'], '300.00'),
+            (1, 1, date(2025, 2, 14), True, [], None),
+        ]
+        cls.visits = []
+        for mr, doctor, visit_date, gps, values, investment in plan:
+            visit = DoctorVisit.objects.create(
+                mr=cls.mrs[mr], doctor=cls.doctors[doctor], visit_date=visit_date,
+                visit_time=time(10, 0), is_gps_verified=gps,
+            )
+            for i, value in enumerate(values):
+                VisitProductDetail.objects.create(
+                    visit=visit, product=cls.products[i % 2], estimated_value_per_month=Decimal(value),
+                )
+            if investment:
+                DoctorInvestment.objects.create(visit=visit, investment_type='cash', amount=Decimal(investment))
+            cls.visits.append(visit)
+
+        cls.distributor = Distributor.objects.create(
+            distributor_name='Distributor', owner_name='Owner', contact_number='0300',
+            address='Street', city='Lahore', region='Punjab', license_number='LIC-1',
+        )
+        for sale_date, product, quantity, price in [
+            (date(2025, 1, 5), 0, 10, '12.50'),
+            (date(2025, 1, 25), 0, 6, '12.50'),
+            (date(2025, 2, 9), 0, 20, '12.50'),
+            (date(2025, 2, 9), 1, 4, '30.00'),
+        ]:
+            DistributorSalesValue.objects.create(
+                distributor=cls.distributor, product=cls.products[product],
+                quantity_sold=quantity, price_per_unit=Decimal(price), sale_date=sale_date,
+            )
+        for period_start, sold, expired in [(JAN, 40, 5), (FEB, 30, 0)]:
+            DistributorStockEntry.objects.create(
+                distributor=cls.distributor, product=cls.products[0],
+                opening_stock=100, received_quantity=20, sold_quantity=sold, expired_quantity=expired,
+                report_period_start=period_start, report_period_end=period_start + timedelta(days=27),
+            )
+
+    def _tables(self):
+        """Every snapshot and fact row, without ids and timestamps."""
+        def rows(model, *fields):
+            return sorted(model.objects.values_list(*fields))
+        return {
+            'mr': rows(
+                MRPerformanceSnapshot, 'mr_id', 'snapshot_month', 'total_visits', 'gps_verified_visits',
+                'unique_doctors_visited', 'total_doctors_covered', 'total_prescription_value_generated',
+                'total_investment_given', 'gps_verified_percentage', 'working_efficiency_score',
+            ),
+            'doctor': rows(
+                DoctorPerformanceSnapshot, 'doctor_id', 'snapshot_month', 'total_visits_received',
+                'estimated_prescription_per_month', 'total_investment_given',
+            ),
+            'distributor': rows(
+                DistributorPerformanceSnapshot, 'distributor_id', 'snapshot_month', 'total_sales_value',
+                'total_units_sold', 'total_unsold_stock', 'total_expired_stock', 'efficiency_percentage',
+            ),
+            'product': rows(
+                ProductPerformanceSnapshot, 'product_id', 'distributor_id', 'snapshot_month',
+                'units_sold', 'revenue', 'growth_percentage',
+            ),
+            'visit_fact': rows(
+                DailyVisitFact, 'fact_date', 'mr_id', 'doctor_id', 'visit_count', 'gps_verified_count',
+                'estimated_value', 'investment',
+            ),
+        }
+
+    def _rebuilt_tables(self):
+        """What a full rebuild produces; the transaction is rolled back afterwards."""
+        sid = transaction.savepoint()
+        rebuild_snapshots(JAN, MAR)
+        tables = self._tables()
+        transaction.savepoint_rollback(sid)
+        return tables
+
+
+class SnapshotBuilderTests(SnapshotFixtures, TestCase):
+    def test_visit_snapshots_match_raw_aggregates(self):
+        build_mr_snapshots(JAN, FEB)
+        build_doctor_snapshots(JAN, FEB)
+
+        mr_rows = defaultdict(lambda: {'visits': 0, 'gps': 0, 'doctors': set(), 'value': 0, 'investment': 0})
+        doctor_rows = defaultdict(lambda: {'visits': 0, 'value': 0, 'investment': 0})
+        for visit in DoctorVisit.objects.all():
+            mr_row = mr_rows[(visit.mr_id, month_start(visit.visit_date))]
+            doctor_row = doctor_rows[(visit.doctor_id, month_start(visit.visit_date))]
+            mr_row['visits'] += 1
+            mr_row['gps'] += visit.is_gps_verified
+            mr_row['doctors'].add(visit.doctor_id)
+            doctor_row['visits'] += 1
+            for detail in visit.product_details.all():
+                mr_row['value'] += detail.estimated_value_per_month
+                doctor_row['value'] += detail.estimated_value_per_month
+            for investment in visit.investments.all():
+                mr_row['investment'] += investment.amount
+                doctor_row['investment'] += investment.amount
+        covered = {mr.pk: mr.assigned_doctors.count() for mr in self.mrs}
+
+        self.assertEqual(
+            {
+                (s.mr_id, s.snapshot_month): (
+                    s.total_visits, s.gps_verified_visits, s.unique_doctors_visited, s.total_doctors_covered,
+                    s.total_prescription_value_generated, s.total_investment_given,
+                )
+                for s in MRPerformanceSnapshot.objects.all()
+            },
+            {
+                key: (row['visits'], row['gps'], len(row['doctors']), covered[key[0]], row['value'], row['investment'])
+                for key, row in mr_rows.items()
+            },
+        )
+        self.assertEqual(
+            {
+                (s.doctor_id, s.snapshot_month): (
+                    s.total_visits_received, s.estimated_prescription_per_month, s.total_investment_given,
+                )
+                for s in DoctorPerformanceSnapshot.objects.all()
+            },
+            {key: (row['visits'], row['value'], row['investment']) for key, row in doctor_rows.items()},
+        )
+
+    def test_sales_snapshots_match_raw_aggregates(self):
+        build_distributor_snapshots(JAN, FEB)
+        build_product_snapshots(JAN, FEB)
+
+        revenue = defaultdict(Decimal)
+        units = defaultdict(int)
+        for sale in DistributorSalesValue.objects.all():
+            key = (sale.product_id, sale.distributor_id, month_start(sale.sale_date))
+            revenue[key] += sale.quantity_sold * sale.price_per_unit
+            units[key] += sale.quantity_sold
+
+        product = {
+            (s.product_id, s.distributor_id, s.snapshot_month): (s.units_sold, s.revenue, s.growth_percentage)
+            for s in ProductPerformanceSnapshot.objects.all()
+        }
+        first, second = (self.products[0].pk, self.distributor.pk, JAN), (self.products[0].pk, self.distributor.pk, FEB)
+        self.assertEqual(product[first], (16, revenue[first], Decimal('0.00')))
+        # February over January: 250.00 against 200.00.
+        self.assertEqual(product[second], (20, revenue[second], Decimal('25.00')))
+        self.assertEqual(set(product), set(revenue))
+
+        distributor = {s.snapshot_month: s for s in DistributorPerformanceSnapshot.objects.all()}
+        for month in (JAN, FEB):
+            entries = DistributorStockEntry.objects.filter(report_period_start=month)
+            sales = sum(value for key, value in revenue.items() if key[2] == month)
+            self.assertEqual(distributor[month].total_sales_value, sales)
+            self.assertEqual(distributor[month].total_units_sold, sum(e.sold_quantity for e in entries))
+            self.assertEqual(distributor[month].total_unsold_stock, sum(e.unsold_quantity for e in entries))
+            self.assertEqual(distributor[month].total_expired_stock, sum(e.expired_quantity for e in entries))
+
+    def test_rebuild_prunes_rows_whose_activity_was_deleted(self):
+        rebuild_snapshots(JAN, FEB)
+        self.assertTrue(MRPerformanceSnapshot.objects.filter(mr=self.mrs[1], snapshot_month=FEB).exists())
+
+        DoctorVisit.objects.filter(mr=self.mrs[1]).delete()
+        DistributorSalesValue.objects.filter(product=self.products[1]).delete()
+        rebuild_snapshots(JAN, FEB)
+
+        self.assertFalse(MRPerformanceSnapshot.objects.filter(mr=self.mrs[1]).exists())
+        self.assertFalse(DoctorPerformanceSnapshot.objects.filter(snapshot_month=FEB, doctor=self.doctors[0]).exists())
+        self.assertFalse(ProductPerformanceSnapshot.objects.filter(product=self.products[1]).exists())
+        self.assertFalse(DailyVisitFact.objects.filter(mr=self.mrs[1]).exists())
+        # Months outside the rebuilt range are left alone.
+        self.assertTrue(MRPerformanceSnapshot.objects.filter(mr=self.mrs[0], snapshot_month=JAN).exists())
+
+
+class PeriodTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        division = Division.objects.create(name='North')
+        cls.mr = MedicalRepresentative.objects.create(
+            name='Test MR', cnic='12345-1234567-1', phone_number='0300', division=division,
+        )
+        # Every month from December 2023 to January 2026.
+        cls.months = [date(2023, 12, 1)] + [date(year, m, 1) for year in (2024, 2025) for m in range(1, 13)]
+        cls.months.append(date(2026, 1, 1))
+        MRPerformanceSnapshot.objects.bulk_create(
+            MRPerformanceSnapshot(mr=cls.mr, snapshot_month=month) for month in cls.months
+        )
+
+    def _months(self, period):
+        return list(
+            filter_period(MRPerformanceSnapshot.objects.all(), period)
+            .order_by('snapshot_month').values_list('snapshot_month', flat=True)
+        )
+
+    def test_month_aligned_periods(self):
+        self.assertEqual(month_period('2024-12'), Period(date(2024, 12, 1), date(2025, 1, 1), 'December 2024'))
+        self.assertEqual(month_period('2024-02'), Period(date(2024, 2, 1), date(2024, 3, 1), 'February 2024'))
+        self.assertEqual(quarter_period('2024', '4'), Period(date(2024, 10, 1), date(2025, 1, 1), 'Q4 2024'))
+        self.assertEqual(quarter_period(2025, 1), Period(date(2025, 1, 1), date(2025, 4, 1), 'Q1 2025'))
+        self.assertEqual(year_period('2024'), Period(date(2024, 1, 1), date(2025, 1, 1), '2024'))
+        for year, quarter in (('2024', '0'), ('2024', '5'), ('x', '1')):
+            with self.subTest(year=year, quarter=quarter), self.assertRaises(ValueError):
+                quarter_period(year, quarter)
+
+    def test_day_ranges_end_the_day_after(self):
+        # ISO week 1 of 2025 starts on Monday 30 December 2024.
+        self.assertEqual(week_period('2025-W01'), Period(date(2024, 12, 30), date(2025, 1, 6), 'Week 1 2025'))
+        self.assertEqual(ytd_period(date(2024, 12, 31)), Period(date(2024, 1, 1), date(2025, 1, 1), '2024 to date'))
+        self.assertEqual(ytd_period(date(2025, 1, 1)), Period(date(2025, 1, 1), date(2025, 1, 2), '2025 to date'))
+        self.assertEqual(
+            custom_period('2024-02-28', '2024-02-29'),
+            Period(date(2024, 2, 28), date(2024, 3, 1), '28 Feb 2024 – 29 Feb 2024'),
+        )
+        self.assertEqual(custom_period('2024-03-01', '2024-03-01').end, date(2024, 3, 2))
+
+    def test_invalid_selectors_give_no_period(self):
+        with self.assertRaises(ValueError):
+            custom_period('2024-03-02', '2024-03-01')
+        for params in (
+            {'start': '2024-03-02', 'end': '2024-03-01'},
+            {'start': '2024-02-30', 'end': '2024-03-01'},
+            {'month': '2024-13'},
+            {'week': '2024-W60'},
+            {'year': '2024', 'quarter': '5'},
+            {'year': 'last'},
+            {'start': '2024-03-01'},
+            {},
+        ):
+            with self.subTest(params=params):
+                self.assertIsNone(period_from_params(params))
+
+    def test_most_specific_selector_wins(self):
+        params = {'start': '2024-03-01', 'end': '2024-03-10', 'month': '2024-05', 'year': '2024', 'quarter': '2'}
+        self.assertEqual(period_from_params(params).start, date(2024, 3, 1))
+        del params['start']
+        self.assertEqual(period_from_params(params).start, date(2024, 5, 1))
+        del params['month']
+        self.assertEqual(period_from_params(params).start, date(2024, 4, 1))
+        del params['quarter']
+        self.assertEqual(period_from_params(params), year_period(2024))
+
+    def test_filter_period_is_half_open(self):
+        self.assertEqual(self._months(month_period('2024-12')), [date(2024, 12, 1)])
+        self.assertEqual(self._months(month_period('2025-01')), [date(2025, 1, 1)])
+        self.assertEqual(
+            self._months(quarter_period(2024, 4)), [date(2024, 10, 1), date(2024, 11, 1), date(2024, 12, 1)],
+        )
+        self.assertEqual(self._months(year_period(2024)), [date(2024, m, 1) for m in range(1, 13)])
+        self.assertEqual(self._months(year_period(2025)), [date(2025, m, 1) for m in range(1, 13)])
+        self.assertEqual(self._months(None), self.months)
+
+    def test_filter_period_keeps_whole_months_a_range_touches(self):
+        # A week across the year boundary keeps both months.
+        self.assertEqual(self._months(week_period('2025-W01')), [date(2024, 12, 1), date(2025, 1, 1)])
+        self.assertEqual(self._months(custom_period('2024-01-31', '2024-02-01')), [date(2024, 1, 1), date(2024, 2, 1)])
+        # A range ending on the last day of a month stops there.
+        self.assertEqual(self._months(custom_period('2024-01-15', '2024-01-31')), [date(2024, 1, 1)])
+        self.assertEqual(self._months(ytd_period(date(2025, 1, 1))), [date(2025, 1, 1)])
+
+
+class VisitFactRangeTests(SnapshotFixtures, TestCase):
+    def setUp(self):
+        build_daily_visit_facts(JAN, FEB)
+
+    def _raw_totals(self, start, end, mr=None):
+        visits = DoctorVisit.objects.filter(visit_date__gte=start, visit_date__lt=end)
+        if mr is not None:
+            visits = visits.filter(mr=mr)
+        details = VisitProductDetail.objects.filter(visit__in=visits)
+        return {
+            'visit_count': visits.count(),
+            'gps_verified_count': visits.filter(is_gps_verified=True).count(),
+            'samples_given': sum(d.samples_given for d in details),
+            'estimated_value': sum(d.estimated_value_per_month for d in details),
+            'investment': sum(i.amount for i in DoctorInvestment.objects.filter(visit__in=visits)),
+        }
+
+    def test_fact_sums_match_raw_visits(self):
+        for params in (
+            {'week': '2025-W03'},
+            {'start': '2025-01-15', 'end': '2025-02-05'},
+            {'year': '2025', 'quarter': '1'},
+            {'month': '2025-01'},
+        ):
+            period = period_from_params(params)
+            with self.subTest(period=period.label):
+                self.assertEqual(
+                    summarize_visit_facts(period.start, period.end), self._raw_totals(period.start, period.end),
+                )
+                self.assertEqual(
+                    summarize_visit_facts(period.start, period.end, mr_ids=[self.mrs[0].pk]),
+                    self._raw_totals(period.start, period.end, mr=self.mrs[0]),
+                )
+
+    def test_range_view_reads_visit_facts(self):
+        build_mr_snapshots(JAN, FEB)
+        User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        self.client.login(username='admin', password='pass12345')
+
+        response = self.client.get(
+            reverse('crm_analytics:mr_performance'), {'start': '2025-01-15', 'end': '2025-02-05'},
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = {row['mr'].pk: row for row in response.context['range_rows']}
+        for mr in self.mrs:
+            expected = self._raw_totals(date(2025, 1, 15), date(2025, 2, 6), mr=mr)
+            self.assertEqual(rows[mr.pk]['visit_count'], expected['visit_count'])
+            self.assertEqual(rows[mr.pk]['estimated_value'], expected['estimated_value'])
+            self.assertEqual(rows[mr.pk]['investment'], expected['investment'])
+        # The snapshot table keeps the months the range overlaps.
+        self.assertEqual(
+            {s.snapshot_month for s in response.context['page_obj']},
+            {JAN, FEB},
+        )
+
+
+class SnapshotRefreshTests(SnapshotFixtures, TestCase):
+    def setUp(self):
+        rebuild_snapshots(JAN, MAR)
+        SnapshotDirtyKey.objects.all().delete()
+
+    def _queued(self):
+        return set(SnapshotDirtyKey.objects.values_list('entity', 'entity_id', 'snapshot_month'))
+
+    def test_moving_a_visit_dirties_old_and_new_keys(self):
+        visit = DoctorVisit.objects.get(pk=self.visits[0].pk)
+        visit.mr = self.mrs[1]
+        visit.visit_date = date(2025, 2, 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            visit.save()
+
+        old_mr, new_mr, doctor = self.mrs[0].pk, self.mrs[1].pk, self.doctors[0].pk
+        self.assertEqual(self._queued(), {
+            ('mr', old_mr, JAN), ('visit_fact', old_mr, JAN), ('doctor', doctor, JAN),
+            ('mr', new_mr, FEB), ('visit_fact', new_mr, FEB), ('doctor', doctor, FEB),
+        })
+
+        self.assertEqual(refresh_dirty_snapshots(), 6)
+        self.assertEqual(self._tables(), self._rebuilt_tables())
+        self.assertEqual(MRPerformanceSnapshot.objects.get(mr_id=old_mr, snapshot_month=JAN).total_visits, 2)
+        self.assertEqual(MRPerformanceSnapshot.objects.get(mr_id=new_mr, snapshot_month=FEB).total_visits, 3)
+
+    def test_deletes_cascade_into_refreshed_snapshots(self):
+        # Deleting a visit cascades to its product details and investments.
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorVisit.objects.filter(pk=self.visits[0].pk).delete()
+        refresh_dirty_snapshots()
+        self.assertEqual(self._tables(), self._rebuilt_tables())
+
+        # Deleting a doctor cascades to its visits and drops its months from the MR snapshots.
+        with self.captureOnCommitCallbacks(execute=True):
+            Doctor.objects.filter(pk=self.doctors[1].pk).delete()
+        self.assertIn(('mr', self.mrs[1].pk, FEB), self._queued())
+        refresh_dirty_snapshots()
+        self.assertEqual(self._tables(), self._rebuilt_tables())
+        self.assertEqual(MRPerformanceSnapshot.objects.get(mr=self.mrs[1], snapshot_month=FEB).total_visits, 1)
+
+    def test_limit_leaves_the_rest_queued(self):
+        for visit in self.visits:
+            with self.captureOnCommitCallbacks(execute=True):
+                DoctorVisit.objects.get(pk=visit.pk).save()
+        queued = list(SnapshotDirtyKey.objects.order_by('marked_at').values_list('entity', 'entity_id', 'snapshot_month'))
+        self.assertGreater(len(queued), 3)
+
+        self.assertEqual(refresh_dirty_snapshots(limit=3), 3)
+        self.assertEqual(
+            list(SnapshotDirtyKey.objects.order_by('marked_at').values_list('entity', 'entity_id', 'snapshot_month')),
+            queued[3:],
+        )
+        self.assertEqual(refresh_dirty_snapshots(), len(queued) - 3)
+        self.assertEqual(SnapshotDirtyKey.objects.count(), 0)
+
+    def test_coverage_changes_queue_the_current_month(self):
+        this_month = timezone.localdate().replace(day=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctors[1].assigned_mrs.add(self.mrs[1])
+        self.assertEqual(self._queued(), {('mr', self.mrs[1].pk, this_month)})
+
+        SnapshotDirtyKey.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctors[0].assigned_mrs.clear()
+        self.assertEqual(self._queued(), {('mr', mr.pk, this_month) for mr in self.mrs})
+
+        SnapshotDirtyKey.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mrs[0].assigned_doctors.remove(self.doctors[1])
+        self.assertEqual(self._queued(), {('mr', self.mrs[0].pk, this_month)})
+
+    def test_writes_are_queued_once_per_transaction(self):
+        visit = self.visits[1]
+        with CaptureQueriesContext(connection) as writes:
+            with self.captureOnCommitCallbacks() as callbacks:
+                for i in range(5):
+                    VisitProductDetail.objects.create(
+                        visit_id=visit.pk, product=self.products[0], estimated_value_per_month=Decimal(i),
+                    )
+                    DoctorInvestment.objects.create(visit_id=visit.pk, investment_type='cash', amount=Decimal(i))
+        # Ten INSERTs and nothing else: no visit lookup or cache write per row.
+        self.assertEqual(len(writes), 10)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self._queued(), set())
+
+        callbacks[0]()
+        mr, doctor = self.mrs[0].pk, self.doctors[1].pk
+        self.assertEqual(self._queued(), {('mr', mr, JAN), ('visit_fact', mr, JAN), ('doctor', doctor, JAN)})
+
+    def test_rolled_back_savepoint_does_not_lose_later_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    DoctorVisit.objects.get(pk=self.visits[3].pk).save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            DoctorVisit.objects.get(pk=self.visits[4].pk).save()
+        mr, doctor = self.mrs[1].pk, self.doctors[1].pk
+        self.assertEqual(self._queued(), {('mr', mr, FEB), ('visit_fact', mr, FEB), ('doctor', doctor, FEB)})
+
+
+class ExpiryAlertTests(SnapshotFixtures, TestCase):
+    TODAY = date(2025, 6, 1)
+
+    # Days until expiry on TODAY, and the window each falls in.
+    BATCH_WINDOWS = [
+        (-3, 'expired'), (0, 'expired'),
+        (1, '1_month'), (30, '1_month'),
+        (31, '3_months'), (90, '3_months'),
+        (91, '6_months'), (180, '6_months'),
+        (181, None),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.batches = {
+            days: BatchManagement.objects.create(
+                batch_number=f'B{days:+04d}', product=cls.products[0],
+                manufacturing_date=date(2024, 1, 1), expiry_date=cls.TODAY + timedelta(days=days),
+                quantity_manufactured=100, quantity_sent_to_distributors=40,
+            )
+            for days, _ in cls.BATCH_WINDOWS
+        }
+        DistributorStockEntry.objects.create(
+            distributor=cls.distributor, product=cls.products[0], batch=cls.batches[90],
+            opening_stock=50, received_quantity=0, sold_quantity=20,
+            report_period_start=date(2025, 5, 1), report_period_end=date(2025, 5, 31),
+        )
+
+    def _alert_types(self, source):
+        return dict(ExpiryAlert.objects.filter(source=source).values_list('batch_number', 'alert_type'))
+
+    def test_batches_are_bucketed_by_window_boundaries(self):
+        self.assertEqual(generate_expiry_alerts(self.TODAY), {'batch': 8, 'distributor_stock': 1})
+        self.assertEqual(
+            self._alert_types('batch'),
+            {self.batches[days].batch_number: alert_type for days, alert_type in self.BATCH_WINDOWS if alert_type},
+        )
+        alert = ExpiryAlert.objects.get(source='distributor_stock')
+        self.assertEqual(
+            (alert.alert_type, alert.quantity_at_risk, alert.distributor_id, alert.recipient),
+            ('3_months', 30, self.distributor.pk, 'distributor'),
+        )
+        self.assertEqual(ExpiryAlert.objects.get(batch_number='B+030', source='batch').quantity_at_risk, 60)
+
+    def test_rerun_creates_nothing_and_counts_nothing(self):
+        generate_expiry_alerts(self.TODAY)
+        self.assertEqual(generate_expiry_alerts(self.TODAY), {'batch': 0, 'distributor_stock': 0})
+        self.assertEqual(ExpiryAlert.objects.count(), 9)
+
+        # Rows skipped by ignore_conflicts are not counted as created.
+        duplicate = ExpiryAlert.objects.get(batch_number='B+000')
+        duplicate.pk = None
+        self.assertEqual(_flush([duplicate]), 0)
+        self.assertEqual(ExpiryAlert.objects.count(), 9)
+
+    def test_moving_into_a_narrower_window_adds_an_alert(self):
+        generate_expiry_alerts(self.TODAY)
+        # A day later the batches that sat on a boundary cross into the next window.
+        self.assertEqual(
+            generate_expiry_alerts(self.TODAY + timedelta(days=1)), {'batch': 4, 'distributor_stock': 0},
+        )
+        self.assertEqual(
+            sorted(ExpiryAlert.objects.filter(batch_number__in=['B+001', 'B+031', 'B+091', 'B+181'])
+                   .values_list('batch_number', 'alert_type')),
+            [
+                ('B+001', '1_month'), ('B+001', 'expired'),
+                ('B+031', '1_month'), ('B+031', '3_months'),
+                ('B+091', '3_months'), ('B+091', '6_months'),
+                ('B+181', '6_months'),
+            ],
+        )
+
+    def test_acknowledged_alert_does_not_block_a_new_one(self):
+        generate_expiry_alerts(self.TODAY)
+        ExpiryAlert.objects.get(batch_number='B+000', source='batch').acknowledge('admin')
+
+        self.assertEqual(generate_expiry_alerts(self.TODAY), {'batch': 1, 'distributor_stock': 0})
+        self.assertEqual(
+            list(ExpiryAlert.objects.filter(batch_number='B+000').order_by('pk').values_list('is_acknowledged', flat=True)),
+            [True, False],
+        )
+        # The new alert is pending again, so the next run leaves it alone.
+        self.assertEqual(generate_expiry_alerts(self.TODAY), {'batch': 0, 'distributor_stock': 0})
+
+
+class AcknowledgeAlertsBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        division = Division.objects.create(name='North')
+        product = ProductMaster.objects.create(
+            product_name='Product', generic_name='Generic', brand_name='Brand',
+            category='tablet', strength='500mg', packing_size='10x10', division=division,
+        )
+        cls.alerts = [
+            ExpiryAlert.objects.create(
+                alert_type=alert_type, source=source, product=product, batch_number=f'B{i}',
+                expiry_date=date(2025, 6, 1), recipient='admin', dedupe_key=f'test:{i}',
+            )
+            for i, (alert_type, source) in enumerate([
+                ('expired', 'batch'), ('1_month', 'batch'), ('expired', 'distributor_stock'), ('expired', 'batch'),
+            ])
+        ]
+
+    def setUp(self):
+        self.client.login(username='admin', password='pass12345')
+        self.url = reverse('crm_analytics:acknowledge_alerts_bulk')
+
+    def _acknowledged(self):
+        return set(ExpiryAlert.objects.filter(is_acknowledged=True).values_list('pk', flat=True))
+
+    def test_ids_are_acknowledged(self):
+        ids = [self.alerts[0].pk, self.alerts[2].pk]
+        response = self.client.post(self.url, {'ids': ids}, headers={'accept': 'application/json'})
+        self.assertEqual(response.json(), {'acknowledged': 2})
+        self.assertEqual(self._acknowledged(), set(ids))
+
+        # Already acknowledged alerts are not counted again.
+        response = self.client.post(self.url, {'ids': ids + [self.alerts[1].pk]}, headers={'accept': 'application/json'})
+        self.assertEqual(response.json(), {'acknowledged': 1})
+
+    def test_filter_scope_acknowledges_matching_alerts(self):
+        response = self.client.post(
+            self.url, {'scope': 'filter', 'type': 'expired', 'source': 'batch'}, headers={'accept': 'application/json'},
+        )
+        self.assertEqual(response.json(), {'acknowledged': 2})
+        self.assertEqual(self._acknowledged(), {self.alerts[0].pk, self.alerts[3].pk})
+
+        # Without ids or scope=filter nothing is touched.
+        self.assertEqual(self.client.post(self.url, headers={'accept': 'application/json'}).json(), {'acknowledged': 0})
+
+    def test_response_type_follows_the_caller(self):
+        browser = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+        for headers, wants_json in [
+            ({}, True),
+            ({'accept': '*/*'}, True),
+            ({'accept': 'application/json, text/html;q=0.5'}, True),
+            ({'accept': browser, 'x-requested-with': 'XMLHttpRequest'}, True),
+            ({'accept': browser}, False),
+        ]:
+            with self.subTest(headers=headers):
+                response = self.client.post(self.url, {'scope': 'filter', 'type': 'expired'}, headers=headers)
+                if wants_json:
+                    self.assertEqual(response['Content-Type'], 'application/json')
+                    self.assertIn('acknowledged', response.json())
+                else:
+                    self.assertRedirects(
+                        response, reverse('crm_analytics:expiry_alerts') + '?type=expired',
+                        fetch_redirect_response=False,
+                    )
+
+    def test_users_without_change_permission_are_refused(self):
+        viewer = User.objects.create_user('viewer', password='pass12345')
+        viewer.groups.add(Group.objects.create(name='CRM - Viewer'))
+        self.client.login(username='viewer', password='pass12345')
+
+        response = self.client.post(
+            self.url, {'scope': 'filter', 'type': 'expired'}, headers={'accept': 'application/json'},
+        )
+        self.assertRedirects(response, reverse('crm_analytics:dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self._acknowledged(), set())
+
+
+class PercentileRankTests(TestCase):
+    def _expected(self, groups, values):
+        ranks = []
+        for group, value in zip(groups, values):
+            members = [v for g, v in zip(groups, values) if g == group]
+            if len(members) == 1:
+                ranks.append(0.5)
+                continue
+            below = sum(v < value for v in members)
+            ties = sum(v == value for v in members)
+            ranks.append((below + (ties - 1) / 2) / (len(members) - 1))
+        return ranks
+
+    def test_matches_a_plain_python_ranking(self):
+        rng = np.random.default_rng(7)
+        groups = rng.integers(0, 6, size=200)
+        values = rng.integers(0, 10, size=200).astype(float)   # plenty of ties
+        groups[:2] = [10, 11]                                   # single-member groups
+
+        ranks = grouped_percentile_ranks(groups, values)
+        np.testing.assert_allclose(ranks, self._expected(groups.tolist(), values.tolist()))
+        self.assertEqual(ranks[:2].tolist(), [0.5, 0.5])
+
+    def test_small_cases(self):
+        np.testing.assert_allclose(
+            grouped_percentile_ranks(np.array([1, 1, 1, 2]), np.array([3.0, 3.0, 5.0, 1.0])),
+            [0.25, 0.25, 1.0, 0.5],
+        )
+        self.assertEqual(len(grouped_percentile_ranks(np.array([]), np.array([]))), 0)
+
+
+class EfficiencyTerritoryTests(TestCase):
+    MONTH = date(2025, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        division = Division.objects.create(name='North')
+        regions = [Region.objects.create(region_name=f'Region {i}') for i in range(2)]
+        # Region 0 holds the two busiest MRs, region 1 the two quietest.
+        for i, visits in enumerate([40, 30, 20, 10]):
+            mr = MedicalRepresentative.objects.create(
+                name=f'MR {i}', cnic=f'12345-123456{i}-1', phone_number='0300',
+                division=division, region=regions[i // 2],
+            )
+            MRPerformanceSnapshot.objects.create(mr=mr, snapshot_month=cls.MONTH, total_visits=visits)
+
+    def _scores(self):
+        return list(
+            MRPerformanceSnapshot.objects.order_by('-total_visits').values_list('working_efficiency_score', flat=True)
+        )
+
+    def test_command_and_refresh_rank_within_the_configured_territory(self):
+        with self.settings(MR_EFFICIENCY_TERRITORY='division'):
+            call_command('score_mr_efficiency', '--from', '2025-01', stdout=io.StringIO())
+            by_division = self._scores()
+            score_mr_month(self.MONTH)
+            self.assertEqual(self._scores(), by_division)
+        self.assertEqual(by_division, sorted(by_division, reverse=True))
+        self.assertEqual(len(set(by_division)), 4)
+
+        score_mr_month(self.MONTH)
+        by_region = self._scores()
+        # Ranked within their region, MR 0 and MR 2 both come first.
+        self.assertEqual((by_region[0], by_region[1]), (by_region[2], by_region[3]))
+
+    @override_settings(MR_EFFICIENCY_TERRITORY='city')
+    def test_unknown_territory_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            score_mr_month(self.MONTH)
+
+
+class LeaderboardUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        divisions = [Division.objects.create(name=name) for name in ('North', 'South')]
+        cls.mrs = [
+            MedicalRepresentative.objects.create(
+                name=f'MR {i}', cnic=f'12345-{1000000 + i}-1', phone_number='0300', division=divisions[i % 2],
+            )
+            for i in range(LEADERBOARD_DEPTH + 10)
+        ]
+        for i, mr in enumerate(cls.mrs):
+            MRPerformanceSnapshot.objects.create(mr=mr, snapshot_month=FEB, total_visits=10 + i)
+
+    def _entries(self):
+        return list(
+            LeaderboardEntry.objects.filter(metric='mr_visits', period='2025-02')
+            .order_by('territory_level', 'territory_id', 'rank')
+            .values_list('territory_level', 'territory_id', 'rank', 'entity_id', 'row')
+        )
+
+    def _rebuilt(self):
+        sid = transaction.savepoint()
+        rebuild_leaderboard('mr_visits', FEB)
+        entries = self._entries()
+        transaction.savepoint_rollback(sid)
+        return entries
+
+    def _set_visits(self, changes):
+        for mr, visits in changes.items():
+            MRPerformanceSnapshot.objects.filter(mr=mr, snapshot_month=FEB).update(total_visits=visits)
+        update_leaderboard('mr_visits', FEB, [mr.pk for mr in changes])
+        self.assertEqual(self._entries(), self._rebuilt())
+
+    def test_update_matches_rebuild(self):
+        rebuild_leaderboard('mr_visits', FEB)
+        top = self.mrs[::-1]
+
+        # Rows from below the stored depth climb onto the boards.
+        self._set_visits({self.mrs[0]: 500, self.mrs[1]: 400})
+        # The leaders fall past the stored depth, so the boards are re-ranked.
+        self._set_visits({top[0]: 0, top[1]: 1, top[2]: 2})
+        # Ties are broken the same way by both paths.
+        self._set_visits({self.mrs[5]: 30, self.mrs[6]: 30})
+        # A row disappearing entirely.
+        MRPerformanceSnapshot.objects.filter(mr=self.mrs[0]).delete()
+        update_leaderboard('mr_visits', FEB, [self.mrs[0].pk])
+        self.assertEqual(self._entries(), self._rebuilt())
+
+
+class ForecastMethodTests(TestCase):
+    def _history(self, *series):
+        units = np.array(series, dtype=float)
+        has_sales = units > 0
+        start = np.where(has_sales.any(axis=1), has_sales.argmax(axis=1), units.shape[1])
+        return SalesHistory(list(range(len(series))), [], units, start)
+
+    def test_seasonal_naive_wins_on_repeating_seasons(self):
+        season = [100, 120, 150, 200, 260, 300, 280, 220, 170, 130, 110, 90]
+        history = self._history(season * 3)
+
+        values, methods, alphas, mae = forecast(history, horizon=6)
+        self.assertEqual(methods.tolist(), ['seasonal_naive'])
+        self.assertTrue(np.isnan(alphas[0]))
+        self.assertEqual(mae[0], 0)
+        np.testing.assert_array_equal(values[0], season[:6])
+
+    def test_ses_wins_without_seasonality(self):
+        trend = [50 + month for month in range(3 * SEASON_LENGTH)]
+        level_shift = [60] * 18 + [90] * 18
+        # One season of repeating history is not enough to consider seasonal naive.
+        short = [0] * 20 + [100, 120, 150, 200, 260, 300, 280, 220, 170, 130, 110, 90, 100, 120, 150, 200]
+
+        values, methods, alphas, mae = forecast(self._history(trend, level_shift, short), horizon=3)
+        self.assertEqual(methods.tolist(), ['ses', 'ses', 'ses'])
+        self.assertFalse(np.isnan(alphas).any())
+        # The trend is tracked most closely by the largest alpha.
+        self.assertAlmostEqual(alphas[0], 0.9)
+        # A level forecast repeats one value over the horizon.
+        self.assertTrue((values == values[:, :1]).all())
+
+
+class BenchCRMTests(TransactionTestCase):
+    SCENARIO_KEYS = {
+        'scenario', 'user', 'requests', 'errors', 'status_codes', 'p50_ms', 'p95_ms', 'p99_ms',
+        'mean_ms', 'throughput_rps', 'queries_per_request', 'max_queries',
+    }
+
+    def test_one_request_run_reports_every_scenario(self):
+        # The benchmark clients run in worker threads, which only see committed rows.
+        call_command(
+            'seed_scale_data', '--scale', '0.0001', '--months', '2', '--end-date', '2025-06-30',
+            stdout=io.StringIO(),
+        )
+        output = io.StringIO()
+        call_command(
+            'bench_crm', '--requests', '1', '--export-requests', '1', '--warmup', '0', '--threads', '1',
+            '--import-rows', '5', stdout=output, stderr=io.StringIO(),
+        )
+
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report), {'commit', 'database', 'threads', 'seed', 'rows', 'scenarios'})
+        self.assertEqual((report['database'], report['threads'], report['seed']), (connection.vendor, 1, 42))
+        self.assertEqual(report['rows'], {'doctors': 10, 'visits': 500, 'mrs': 1})
+        self.assertEqual(
+            [(result['scenario'], result['user']) for result in report['scenarios']],
+            [
+                (scenario, user)
+                for scenario in ('dashboard', 'visit_list', 'doctor_detail', 'doctor_last_visit_api',
+                                 'data_export', 'data_import')
+                for user in ('superuser', 'restricted')
+            ],
+        )
+        for result in report['scenarios']:
+            with self.subTest(scenario=result['scenario'], user=result['user']):
+                self.assertEqual(set(result), self.SCENARIO_KEYS)
+                self.assertEqual((result['requests'], result['errors']), (1, 0))
@@ -22,6 +22,11 @@ urlpatterns = [
     path('doctor-performance/',      views.doctor_performance,      name='doctor_performance'),
     path('distributor-performance/', views.distributor_performance, name='distributor_performance'),
     path('product-performance/',     views.product_performance,     name='product_performance'),
+    path('mr-performance/export/',          views.export_snapshots, {'kind': 'mr'},          name='mr_performance_export'),
+    path('doctor-performance/export/',      views.export_snapshots, {'kind': 'doctor'},      name='doctor_performance_export'),
+    path('distributor-performance/export/', views.export_snapshots, {'kind': 'distributor'}, name='distributor_performance_export'),
+    path('product-performance/export/',     views.export_snapshots, {'kind': 'product'},     name='product_performance_export'),
     path('expiry-alerts/',           views.expiry_alerts,           name='expiry_alerts'),
     path('expiry-alerts/<int:pk>/acknowledge/', views.acknowledge_alert, name='acknowledge_alert'),
+    path('expiry-alerts/acknowledge/', views.acknowledge_alerts_bulk, name='acknowledge_alerts_bulk'),
 ]
@@ -4,6 +4,8 @@
 ## crm_analytics/views.py
 ## ═══════════════════════════════════════════════════════════
 
+from urllib.parse import urlencode
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
@@ -16,33 +18,23 @@ from core.auth_utils import (
     get_crm_permission_groups,
     get_crm_allowed_permission_ids,
 )
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Count, Avg, F, Max
+from core.pagination import KeysetPaginator
+from django.db.models import Q, Count
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
 from django.utils import timezone
 from datetime import date
 
+from . import cache as dashboard_cache
+from .exports import EXPORT_FORMATS, SNAPSHOT_EXPORTS, streaming_export_response
+from .facts import summarize_visit_facts
+from .kpis import compute_live_kpis, compute_period_kpis
+from .leaderboards import top_rows
+from .periods import QUARTER_CHOICES, filter_period, month_period, period_from_params
 from .models import (MRPerformanceSnapshot, DoctorPerformanceSnapshot,
                      DistributorPerformanceSnapshot, ProductPerformanceSnapshot,
-                     ExpiryAlert)
-
-
-def _get_month_bounds(month_value):
-    start = date.fromisoformat(f'{month_value}-01')
-    if start.month == 12:
-        next_start = date(start.year + 1, 1, 1)
-    else:
-        next_start = date(start.year, start.month + 1, 1)
-    return start, next_start
-
-
-def _format_period_label(scope, month_value):
-    if scope == 'all':
-        return 'All Data'
-    try:
-        start = date.fromisoformat(f'{month_value}-01')
-    except ValueError:
-        return 'Current Month'
-    return start.strftime('%B %Y')
+                     ExpiryAlert, DemandForecast)
+from .snapshots import add_months
 
 
 def _safe_percentage(numerator, denominator):
@@ -83,19 +75,98 @@ def _attach_distributor_metrics(rows):
     return rows
 
 
+def _visit_range_rows(period, group, model, entity_id=''):
+    """
+    Per-MR or per-doctor visit totals over ``period`` from DailyVisitFact,
+    so week / YTD / custom ranges need not line up with snapshot months.
+    """
+    if period is None:
+        return []
+    ids = [int(entity_id)] if entity_id.isdigit() else None
+    rows = summarize_visit_facts(period.start, period.end, group_by=(group,), **{f'{group}_ids': ids})
+    field = f'{group}_id'
+    entities = model.objects.in_bulk([row[field] for row in rows])
+    for row in rows:
+        row[group] = entities.get(row[field])
+        row['gps_verified_percentage'] = _safe_percentage(row['gps_verified_count'], row['visit_count'])
+        row['roi'] = row['estimated_value'] - row['investment']
+    return sorted(rows, key=lambda row: -row['visit_count'])
+
+
+def _build_live_context(today):
+    """
+    Dashboard sections that do not depend on the selected period.
+    Querysets are evaluated here so the result can be cached.
+    """
+    from core.models import Contact, News
+    from crm_products.models import CompanyStock, StockPosition
+
+    kpis = compute_live_kpis(today)
+    return {
+        **kpis.counters,
+
+        # Low stock
+        'low_stock_items': StockPosition.objects.filter(is_low_stock=True).count(),
+
+        # Unacknowledged alerts
+        'pending_alerts': list(ExpiryAlert.objects.filter(
+            is_acknowledged=False
+        ).select_related('product').order_by('expiry_date')[:5]),
+        'recent_news': list(News.objects.filter(is_published=True).select_related('category', 'author').order_by('-created_at')[:5]),
+        'recent_contacts': list(Contact.objects.all().order_by('-created_at')[:5]),
+        'low_stock_products': list(CompanyStock.objects.select_related('product', 'batch', 'position').filter(
+            position__is_low_stock=True
+        ).order_by('position__available_stock')[:5]),
+
+        # Next month's national demand forecast
+        'demand_forecasts': list(DemandForecast.objects.filter(
+            forecast_month=add_months(today.replace(day=1), 1), region__isnull=True,
+        ).select_related('product').order_by('-forecast_units')[:5]),
+    }
+
+
+def _build_period_context(scope, period_start, period_end, previous_start, previous_end):
+    """
+    Dashboard sections for the selected period: visit counters, recent
+    visits and the top-5 snapshot rows.
+    """
+    from crm_doctors.models import DoctorVisit
+
+    visit_qs = DoctorVisit.objects.select_related('mr', 'doctor', 'visit_location').prefetch_related('product_details', 'investments')
+    if scope != 'all':
+        visit_qs = visit_qs.filter(visit_date__gte=period_start, visit_date__lt=period_end)
+
+    kpis = compute_period_kpis(period_start, period_end, previous_start, previous_end)
+
+    # Top-5 widgets read precomputed boards; see crm_analytics/leaderboards.py.
+    board_month = period_start if scope != 'all' else None
+    mr_rows = _attach_mr_metrics(top_rows('mr_visits', board_month))
+    doctor_rows = _attach_doctor_metrics(top_rows('doctor_visits', board_month))
+    distributor_rows = _attach_distributor_metrics(top_rows('distributor_sales', board_month))
+    product_rows = top_rows('product_revenue', board_month)
+    for row in product_rows:
+        row['growth_percentage'] = round(float(row.get('growth_percentage') or 0), 1)
+
+    return {
+        **kpis.counters,
+
+        # Recent visits
+        'recent_visits': list(visit_qs.order_by('-visit_date', '-visit_time')[:8]),
+
+        # Top MRs this month (by visit count)
+        'top_mrs': mr_rows,
+        'top_doctors': doctor_rows,
+        'top_distributors': distributor_rows,
+        'top_products': product_rows,
+    }
+
+
 @crm_access_required
 def dashboard(request):
     """
     Main CRM dashboard — aggregated KPIs and recent activity.
+    Both halves of the context are cached; see crm_analytics/cache.py.
     """
-    from django.contrib.auth.models import User
-    from core.models import Contact, News, Teams, Cities, Subscribers
-    from hr.models import Employee, Department
-    from crm_products.models import ProductMaster, BatchManagement, CompanyStock
-    from crm_distributors.models import Distributor
-    from crm_sales.models import MedicalRepresentative, Region, Area
-    from crm_doctors.models import Doctor, DoctorVisit
-
     today = timezone.localdate()
     scope = request.GET.get('scope', 'month')
     month_value = request.GET.get('month', today.strftime('%Y-%m'))
@@ -107,187 +178,66 @@ def dashboard(request):
         previous_start = None
         previous_end = None
     else:
+        scope = 'month'
         try:
-            period_start, period_end = _get_month_bounds(month_value)
+            period = month_period(month_value)
         except ValueError:
             month_value = today.strftime('%Y-%m')
-            period_start, period_end = _get_month_bounds(month_value)
-        period_label = _format_period_label(scope, month_value)
+            period = month_period(month_value)
+        period_start, period_end = period.start, period.end
+        period_label = period.label
         if period_start.month == 1:
             previous_start = date(period_start.year - 1, 12, 1)
         else:
             previous_start = date(period_start.year, period_start.month - 1, 1)
         previous_end = period_start
 
-    visit_qs = DoctorVisit.objects.select_related('mr', 'doctor', 'visit_location').prefetch_related('product_details', 'investments')
-    mr_snapshot_qs = MRPerformanceSnapshot.objects.select_related('mr')
-    doctor_snapshot_qs = DoctorPerformanceSnapshot.objects.select_related('doctor')
-    distributor_snapshot_qs = DistributorPerformanceSnapshot.objects.select_related('distributor')
-    product_snapshot_qs = ProductPerformanceSnapshot.objects.select_related('product', 'region', 'distributor', 'mr')
-
-    if scope != 'all':
-        visit_qs = visit_qs.filter(visit_date__gte=period_start, visit_date__lt=period_end)
-        mr_snapshot_qs = mr_snapshot_qs.filter(snapshot_month=period_start)
-        doctor_snapshot_qs = doctor_snapshot_qs.filter(snapshot_month=period_start)
-        distributor_snapshot_qs = distributor_snapshot_qs.filter(snapshot_month=period_start)
-        product_snapshot_qs = product_snapshot_qs.filter(snapshot_month=period_start)
-
-    period_visit_count = visit_qs.count()
-    period_gps_verified = visit_qs.filter(is_gps_verified=True).count()
-    period_doctors_covered = visit_qs.values('doctor_id').distinct().count()
-    period_mrs_active = visit_qs.values('mr_id').distinct().count()
-
-    previous_visit_count = 0
-    previous_gps_verified = 0
-    if scope != 'all':
-        previous_visit_count = DoctorVisit.objects.filter(
-            visit_date__gte=previous_start,
-            visit_date__lt=previous_end,
-        ).count()
-        previous_gps_verified = DoctorVisit.objects.filter(
-            visit_date__gte=previous_start,
-            visit_date__lt=previous_end,
-            is_gps_verified=True,
-        ).count()
-
-    mr_rows = list(mr_snapshot_qs.values('mr').annotate(
-        mr_name=F('mr__name'),
-        mr_code=F('mr__mr_id'),
-        total_visits=Sum('total_visits'),
-        gps_verified_visits=Sum('gps_verified_visits'),
-        total_doctors_covered=Sum('total_doctors_covered'),
-        total_prescription_value_generated=Sum('total_prescription_value_generated'),
-        total_investment_given=Sum('total_investment_given'),
-        efficiency_score=Avg('working_efficiency_score'),
-        latest_month=Max('snapshot_month'),
-    ).order_by('-total_visits', '-latest_month')[:5])
-    mr_rows = _attach_mr_metrics(mr_rows)
-
-    doctor_rows = list(doctor_snapshot_qs.values('doctor').annotate(
-        doctor_name=F('doctor__doctor_name'),
-        doctor_code=F('doctor__doctor_id'),
-        specialty=F('doctor__specialty'),
-        city=F('doctor__city'),
-        total_visits_received=Sum('total_visits_received'),
-        estimated_prescription_per_month=Sum('estimated_prescription_per_month'),
-        total_investment_given=Sum('total_investment_given'),
-        latest_month=Max('snapshot_month'),
-    ).order_by('-total_visits_received', '-latest_month')[:5])
-    doctor_rows = _attach_doctor_metrics(doctor_rows)
-
-    distributor_rows = list(distributor_snapshot_qs.values('distributor').annotate(
-        distributor_name=F('distributor__distributor_name'),
-        city=F('distributor__city'),
-        total_sales_value=Sum('total_sales_value'),
-        total_units_sold=Sum('total_units_sold'),
-        total_unsold_stock=Sum('total_unsold_stock'),
-        total_expired_stock=Sum('total_expired_stock'),
-        efficiency_percentage=Avg('efficiency_percentage'),
-        latest_month=Max('snapshot_month'),
-    ).order_by('-total_sales_value', '-latest_month')[:5])
-    distributor_rows = _attach_distributor_metrics(distributor_rows)
-
-    product_rows = list(product_snapshot_qs.values('product').annotate(
-        product_name=F('product__product_name'),
-        strength=F('product__strength'),
-        category=F('product__category'),
-        total_units_sold=Sum('units_sold'),
-        total_revenue=Sum('revenue'),
-        growth_percentage=Avg('growth_percentage'),
-        latest_month=Max('snapshot_month'),
-    ).order_by('-total_revenue', '-latest_month')[:5])
-    for row in product_rows:
-        row['growth_percentage'] = round(float(row.get('growth_percentage') or 0), 1)
+    live_ctx, live_hit = dashboard_cache.get_or_build(
+        dashboard_cache.live_key(request.user, today),
+        dashboard_cache.LIVE_TIMEOUT,
+        lambda: _build_live_context(today),
+    )
+    period_cache_key, period_timeout = dashboard_cache.period_key(request.user, scope, period_start, today)
+    period_ctx, period_hit = dashboard_cache.get_or_build(
+        period_cache_key,
+        period_timeout,
+        lambda: _build_period_context(scope, period_start, period_end, previous_start, previous_end),
+    )
 
-    # Core counts
     ctx = {
+        **live_ctx,
+        **period_ctx,
         'period_label': period_label,
         'scope': scope,
         'month_value': month_value,
-        'total_products': ProductMaster.objects.filter(status='active').count(),
-        'total_distributors': Distributor.objects.filter(status='active').count(),
-        'total_mrs': MedicalRepresentative.objects.filter(status='active').count(),
-        'total_doctors': Doctor.objects.filter(status='active').count(),
-        'total_employees': Employee.objects.filter(is_active=True).count(),
-        'total_departments': Department.objects.filter(is_active=True).count(),
-        'total_regions': Region.objects.filter(is_active=True).count(),
-        'total_areas': Area.objects.filter(is_active=True).count(),
-        'total_news': News.objects.filter(is_published=True).count(),
-        'total_teams': Teams.objects.filter(is_active=True).count(),
-        'total_cities': Cities.objects.count(),
-        'total_subscribers': Subscribers.objects.count(),
-        'total_users': User.objects.count(),
-        'unread_contacts': Contact.objects.filter(is_read=False).count(),
-
-        # Today's visits
-        'visits_today': DoctorVisit.objects.filter(visit_date=today).count(),
-        'visits_month': DoctorVisit.objects.filter(
-            visit_date__gte=today.replace(day=1)
-        ).count(),
-        'period_visit_count': period_visit_count,
-        'period_gps_verified': period_gps_verified,
-        'period_doctors_covered': period_doctors_covered,
-        'period_mrs_active': period_mrs_active,
-        'previous_visit_count': previous_visit_count,
-        'previous_gps_verified': previous_gps_verified,
-
-        # GPS verified this month
-        'gps_verified_month': DoctorVisit.objects.filter(
-            visit_date__gte=today.replace(day=1), is_gps_verified=True
-        ).count(),
-
-        # Expiry alerts
-        'expiry_alerts_count': ExpiryAlert.objects.filter(is_acknowledged=False).count(),
-        'near_expiry_batches': BatchManagement.objects.filter(batch_status='near_expiry').count(),
-        'expired_batches':     BatchManagement.objects.filter(batch_status='expired').count(),
-
-        # Low stock
-        'low_stock_items': sum(
-            1 for s in CompanyStock.objects.all() if s.is_low_stock
-        ),
-
-        # Recent visits
-        'recent_visits': visit_qs.order_by('-visit_date', '-visit_time')[:8],
-
-        # Top MRs this month (by visit count)
-        'top_mrs': mr_rows,
-        'top_doctors': doctor_rows,
-        'top_distributors': distributor_rows,
-        'top_products': product_rows,
-
-        # Unacknowledged alerts
-        'pending_alerts': ExpiryAlert.objects.filter(
-            is_acknowledged=False
-        ).select_related('product').order_by('expiry_date')[:5],
-        'recent_news': News.objects.filter(is_published=True).select_related('category', 'author').order_by('-created_at')[:5],
-        'recent_contacts': Contact.objects.all().order_by('-created_at')[:5],
-        'low_stock_products': CompanyStock.objects.select_related('product', 'batch').annotate(
-            available_stock=F('batch__quantity_manufactured') - F('batch__quantity_sent_to_distributors')
-        ).filter(available_stock__lte=F('low_stock_threshold')).order_by('available_stock')[:5],
         'month_select_value': month_value,
     }
-    return render(request, 'crm/analytics/dashboard.html', ctx)
+    response = render(request, 'crm/analytics/dashboard.html', ctx)
+    response['X-Dashboard-Cache'] = 'HIT' if live_hit and period_hit else 'MISS'
+    return response
 
 
 @crm_access_required
 def mr_performance(request):
     qs = MRPerformanceSnapshot.objects.select_related('mr').order_by('-snapshot_month', '-total_visits')
 
-    month = request.GET.get('month', '')
-    mr_id = request.GET.get('mr', '')
-    if month:
-        qs = qs.filter(snapshot_month__startswith=month)
+    period = period_from_params(request.GET)
+    mr_id  = request.GET.get('mr', '')
+    qs = filter_period(qs, period)
     if mr_id:
         qs = qs.filter(mr_id=mr_id)
 
     from crm_sales.models import MedicalRepresentative
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ('-snapshot_month', '-total_visits', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'crm/analytics/mr_performance.html', {
         'page_obj': page,
+        'range_rows': _visit_range_rows(period, 'mr', MedicalRepresentative, mr_id),
         'mrs': MedicalRepresentative.objects.filter(status='active'),
-        'total': qs.count(),
+        'period': period,
+        'quarters': QUARTER_CHOICES,
+        'total': paginator.total,
     })
 
 
@@ -295,21 +245,23 @@ def mr_performance(request):
 def doctor_performance(request):
     qs = DoctorPerformanceSnapshot.objects.select_related('doctor').order_by('-snapshot_month')
 
-    month  = request.GET.get('month', '')
+    period = period_from_params(request.GET)
     doc_id = request.GET.get('doctor', '')
-    if month:
-        qs = qs.filter(snapshot_month__startswith=month)
+    qs = filter_period(qs, period)
     if doc_id:
         qs = qs.filter(doctor_id=doc_id)
 
     from crm_doctors.models import Doctor
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ('-snapshot_month', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'crm/analytics/doctor_performance.html', {
         'page_obj': page,
+        'range_rows': _visit_range_rows(period, 'doctor', Doctor, doc_id),
         'doctors': Doctor.objects.filter(status='active'),
-        'total': qs.count(),
+        'period': period,
+        'quarters': QUARTER_CHOICES,
+        'total': paginator.total,
     })
 
 
@@ -317,21 +269,22 @@ def doctor_performance(request):
 def distributor_performance(request):
     qs = DistributorPerformanceSnapshot.objects.select_related('distributor').order_by('-snapshot_month')
 
-    month   = request.GET.get('month', '')
+    period  = period_from_params(request.GET)
     dist_id = request.GET.get('distributor', '')
-    if month:
-        qs = qs.filter(snapshot_month__startswith=month)
+    qs = filter_period(qs, period)
     if dist_id:
         qs = qs.filter(distributor_id=dist_id)
 
     from crm_distributors.models import Distributor
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ('-snapshot_month', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'crm/analytics/distributor_performance.html', {
         'page_obj': page,
         'distributors': Distributor.objects.filter(status='active'),
-        'total': qs.count(),
+        'period': period,
+        'quarters': QUARTER_CHOICES,
+        'total': paginator.total,
     })
 
 
@@ -341,31 +294,46 @@ def product_performance(request):
         'product', 'region', 'distributor', 'mr'
     ).order_by('-snapshot_month', '-revenue')
 
-    month    = request.GET.get('month', '')
-    prod_id  = request.GET.get('product', '')
-    if month:
-        qs = qs.filter(snapshot_month__startswith=month)
+    period = period_from_params(request.GET)
+    prod_id = request.GET.get('product', '')
+    qs = filter_period(qs, period)
     if prod_id:
         qs = qs.filter(product_id=prod_id)
 
     from crm_products.models import ProductMaster
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ('-snapshot_month', '-revenue', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'crm/analytics/product_performance.html', {
         'page_obj': page,
         'products': ProductMaster.objects.filter(status='active'),
-        'total':    qs.count(),
+        'period': period,
+        'quarters': QUARTER_CHOICES,
+        'total':    paginator.total,
     })
 
 
 @crm_access_required
-def expiry_alerts(request):
-    qs = ExpiryAlert.objects.select_related('product', 'distributor').order_by('expiry_date')
-
-    ack_filter = request.GET.get('ack', '')
-    alert_type = request.GET.get('type', '')
-    source     = request.GET.get('source', '')
+def export_snapshots(request, kind):
+    """
+    Stream every snapshot row matching the performance page filters as CSV
+    (default) or NDJSON (``?format=ndjson``).
+    """
+    export = SNAPSHOT_EXPORTS[kind]
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unsupported format: {fmt}')
+    entity_id = request.GET.get(export.entity_param, '')
+    if entity_id and not entity_id.isdigit():
+        return HttpResponseBadRequest(f'Invalid {export.entity_param}: {entity_id}')
+    return streaming_export_response(export, request.GET, fmt)
+
+
+def _filter_alerts(qs, params):
+    """Apply the expiry alert list filters (ack / type / source) from ``params``."""
+    ack_filter = params.get('ack', '')
+    alert_type = params.get('type', '')
+    source     = params.get('source', '')
 
     if ack_filter == '0':
         qs = qs.filter(is_acknowledged=False)
@@ -375,13 +343,23 @@ def expiry_alerts(request):
         qs = qs.filter(alert_type=alert_type)
     if source:
         qs = qs.filter(source=source)
+    return qs
+
+
+@crm_access_required
+def expiry_alerts(request):
+    qs = _filter_alerts(
+        ExpiryAlert.objects.select_related('product', 'distributor').order_by('expiry_date'),
+        request.GET,
+    )
 
-    paginator = Paginator(qs, 25)
-    page = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(qs, ('expiry_date', 'id'), per_page=25, approximate_total=True)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'crm/analytics/expiry_alerts.html', {
         'page_obj':    page,
-        'total':       qs.count(),
+        'total':       paginator.total,
+        'total_exact': paginator.total_is_exact,
         'pending':     ExpiryAlert.objects.filter(is_acknowledged=False).count(),
         'alert_types': ExpiryAlert.ALERT_TYPE_CHOICES,
         'sources':     ExpiryAlert.SOURCE_CHOICES,
@@ -397,6 +375,56 @@ def acknowledge_alert(request, pk):
     return redirect('crm_analytics:expiry_alerts')
 
 
+def _wants_json(request):
+    """
+    True unless the request is a plain browser form post. Browsers name
+    text/html first in Accept; fetch() and XHR default to ``*/*`` or set
+    X-Requested-With.
+    """
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return True
+    names_html = any(t.main_type == 'text' and t.sub_type == 'html' for t in request.accepted_types)
+    return not names_html or request.get_preferred_type(['text/html', 'application/json']) != 'text/html'
+
+
+@crm_access_required
+def acknowledge_alerts_bulk(request):
+    """
+    Acknowledge many alerts with a single UPDATE.
+    POST either ``ids`` (repeated) or the list filters ``type`` / ``source``;
+    with no ids, every pending alert matching the filter is acknowledged.
+    Returns ``{"acknowledged": n}`` unless this is a browser form post,
+    which is redirected back to the filtered list.
+    """
+    if request.method != 'POST':
+        return redirect('crm_analytics:expiry_alerts')
+
+    ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+    if ids:
+        qs = ExpiryAlert.objects.filter(pk__in=ids)
+    elif request.POST.get('scope') == 'filter':
+        qs = _filter_alerts(ExpiryAlert.objects.all(), request.POST)
+    else:
+        qs = ExpiryAlert.objects.none()
+
+    count = qs.filter(is_acknowledged=False).update(
+        is_acknowledged=True,
+        acknowledged_at=timezone.now(),
+        acknowledged_by=request.user.get_full_name() or request.user.username,
+    )
+    if count:
+        # QuerySet.update() sends no post_save, so drop the dashboard cache here.
+        dashboard_cache.invalidate_live()
+
+    if _wants_json(request):
+        return JsonResponse({'acknowledged': count})
+
+    messages.success(request, f'{count} alert(s) acknowledged.')
+    params = {key: request.POST[key] for key in ('ack', 'type', 'source') if request.POST.get(key)}
+    url = reverse('crm_analytics:expiry_alerts')
+    return redirect(f'{url}?{urlencode(params)}' if params else url)
+
+
 def crm_login(request):
     if request.user.is_authenticated:
         if is_crm_user(request.user):
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import secrets
+from typing import Any
+
+from django.db import connection, transaction
+
+from crm_products.models import Division, ProductMaster
+from crm_sales.models import Region, Area, MedicalRepresentative
+from crm_doctors.models import Doctor
+from crm_distributors.models import Distributor
+from crm_stores.models import MedicalStore
+
+
+BATCH_SIZE = 2000
+
+# Models whose save() fills a code from the next primary key. bulk_create skips
+# save(), so bulk_insert writes the code from the key the row was given.
+AUTO_CODES: dict[Any, tuple[str, str]] = {
+    Division: ('division_id', 'DIV-{:04d}'),
+    Region: ('region_id', 'REG-{:04d}'),
+    Area: ('area_id', 'AREA-{:04d}'),
+    MedicalRepresentative: ('mr_id', 'MR-{:05d}'),
+    ProductMaster: ('product_id', 'PROD-{:05d}'),
+    Doctor: ('doctor_id', 'DOC-{:05d}'),
+    Distributor: ('distributor_id', 'DIST-{:04d}'),
+    MedicalStore: ('store_id', 'STORE-{:05d}'),
+}
+
+
+def _placeholder_code() -> str:
+    # Unique stand-in for an auto code until the row's primary key is known.
+    return f'~{secrets.token_hex(8)}'
+
+
+def bulk_insert(model: Any, objs: list[Any], batch_size: int = BATCH_SIZE) -> list[Any]:
+    """
+    ``bulk_create`` that keeps the auto codes save() would have written.
+
+    For models in AUTO_CODES the rows are inserted with a placeholder code
+    and their primary keys read back from the insert, so the database hands
+    them out exactly as it does for save() and concurrent writers never get
+    the same ids; the codes are then written from the keys with one upsert
+    per batch. Backends that cannot return inserted keys fall back to save().
+    """
+    if not objs:
+        return objs
+    with transaction.atomic():
+        code = AUTO_CODES.get(model)
+        if code is None:
+            return model.objects.bulk_create(objs, batch_size=batch_size)
+
+        if not connection.features.can_return_rows_from_bulk_insert:
+            for obj in objs:
+                obj.save()
+            return objs
+
+        field_name, template = code
+        missing = [obj for obj in objs if not getattr(obj, field_name)]
+        for obj in missing:
+            setattr(obj, field_name, _placeholder_code())
+        model.objects.bulk_create(objs, batch_size=batch_size)
+
+        for obj in missing:
+            setattr(obj, field_name, template.format(obj.pk))
+        if missing:
+            model.objects.bulk_create(
+                missing,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[model._meta.pk.name],
+                update_fields=[field_name],
+            )
+    return objs
@@ -3,6 +3,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime, time
 from decimal import Decimal, InvalidOperation
+from itertools import chain
+from operator import itemgetter
 from typing import Any, Callable
 
 from crm_products.models import Division, ProductMaster, BatchManagement, CompanyStock
@@ -11,11 +13,21 @@ from crm_doctors.models import Doctor, DoctorPracticeLocation, DoctorVisit
 from crm_distributors.models import Distributor, DistributorStockEntry, DistributorSalesValue
 from crm_stores.models import MedicalStore, StoreProductTracking
 
+from .bulk import bulk_insert
+
+
+# Distinct lookup values per ``__in`` query; keeps SQLite under its variable limit.
+LOOKUP_BATCH_SIZE = 500
+
+# Column kinds resolved against the database rather than parsed from the cell.
+RELATION_KINDS = ('fk', 'm2m')
+
 
 @dataclass(frozen=True)
 class ExportColumn:
     header: str
     getter: Callable[[Any], Any]
+    relations: tuple[str, ...] = ()     # lookup paths the getter follows, e.g. 'mr' or 'region__division'
 
 
 @dataclass(frozen=True)
@@ -40,8 +52,8 @@ class ImportErrorRow(Exception):
         self.message = message
 
 
-def export_text(header: str, getter: Callable[[Any], Any]) -> ExportColumn:
-    return ExportColumn(header=header, getter=getter)
+def export_text(header: str, getter: Callable[[Any], Any], relations: tuple[str, ...] = ()) -> ExportColumn:
+    return ExportColumn(header=header, getter=getter, relations=relations)
 
 
 def import_text(
@@ -62,11 +74,11 @@ def import_decimal(header: str, field_name: str, required: bool = False, default
 
 
 def import_date(header: str, field_name: str, required: bool = False) -> ImportColumn:
-    return ImportColumn(header=header, field_name=field_name, kind='date', required=required)
+    return ImportColumn(header=header, field_name=field_name, kind='date', required=required, default=None)
 
 
 def import_time(header: str, field_name: str, required: bool = False) -> ImportColumn:
-    return ImportColumn(header=header, field_name=field_name, kind='time', required=required)
+    return ImportColumn(header=header, field_name=field_name, kind='time', required=required, default=None)
 
 
 def import_bool(header: str, field_name: str, required: bool = False, default: Any = True) -> ImportColumn:
@@ -221,6 +233,91 @@ def _resolve_m2m(column: ImportColumn, raw_value: Any):
     return results
 
 
+def _lookup_values(column: ImportColumn, raw_value: Any) -> list[str]:
+    text = '' if raw_value is None else str(raw_value).strip()
+    if not text:
+        return []
+    if column.kind == 'm2m':
+        return [part.strip() for part in text.split(column.delimiter) if part.strip()]
+    return [text]
+
+
+class ImportResolver:
+    """
+    FK / M2M lookups for one import. Every distinct value of each relation
+    column is fetched up front with one ``__in`` query per column (per
+    LOOKUP_BATCH_SIZE values), and cells are then resolved from memory.
+
+    With ``create_missing`` the values of ``create_if_missing`` columns that
+    were not found are created in one bulk insert; without it (the preview)
+    they are accepted and resolve to None, so validating a file never writes.
+    """
+
+    def __init__(self, columns: list[ImportColumn], rows: list[dict[str, Any]], create_missing: bool = False):
+        self.create_missing = create_missing
+        self._objects: dict[str, dict[str, Any]] = {}
+
+        relation_columns = [column for column in columns if column.kind in RELATION_KINDS]
+        wanted: dict[str, set[str]] = {column.header: set() for column in relation_columns}
+        for row in rows:
+            for column in relation_columns:
+                wanted[column.header].update(_lookup_values(column, row.get(column.header, '')))
+
+        for column in relation_columns:
+            self._objects[column.header] = self._fetch(column, wanted[column.header])
+
+    def _fetch(self, column: ImportColumn, values: set[str]) -> dict[str, Any]:
+        found: dict[str, Any] = {}
+        ordered = sorted(values)
+        for start in range(0, len(ordered), LOOKUP_BATCH_SIZE):
+            queryset = column.lookup_model.objects.filter(
+                **{f'{column.lookup_field}__in': ordered[start:start + LOOKUP_BATCH_SIZE]}
+            )
+            # Same winner as .first() when a value matches more than one row.
+            for obj in (queryset if queryset.ordered else queryset.order_by('pk')):
+                found.setdefault(str(getattr(obj, column.lookup_field)), obj)
+
+        missing = [value for value in ordered if value not in found]
+        if missing and column.create_if_missing and self.create_missing:
+            created = []
+            for value in missing:
+                defaults = dict(column.create_defaults or {})
+                defaults.setdefault(column.lookup_field, value)
+                created.append(column.lookup_model(**defaults))
+            for value, obj in zip(missing, bulk_insert(column.lookup_model, created)):
+                found[value] = obj
+        return found
+
+    def resolve_fk(self, column: ImportColumn, raw_value: Any):
+        if raw_value in (None, ''):
+            if column.required:
+                raise ImportErrorRow(f'{column.header} is required')
+            return None
+
+        lookup_value = str(raw_value).strip()
+        objects = self._objects[column.header]
+        if lookup_value in objects:
+            return objects[lookup_value]
+        if column.create_if_missing:
+            return None
+        raise ImportErrorRow(f'Could not find related {column.lookup_model.__name__} for {column.header}: {lookup_value}')
+
+    def resolve_m2m(self, column: ImportColumn, raw_value: Any):
+        objects = self._objects[column.header]
+        results = []
+        missing = []
+        for value in _lookup_values(column, raw_value):
+            if value in objects:
+                results.append(objects[value])
+            elif not column.create_if_missing:
+                missing.append(value)
+        if missing:
+            raise ImportErrorRow(
+                f'Could not find related {column.lookup_model.__name__}(s) for {column.header}: {", ".join(missing)}'
+            )
+        return results
+
+
 def export_value(column: ExportColumn, obj: Any) -> str:
     value = column.getter(obj)
     if value is None:
@@ -232,49 +329,130 @@ def export_value(column: ExportColumn, obj: Any) -> str:
     return str(value)
 
 
-def parse_row(columns: list[ImportColumn], row: dict[str, Any]) -> tuple[dict[str, Any], list[str]]:
-    cleaned: dict[str, Any] = {}
-    errors: list[str] = []
+def _follows_single_objects(model: Any, path: str) -> bool:
+    """True when every hop of ``path`` is a forward FK / one-to-one, so it can be joined."""
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.many_to_many or field.one_to_many:
+            return False
+        model = field.related_model
+    return True
 
+
+def export_queryset(model: Any, columns: list[ExportColumn]):
+    """
+    ``model`` rows with every relation the export columns declare loaded up
+    front: single-valued paths are joined with select_related and the rest
+    prefetched, so an export runs the same number of queries per chunk
+    whatever the row count.
+    """
+    joined: set[str] = set()
+    prefetched: set[str] = set()
     for column in columns:
-        raw_value = row.get(column.header, '')
-        if isinstance(raw_value, str):
-            raw_value = raw_value.strip()
+        for path in column.relations:
+            (joined if _follows_single_objects(model, path) else prefetched).add(path)
+
+    queryset = model.objects.all()
+    if joined:
+        queryset = queryset.select_related(*sorted(joined))
+    if prefetched:
+        queryset = queryset.prefetch_related(*sorted(prefetched))
+    return queryset
 
+
+def _cell(row: dict[str, Any], column: ImportColumn) -> Any:
+    raw_value = row.get(column.header, '')
+    return raw_value.strip() if isinstance(raw_value, str) else raw_value
+
+
+def _parse_value(column: ImportColumn, raw_value: Any) -> Any:
+    if column.kind == 'text':
+        return str(raw_value).strip()
+    if column.kind == 'int':
+        return _parse_int(raw_value)
+    if column.kind == 'decimal':
+        return _parse_decimal(raw_value)
+    if column.kind == 'date':
+        return _parse_date(raw_value)
+    if column.kind == 'time':
+        return _parse_time(raw_value)
+    if column.kind == 'bool':
+        return _parse_bool(raw_value)
+    if column.kind == 'choice':
+        return _parse_choice(raw_value, column.choices)
+    return raw_value
+
+
+def parse_values(columns: list[ImportColumn], row: dict[str, Any]) -> tuple[dict[str, Any], list[tuple[int, str]]]:
+    """
+    The half of parse_row that needs no database: every cell except
+    non-empty FK / M2M cells, which resolve_relations fills in. Errors are
+    ``(column index, message)`` pairs so the halves merge in column order.
+    """
+    cleaned: dict[str, Any] = {}
+    errors: list[tuple[int, str]] = []
+
+    for index, column in enumerate(columns):
+        raw_value = _cell(row, column)
         if raw_value in (None, ''):
             if column.required:
-                errors.append(f'{column.header} is required')
+                errors.append((index, f'{column.header} is required'))
             else:
                 cleaned[column.field_name or column.header] = column.default
             continue
+        if column.kind in RELATION_KINDS:
+            continue
+        try:
+            cleaned[column.field_name or column.header] = _parse_value(column, raw_value)
+        except ImportErrorRow as exc:
+            errors.append((index, str(exc)))
+
+    return cleaned, errors
+
+
+def resolve_relations(
+    columns: list[ImportColumn],
+    row: dict[str, Any],
+    resolver: ImportResolver | None = None,
+) -> tuple[dict[str, Any], list[tuple[int, str]]]:
+    """The non-empty FK / M2M cells of ``row``, from ``resolver`` when given; errors as in parse_values."""
+    cleaned: dict[str, Any] = {}
+    errors: list[tuple[int, str]] = []
 
+    for index, column in enumerate(columns):
+        if column.kind not in RELATION_KINDS:
+            continue
+        raw_value = _cell(row, column)
+        if raw_value in (None, ''):
+            continue
         try:
-            if column.kind == 'text':
-                cleaned[column.field_name or column.header] = str(raw_value).strip()
-            elif column.kind == 'int':
-                cleaned[column.field_name or column.header] = _parse_int(raw_value)
-            elif column.kind == 'decimal':
-                cleaned[column.field_name or column.header] = _parse_decimal(raw_value)
-            elif column.kind == 'date':
-                cleaned[column.field_name or column.header] = _parse_date(raw_value)
-            elif column.kind == 'time':
-                cleaned[column.field_name or column.header] = _parse_time(raw_value)
-            elif column.kind == 'bool':
-                cleaned[column.field_name or column.header] = _parse_bool(raw_value)
-            elif column.kind == 'choice':
-                cleaned[column.field_name or column.header] = _parse_choice(raw_value, column.choices)
-            elif column.kind == 'fk':
-                cleaned[column.field_name or column.header] = _resolve_fk(column, raw_value)
-            elif column.kind == 'm2m':
-                cleaned[column.field_name or column.header] = _resolve_m2m(column, raw_value)
+            if column.kind == 'fk':
+                value = resolver.resolve_fk(column, raw_value) if resolver else _resolve_fk(column, raw_value)
             else:
-                cleaned[column.field_name or column.header] = raw_value
+                value = resolver.resolve_m2m(column, raw_value) if resolver else _resolve_m2m(column, raw_value)
+            cleaned[column.field_name or column.header] = value
         except ImportErrorRow as exc:
-            errors.append(str(exc))
+            errors.append((index, str(exc)))
 
     return cleaned, errors
 
 
+def merge_errors(*errors: list[tuple[int, str]]) -> list[str]:
+    """Messages of parse_values / resolve_relations errors, in column order."""
+    return [message for _, message in sorted(chain.from_iterable(errors), key=itemgetter(0))]
+
+
+def parse_row(
+    columns: list[ImportColumn],
+    row: dict[str, Any],
+    resolver: ImportResolver | None = None,
+) -> tuple[dict[str, Any], list[str]]:
+    cleaned, errors = parse_values(columns, row)
+    relations, relation_errors = resolve_relations(columns, row, resolver)
+    cleaned.update(relations)
+    return cleaned, merge_errors(errors, relation_errors)
+
+
 DATA_MODELS: dict[str, dict[str, Any]] = {
     'territory': {
         'model': Division,
@@ -321,7 +499,7 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             export_text('Generic Name', lambda obj: obj.generic_name),
             export_text('Brand Name', lambda obj: obj.brand_name),
             export_text('Category', lambda obj: obj.get_category_display()),
-            export_text('Territory', lambda obj: obj.division.name if obj.division else ''),
+            export_text('Territory', lambda obj: obj.division.name if obj.division else '', ('division',)),
             export_text('Strength', lambda obj: obj.strength),
             export_text('Packing Size', lambda obj: obj.packing_size),
             export_text('Manufacturing / Factory Price', lambda obj: obj.manufacturing_cost_per_unit),
@@ -373,7 +551,7 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'lookup': lambda data: {'batch_number': data.get('Batch Number')},
         'export_columns': [
             export_text('Batch Number', lambda obj: obj.batch_number),
-            export_text('Product', lambda obj: obj.product.product_name),
+            export_text('Product', lambda obj: obj.product.product_name, ('product',)),
             export_text('Manufacturing Date', lambda obj: obj.manufacturing_date),
             export_text('Expiry Date', lambda obj: obj.expiry_date),
             export_text('Quantity Manufactured', lambda obj: obj.quantity_manufactured),
@@ -410,8 +588,8 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'file_prefix': 'company_stock',
         'lookup': lambda data: {'batch__batch_number': data.get('Batch')},
         'export_columns': [
-            export_text('Product', lambda obj: obj.product.product_name),
-            export_text('Batch', lambda obj: obj.batch.batch_number),
+            export_text('Product', lambda obj: obj.product.product_name, ('product',)),
+            export_text('Batch', lambda obj: obj.batch.batch_number, ('batch',)),
             export_text('Warehouse Location', lambda obj: obj.warehouse_location),
             export_text('Low Stock Threshold', lambda obj: obj.low_stock_threshold),
         ],
@@ -493,9 +671,9 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             'report_period_end': data.get('Report Period End'),
         },
         'export_columns': [
-            export_text('Distributor License Number', lambda obj: obj.distributor.license_number),
-            export_text('Product', lambda obj: obj.product.product_name),
-            export_text('Batch', lambda obj: obj.batch.batch_number if obj.batch else ''),
+            export_text('Distributor License Number', lambda obj: obj.distributor.license_number, ('distributor',)),
+            export_text('Product', lambda obj: obj.product.product_name, ('product',)),
+            export_text('Batch', lambda obj: obj.batch.batch_number if obj.batch else '', ('batch',)),
             export_text('Opening Stock', lambda obj: obj.opening_stock),
             export_text('Received Quantity', lambda obj: obj.received_quantity),
             export_text('Sold Quantity', lambda obj: obj.sold_quantity),
@@ -546,8 +724,8 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             'sale_date': data.get('Sale Date'),
         },
         'export_columns': [
-            export_text('Distributor License Number', lambda obj: obj.distributor.license_number),
-            export_text('Product', lambda obj: obj.product.product_name),
+            export_text('Distributor License Number', lambda obj: obj.distributor.license_number, ('distributor',)),
+            export_text('Product', lambda obj: obj.product.product_name, ('product',)),
             export_text('Quantity Sold', lambda obj: obj.quantity_sold),
             export_text('Price Per Unit', lambda obj: obj.price_per_unit),
             export_text('Sale Date', lambda obj: obj.sale_date),
@@ -582,7 +760,7 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'export_columns': [
             export_text('Region ID', lambda obj: obj.region_id),
             export_text('Region Name', lambda obj: obj.region_name),
-            export_text('Territory', lambda obj: obj.division.name),
+            export_text('Territory', lambda obj: '; '.join(division.name for division in obj.division.all()), ('division',)),
             export_text('Regional Manager', lambda obj: obj.regional_manager),
             export_text('Active', lambda obj: obj.is_active),
         ],
@@ -614,8 +792,10 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'export_columns': [
             export_text('Area ID', lambda obj: obj.area_id),
             export_text('Area Name', lambda obj: obj.area_name),
-            export_text('Region', lambda obj: obj.region.region_name),
-            export_text('Territory', lambda obj: obj.region.division.name),
+            export_text('Region', lambda obj: '; '.join(region.region_name for region in obj.region.all()), ('region',)),
+            export_text('Territory', lambda obj: '; '.join(
+                division.name for region in obj.region.all() for division in region.division.all()
+            ), ('region__division',)),
             export_text('Area Manager', lambda obj: obj.area_manager),
             export_text('Active', lambda obj: obj.is_active),
         ],
@@ -648,13 +828,13 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             export_text('Phone Number', lambda obj: obj.phone_number),
             export_text('Email', lambda obj: obj.email),
             export_text('Address', lambda obj: obj.address),
-            export_text('Territory', lambda obj: obj.division.name if obj.division else ''),
-            export_text('Region', lambda obj: obj.region.region_name if obj.region else ''),
-            export_text('Area', lambda obj: obj.area.area_name if obj.area else ''),
+            export_text('Territory', lambda obj: obj.division.name if obj.division else '', ('division',)),
+            export_text('Region', lambda obj: obj.region.region_name if obj.region else '', ('region',)),
+            export_text('Area', lambda obj: obj.area.area_name if obj.area else '', ('area',)),
             export_text('Date Of Joining', lambda obj: obj.date_of_joining),
             export_text('Salary', lambda obj: obj.salary),
             export_text('Status', lambda obj: obj.get_status_display()),
-            export_text('Assigned Doctors', lambda obj: '; '.join(obj.assigned_doctors.values_list('doctor_id', flat=True))),
+            export_text('Assigned Doctors', lambda obj: '; '.join(doctor.doctor_id for doctor in obj.assigned_doctors.all()), ('assigned_doctors',)),
         ],
         'import_columns': [
             import_text('Name', 'name', required=True),
@@ -702,13 +882,13 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             export_text('Hospital Name', lambda obj: obj.hospital_name),
             export_text('Clinic Name', lambda obj: obj.clinic_name),
             export_text('City', lambda obj: obj.city),
-            export_text('Area', lambda obj: obj.area.area_name if obj.area else ''),
+            export_text('Area', lambda obj: obj.area.area_name if obj.area else '', ('area',)),
             export_text('Contact Number', lambda obj: obj.contact_number),
             export_text('Email', lambda obj: obj.email),
             export_text('Patients Per Day', lambda obj: obj.estimated_patients_per_day),
             export_text('Prescription Potential', lambda obj: obj.estimated_prescription_potential),
             export_text('Status', lambda obj: obj.get_status_display()),
-            export_text('Assigned MRs', lambda obj: '; '.join(obj.assigned_mrs.values_list('mr_id', flat=True))),
+            export_text('Assigned MRs', lambda obj: '; '.join(mr.mr_id for mr in obj.assigned_mrs.all()), ('assigned_mrs',)),
         ],
         'import_columns': [
             import_text('Doctor Name', 'doctor_name', required=True),
@@ -751,7 +931,7 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'file_prefix': 'doctor_practice_locations',
         'lookup': lambda data: {'doctor__doctor_name': data.get('Doctor Name'), 'location_name': data.get('Location Name')},
         'export_columns': [
-            export_text('Doctor Name', lambda obj: obj.doctor.doctor_name),
+            export_text('Doctor Name', lambda obj: obj.doctor.doctor_name, ('doctor',)),
             export_text('Location Name', lambda obj: obj.location_name),
             export_text('Location Type', lambda obj: obj.get_location_type_display()),
             export_text('Address', lambda obj: obj.address),
@@ -782,9 +962,9 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'file_prefix': 'doctor_visits',
         'lookup': lambda data: {'doctor__doctor_name': data.get('Doctor Name'), 'mr__mr_id': data.get('MR ID'), 'visit_date': data.get('Visit Date'), 'visit_time': data.get('Visit Time')},
         'export_columns': [
-            export_text('MR ID', lambda obj: obj.mr.mr_id),
-            export_text('Doctor Name', lambda obj: obj.doctor.doctor_name),
-            export_text('Visit Location', lambda obj: obj.visit_location.location_name if obj.visit_location else obj.hospital_clinic_name),
+            export_text('MR ID', lambda obj: obj.mr.mr_id, ('mr',)),
+            export_text('Doctor Name', lambda obj: obj.doctor.doctor_name, ('doctor',)),
+            export_text('Visit Location', lambda obj: obj.visit_location.location_name if obj.visit_location else obj.hospital_clinic_name, ('visit_location',)),
             export_text('Visit Date', lambda obj: obj.visit_date),
             export_text('Visit Time', lambda obj: obj.visit_time),
             export_text('Visit Status', lambda obj: obj.get_visit_type_display()),
@@ -842,11 +1022,11 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
             export_text('Owner Name', lambda obj: obj.owner_name),
             export_text('Phone', lambda obj: obj.phone),
             export_text('Address', lambda obj: obj.address),
-            export_text('Area', lambda obj: obj.area.area_name if obj.area else ''),
-            export_text('Distributor', lambda obj: obj.distributor.distributor_name if obj.distributor else ''),
+            export_text('Area', lambda obj: obj.area.area_name if obj.area else '', ('area',)),
+            export_text('Distributor', lambda obj: obj.distributor.distributor_name if obj.distributor else '', ('distributor',)),
             export_text('Drug License Number', lambda obj: obj.drug_license_number),
             export_text('Status', lambda obj: obj.get_status_display()),
-            export_text('Linked Doctors', lambda obj: '; '.join(obj.linked_doctors.values_list('doctor_id', flat=True))),
+            export_text('Linked Doctors', lambda obj: '; '.join(doctor.doctor_id for doctor in obj.linked_doctors.all()), ('linked_doctors',)),
         ],
         'import_columns': [
             import_text('Store Name', 'store_name', required=True),
@@ -881,8 +1061,8 @@ DATA_MODELS: dict[str, dict[str, Any]] = {
         'file_prefix': 'store_product_trackings',
         'lookup': lambda data: {'store__store_name': data.get('Store Name'), 'product__product_name': data.get('Product')},
         'export_columns': [
-            export_text('Store Name', lambda obj: obj.store.store_name),
-            export_text('Product', lambda obj: obj.product.product_name),
+            export_text('Store Name', lambda obj: obj.store.store_name, ('store',)),
+            export_text('Product', lambda obj: obj.product.product_name, ('product',)),
             export_text('Availability', lambda obj: obj.get_availability_display()),
             export_text('Monthly Sales Estimate', lambda obj: obj.monthly_sales_estimate),
             export_text('Monthly Revenue Estimate', lambda obj: obj.monthly_revenue_estimate),
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+
+from crm_analytics.cache import INVALIDATING_APPS
+from crm_analytics.signals import (KEY_FIELDS, invalidate_dashboard_on_commit, queue_bulk_snapshot_keys,
+                                   queue_coverage_keys)
+from crm_products.models import BatchManagement, CompanyStock
+from crm_products.stock_positions import refresh_batch_statuses, refresh_stock_positions
+from crm_doctors.models import Doctor, DoctorPracticeLocation, DoctorVisit
+from crm_distributors.models import DistributorStockEntry
+
+from .bulk import BATCH_SIZE, bulk_insert
+from .config import LOOKUP_BATCH_SIZE, ImportResolver, parse_row
+
+
+def _final_field(model: Any, path: str):
+    *hops, name = path.split('__')
+    for hop in hops:
+        model = model._meta.get_field(hop).related_model
+    return model._meta.get_field(name)
+
+
+def _lookup_key(model: Any, lookup: dict[str, Any]):
+    """
+    Hashable ``(paths, values)`` for a row lookup, with the raw CSV values
+    coerced the way the ORM would coerce them in ``filter(**lookup)``.
+    None when there is nothing to match on, or a value cannot be coerced.
+    """
+    lookup = {path: value for path, value in lookup.items() if value not in (None, '')}
+    if not lookup:
+        return None
+    paths = tuple(sorted(lookup))
+    try:
+        return paths, tuple(_final_field(model, path).to_python(lookup[path]) for path in paths)
+    except ValidationError:
+        return None
+
+
+def _existing_instances(model: Any, keys: set) -> dict:
+    """Saved rows for ``keys``, picking the same row ``filter(**lookup).first()`` would."""
+    by_paths: dict[tuple, list[tuple]] = defaultdict(list)
+    for paths, values in keys:
+        by_paths[paths].append(values)
+
+    matched: dict[tuple, int] = {}
+    for paths, values_list in by_paths.items():
+        for start in range(0, len(values_list), LOOKUP_BATCH_SIZE):
+            chunk = values_list[start:start + LOOKUP_BATCH_SIZE]
+            wanted = set(chunk)
+            queryset = model.objects.filter(**{
+                f'{path}__in': {values[index] for values in chunk} for index, path in enumerate(paths)
+            })
+            queryset = queryset if queryset.ordered else queryset.order_by('pk')
+            for pk, *values in queryset.values_list('pk', *paths):
+                if tuple(values) in wanted:
+                    matched.setdefault((paths, tuple(values)), pk)
+
+    instances = model.objects.in_bulk(set(matched.values()))
+    return {key: instances[pk] for key, pk in matched.items()}
+
+
+def _model_field(model: Any, field_name: str):
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.concrete or field.many_to_many else None
+
+
+def _as_list(value: Any) -> list[Any]:
+    if value in (None, ''):
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _attach_visit_locations(pending: list[tuple[Any, Any, str]]) -> None:
+    """Point visits at the doctor's practice location of that name, creating the missing ones."""
+    pairs = list(dict.fromkeys((doctor.pk, name) for _, doctor, name in pending))
+    locations: dict[tuple[int, str], Any] = {}
+    for start in range(0, len(pairs), LOOKUP_BATCH_SIZE):
+        chunk = pairs[start:start + LOOKUP_BATCH_SIZE]
+        queryset = DoctorPracticeLocation.objects.filter(
+            doctor_id__in={doctor_id for doctor_id, _ in chunk},
+            location_name__in={name for _, name in chunk},
+        )
+        for location in (queryset if queryset.ordered else queryset.order_by('pk')):
+            locations.setdefault((location.doctor_id, location.location_name), location)
+
+    missing = [pair for pair in pairs if pair not in locations]
+    created = bulk_insert(DoctorPracticeLocation, [
+        DoctorPracticeLocation(doctor_id=doctor_id, location_name=name, location_type='clinic', address='', is_active=True)
+        for doctor_id, name in missing
+    ])
+    locations.update(zip(missing, created))
+
+    for visit, doctor, name in pending:
+        visit.visit_location = locations[(doctor.pk, name)]
+        visit.hospital_clinic_name = name
+
+
+def _replace_m2m(model: Any, field_name: str, assignments: list[tuple[Any, list[Any]]], batch_size: int) -> set[Any]:
+    """
+    ``.set()`` for many instances: clear their through rows, then insert the
+    new ones in bulk. Returns the related ids that lost or gained a link.
+    """
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+
+    changed = set()
+    owner_ids = [instance.pk for instance, _ in assignments]
+    for start in range(0, len(owner_ids), batch_size):
+        links = through.objects.filter(**{f'{source}__in': owner_ids[start:start + batch_size]})
+        changed.update(links.values_list(target, flat=True))
+        links.delete()
+    links = [
+        through(**{source: instance.pk, target: pk})
+        for instance, related in assignments
+        for pk in dict.fromkeys(obj.pk for obj in related)
+    ]
+    changed.update(getattr(link, target) for link in links)
+    through.objects.bulk_create(links, batch_size=batch_size)
+    return changed
+
+
+def _after_bulk_write(model: Any, instances: list[Any], batch_size: int, m2m_changes: dict[str, set[Any]]) -> None:
+    """
+    The post_save / m2m_changed work bulk writes skip: snapshot keys, stock
+    positions and the dashboard cache.
+    """
+    if model in KEY_FIELDS:
+        queue_bulk_snapshot_keys(model, instances)
+    for field_name, related_ids in m2m_changes.items():
+        if model._meta.get_field(field_name).remote_field.through is Doctor.assigned_mrs.through:
+            queue_coverage_keys(related_ids)
+    pks = [instance.pk for instance in instances]
+    for start in range(0, len(pks), batch_size):
+        chunk = pks[start:start + batch_size]
+        if model is BatchManagement:
+            refresh_batch_statuses(BatchManagement.objects.filter(pk__in=chunk))
+            refresh_stock_positions(batch_ids=chunk)
+        elif model is CompanyStock:
+            refresh_stock_positions(stock_ids=chunk)
+    if model._meta.app_label in INVALIDATING_APPS:
+        invalidate_dashboard_on_commit()
+
+
+def commit_rows(config: dict[str, Any], raw_rows: list[dict[str, Any]], batch_size: int = BATCH_SIZE) -> tuple[int, int]:
+    """
+    Write validated import rows for ``config`` (a DATA_MODELS entry) and
+    return ``(created, updated)``.
+
+    Rows whose lookup matches a saved row update it, the rest are created;
+    a later row with the same lookup as an earlier one updates that row,
+    as the row-by-row import did. Existing rows are loaded per
+    LOOKUP_BATCH_SIZE lookups, rows are written with bulk_create /
+    bulk_update and M2M links as through-table rows, all in one
+    transaction, so a failure leaves nothing behind. Rows with errors are
+    skipped.
+    """
+    model = config['model']
+    columns = config['import_columns']
+
+    with transaction.atomic():
+        resolver = ImportResolver(columns, raw_rows, create_missing=True)
+        parsed = []
+        for raw_row in raw_rows:
+            cleaned, errors = parse_row(columns, raw_row, resolver)
+            if not errors:
+                parsed.append((raw_row, cleaned, _lookup_key(model, config['lookup'](raw_row))))
+
+        by_key = _existing_instances(model, {key for _, _, key in parsed if key is not None})
+        creates: list[Any] = []
+        updates: dict[int, Any] = {}
+        update_fields: set[str] = set()
+        m2m: dict[str, dict[int, tuple[Any, list[Any]]]] = defaultdict(dict)
+        visit_locations = []
+        created = updated = 0
+
+        for raw_row, cleaned, key in parsed:
+            instance = by_key.get(key) if key is not None else None
+            if instance is None:
+                instance = model()
+                creates.append(instance)
+                created += 1
+                if key is not None:
+                    by_key[key] = instance
+            else:
+                updated += 1
+                if instance.pk is not None:
+                    updates[instance.pk] = instance
+
+            for field_name, value in cleaned.items():
+                field = _model_field(model, field_name)
+                if field is None:
+                    continue
+                if field.many_to_many:
+                    m2m[field_name][id(instance)] = (instance, _as_list(value))
+                    continue
+                setattr(instance, field_name, value)
+                update_fields.add(field_name)
+
+            location_name = raw_row.get('Visit Location') or raw_row.get('Hospital / Clinic Name')
+            if model is DoctorVisit and location_name:
+                visit_locations.append((instance, cleaned['doctor'], location_name))
+
+        if visit_locations:
+            _attach_visit_locations(visit_locations)
+            update_fields |= {'visit_location', 'hospital_clinic_name'}
+
+        instances = creates + list(updates.values())
+        if model is DistributorStockEntry:
+            # DistributorStockEntry.save() keeps unsold_quantity at the closing stock.
+            for instance in instances:
+                instance.unsold_quantity = instance.closing_stock
+            update_fields.add('unsold_quantity')
+
+        # bulk_create stamps auto_now fields as it inserts; list them so the upsert keeps the stamp.
+        update_fields |= {field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+
+        bulk_insert(model, creates, batch_size)
+        if updates and update_fields:
+            # An upsert on the primary key: one INSERT ... ON CONFLICT DO UPDATE per
+            # batch, where bulk_update would build a CASE WHEN per row and field.
+            model.objects.bulk_create(
+                list(updates.values()),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[model._meta.pk.name],
+                update_fields=sorted(update_fields),
+            )
+        m2m_changes = {
+            field_name: _replace_m2m(model, field_name, list(assignments.values()), batch_size)
+            for field_name, assignments in m2m.items()
+        }
+        _after_bulk_write(model, instances, batch_size, m2m_changes)
+
+    return created, updated
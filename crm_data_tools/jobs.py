@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .config import DATA_MODELS
+from .importer import commit_rows
+from .models import ImportJob, StagedImport, StagedImportRow
+from .staging import STAGE_BATCH_SIZE, stage_rows
+from .validation import VALIDATION_CHUNK_SIZE, validate_rows, validation_executor, validation_workers
+
+
+logger = logging.getLogger('crm_data_tools.jobs')
+
+# A claimed job whose heartbeat (updated_at) is older than this is handed to another worker.
+STALE_AFTER = timedelta(minutes=10)
+
+WORKER_NAME = f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+# Caches that cannot show a running commit's progress to the web processes:
+# the database cache writes inside the import's transaction, the others
+# never leave the worker process.
+NO_LIVE_PROGRESS_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def create_job(user: Any, model_key: str, file_name: str, raw_rows: Iterable[dict[str, Any]]) -> ImportJob:
+    """Stage ``raw_rows`` unvalidated and queue an ImportJob to validate them."""
+    with transaction.atomic():
+        staged = stage_rows(user, model_key, file_name, ((row, []) for row in raw_rows))
+        return ImportJob.objects.create(staged_import=staged)
+
+
+def request_commit(job: ImportJob) -> bool:
+    """Queue a validated (or failed, to retry it) job for commit; False when it cannot be."""
+    if job.staged_import.error_rows:
+        return False
+    queued = ImportJob.objects.filter(pk=job.pk, status__in=('ready', 'failed')).update(
+        status='queued', message='', updated_at=timezone.now(),
+    )
+    if queued:
+        job.refresh_from_db()
+    return bool(queued)
+
+
+def retry_validation(job: ImportJob) -> bool:
+    """Queue a job whose validation crashed to be validated again; False when it cannot be."""
+    queued = ImportJob.objects.filter(pk=job.pk, status='validation_failed').update(
+        status='pending', validated_rows=0, message='', finished_at=None, updated_at=timezone.now(),
+    )
+    if queued:
+        job.refresh_from_db()
+    return bool(queued)
+
+
+def job_status(job: ImportJob) -> dict[str, Any]:
+    progress = cache.get(_progress_key(job)) if job.status == 'committing' else None
+    status = {
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'active': job.is_active,
+        'total_rows': job.staged_import.total_rows,
+        'validated_rows': job.validated_rows,
+        'error_rows': job.staged_import.error_rows,
+        'committed_rows': job.committed_rows,
+        'created_rows': job.created_rows,
+        'updated_rows': job.updated_rows,
+        'message': job.message,
+        'live_progress': live_commit_progress(),
+    }
+    status.update(progress or {})
+    return status
+
+
+# ------------------------------------------------------------
+# Claiming
+# ------------------------------------------------------------
+
+def _claim(job: ImportJob, status: str) -> bool:
+    claimed_status = {'pending': 'validating', 'queued': 'committing'}[status]
+    claimed = ImportJob.objects.filter(pk=job.pk, status=status).update(
+        status=claimed_status, worker=WORKER_NAME, updated_at=timezone.now(),
+    )
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def requeue_stale_jobs(now=None) -> int:
+    """
+    Hand back jobs whose worker is gone: validating jobs that stopped
+    sending heartbeats, and committing jobs no transaction holds (a commit
+    sends no heartbeats; its worker keeps the job row locked instead).
+    """
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    requeued = ImportJob.objects.filter(status='validating', updated_at__lt=cutoff).update(status='pending', worker='')
+    with transaction.atomic():
+        abandoned = list(
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='committing', updated_at__lt=cutoff)
+            .values_list('pk', flat=True)
+        )
+        requeued += ImportJob.objects.filter(pk__in=abandoned).update(status='queued', worker='')
+    return requeued
+
+
+def claim_next_job() -> ImportJob | None:
+    """The oldest waiting job, claimed for this worker; None when there is nothing to do."""
+    for job in ImportJob.objects.filter(status__in=('pending', 'queued')).order_by('created_at')[:10]:
+        if _claim(job, job.status):
+            return job
+    return None
+
+
+# ------------------------------------------------------------
+# Running
+# ------------------------------------------------------------
+
+def _row_chunks(staged: StagedImport, after_row: int = 0, size: int = STAGE_BATCH_SIZE):
+    """Staged rows after ``after_row`` in chunks of ``size``, read by row number."""
+    while True:
+        chunk = list(
+            staged.rows.filter(row_number__gt=after_row)
+            .order_by('row_number')
+            .only('pk', 'staged_import_id', 'row_number', 'raw', 'errors', 'has_errors')[:size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        after_row = chunk[-1].row_number
+
+
+def _heartbeat(job: ImportJob, *fields: str) -> None:
+    job.save(update_fields=[*fields, 'updated_at'])
+
+
+def validate_job(job: ImportJob) -> None:
+    """Validate the staged rows, one chunk per validation worker at a time (see validate_rows)."""
+    staged = job.staged_import
+    workers = validation_workers(staged.total_rows)
+    job.validated_rows = 0
+    error_rows = 0
+
+    with validation_executor(workers) as executor:
+        for chunk in _row_chunks(staged, size=VALIDATION_CHUNK_SIZE * workers):
+            changed = []
+            for row, errors in zip(chunk, validate_rows(staged.model_key, [row.raw for row in chunk], executor)):
+                error_rows += bool(errors)
+                if errors != row.errors:
+                    row.errors, row.has_errors = errors, bool(errors)
+                    changed.append(row)
+            StagedImportRow.objects.bulk_update(changed, ['errors', 'has_errors'], batch_size=STAGE_BATCH_SIZE)
+            StagedImport.objects.filter(pk=staged.pk).update(error_rows=error_rows)
+            job.validated_rows += len(chunk)
+            _heartbeat(job, 'validated_rows')
+
+    staged.error_rows = error_rows
+    job.status = 'invalid' if error_rows else 'ready'
+    _heartbeat(job, 'status')
+
+
+def _progress_key(job: ImportJob) -> str:
+    return f'crm_data_tools:import_job:{job.pk}:progress'
+
+
+def live_commit_progress() -> bool:
+    """
+    Whether commit progress reaches other processes while the import runs.
+    The job row only changes when the import's transaction commits, and the
+    database cache writes inside that same transaction, so only a cache
+    outside the database (Redis, memcached) can carry it.
+    """
+    return settings.CACHES.get('default', {}).get('BACKEND', '') not in NO_LIVE_PROGRESS_BACKENDS
+
+
+def _report_progress(job: ImportJob) -> None:
+    """Publish commit progress through the cache (see live_commit_progress)."""
+    if not live_commit_progress():
+        return
+    cache.set(_progress_key(job), {
+        'committed_rows': job.committed_rows,
+        'created_rows': job.created_rows,
+        'updated_rows': job.updated_rows,
+    }, timeout=int(STALE_AFTER.total_seconds()) * 6)
+
+
+def commit_job(job: ImportJob, chunk_size: int = STAGE_BATCH_SIZE) -> None:
+    """
+    Commit every staged row in one transaction, so a failure leaves nothing
+    behind and a retry starts again from the first row. Rows are written
+    ``chunk_size`` at a time only to report progress.
+
+    The job row is locked for the whole transaction; requeue_stale_jobs
+    skips locked jobs, so a slow commit is never handed to a second worker.
+    """
+    staged = job.staged_import
+    config = DATA_MODELS[staged.model_key]
+    job.committed_rows = job.created_rows = job.updated_rows = 0
+
+    with transaction.atomic():
+        # Held until the import commits or rolls back.
+        ImportJob.objects.select_for_update().only('pk').get(pk=job.pk)
+        for chunk in _row_chunks(staged, size=chunk_size):
+            created, updated = commit_rows(config, [row.raw for row in chunk])
+            job.committed_rows = chunk[-1].row_number
+            job.created_rows += created
+            job.updated_rows += updated
+            _report_progress(job)
+
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        _heartbeat(job, 'committed_rows', 'created_rows', 'updated_rows', 'status', 'finished_at')
+    cache.delete(_progress_key(job))
+
+
+def run_job(job: ImportJob) -> ImportJob:
+    """
+    Run a claimed job. A failed commit is rolled back whole, so nothing of
+    it is imported; a crashed validation can be retried with retry_validation.
+    """
+    try:
+        if job.status == 'validating':
+            validate_job(job)
+        elif job.status == 'committing':
+            commit_job(job)
+    except Exception as exc:
+        logger.exception('Import job %s failed', job.pk)
+        if job.status == 'committing':
+            cache.delete(_progress_key(job))
+            job.status = 'failed'
+            job.committed_rows = job.created_rows = job.updated_rows = 0
+            job.message = f'Nothing was imported: {exc}'
+        else:
+            job.status = 'validation_failed'
+            job.message = f'Validation did not finish: {exc}'
+        job.finished_at = timezone.now()
+        _heartbeat(job, 'status', 'committed_rows', 'created_rows', 'updated_rows', 'message', 'finished_at')
+    return job
+
+
+def run_job_now(job: ImportJob) -> ImportJob:
+    """Claim and run ``job`` in this process (DATA_IMPORT_IN_BACKGROUND off)."""
+    if job.status in ('pending', 'queued') and _claim(job, job.status):
+        run_job(job)
+    return job
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from crm_data_tools.jobs import claim_next_job, requeue_stale_jobs, run_job
+from crm_data_tools.staging import purge_expired_imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Validate and commit the data-tools import jobs queued from the import pages, "
+        "one job at a time. Validation records progress on each ImportJob as it goes; "
+        "a commit runs in a single transaction, so a failure imports nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and poll for new jobs every N seconds. Drains the queue once when omitted.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s).")
+            purge_expired_imports()
+
+            job = claim_next_job()
+            while job is not None:
+                self.stdout.write(f"Job {job.pk} ({job.staged_import.model_key}): {job.get_status_display()}...")
+                run_job(job)
+                self.stdout.write(f"Job {job.pk}: {job.get_status_display()}. {job.message}".rstrip())
+                job = claim_next_job()
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
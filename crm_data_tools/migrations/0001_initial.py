@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:04
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('model_key', models.CharField(max_length=50)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('error_rows', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Staged Import',
+                'verbose_name_plural': 'Staged Imports',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StagedImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField()),
+                ('raw', models.JSONField()),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('has_errors', models.BooleanField(default=False)),
+                ('staged_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='crm_data_tools.stagedimport')),
+            ],
+            options={
+                'ordering': ['row_number'],
+                'indexes': [models.Index(fields=['staged_import', 'has_errors', 'row_number'], name='staged_row_errors_idx')],
+                'constraints': [models.UniqueConstraint(fields=('staged_import', 'row_number'), name='unique_staged_import_row')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_data_tools', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Waiting for validation'), ('validating', 'Validating'), ('ready', 'Ready to import'), ('invalid', 'Has errors'), ('queued', 'Waiting to import'), ('committing', 'Importing'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=12)),
+                ('validated_rows', models.PositiveIntegerField(default=0)),
+                ('committed_rows', models.PositiveIntegerField(default=0)),
+                ('created_rows', models.PositiveIntegerField(default=0)),
+                ('updated_rows', models.PositiveIntegerField(default=0)),
+                ('message', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('staged_import', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job', to='crm_data_tools.stagedimport')),
+            ],
+            options={
+                'verbose_name': 'Import Job',
+                'verbose_name_plural': 'Import Jobs',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
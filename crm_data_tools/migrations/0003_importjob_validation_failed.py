@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_data_tools', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Waiting for validation'), ('validating', 'Validating'), ('ready', 'Ready to import'), ('invalid', 'Has errors'), ('validation_failed', 'Validation failed'), ('queued', 'Waiting to import'), ('committing', 'Importing'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
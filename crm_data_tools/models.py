@@ -0,0 +1,110 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import models
+
+
+# ============================================================
+# CRM DATA TOOLS APP — crm_data_tools/models.py
+# Server-side staging for CSV imports. An upload is staged into
+# StagedImportRow rows and only its token is kept in the session, so
+# previews are paged from the table and the session stays small.
+# Staged imports expire after DATA_IMPORT_STAGING_TTL seconds.
+# Each staged import has an ImportJob that the run_import_jobs worker
+# validates in chunks and then commits in one transaction, recording
+# its progress.
+# ============================================================
+
+
+class StagedImport(models.Model):
+    """An uploaded CSV waiting for confirmation."""
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    model_key = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='staged_imports')
+    file_name = models.CharField(max_length=255, blank=True)
+
+    total_rows = models.PositiveIntegerField(default=0)
+    error_rows = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Staged Import'
+        verbose_name_plural = 'Staged Imports'
+
+    def __str__(self):
+        return f"{self.model_key} — {self.file_name or self.token} ({self.total_rows} rows)"
+
+
+class StagedImportRow(models.Model):
+    """One CSV row of a staged import: the raw values and their validation errors."""
+
+    staged_import = models.ForeignKey(StagedImport, on_delete=models.CASCADE, related_name='rows')
+    row_number = models.PositiveIntegerField()
+    raw = models.JSONField()
+    errors = models.JSONField(default=list, blank=True)
+    has_errors = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['row_number']
+        constraints = [
+            models.UniqueConstraint(fields=['staged_import', 'row_number'], name='unique_staged_import_row'),
+        ]
+        indexes = [
+            models.Index(fields=['staged_import', 'has_errors', 'row_number'], name='staged_row_errors_idx'),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row_number} of {self.staged_import_id}"
+
+
+class ImportJob(models.Model):
+    """
+    Validation and commit of one staged import, run by the run_import_jobs
+    worker. ``updated_at`` doubles as the heartbeat while validating; a
+    committing worker holds a lock on the row instead.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Waiting for validation'),
+        ('validating', 'Validating'),
+        ('ready', 'Ready to import'),
+        ('invalid', 'Has errors'),
+        ('validation_failed', 'Validation failed'),
+        ('queued', 'Waiting to import'),
+        ('committing', 'Importing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'validating', 'queued', 'committing')
+
+    staged_import = models.OneToOneField(StagedImport, on_delete=models.CASCADE, related_name='job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    # Progress counters
+    validated_rows = models.PositiveIntegerField(default=0)
+    committed_rows = models.PositiveIntegerField(default=0)
+    created_rows = models.PositiveIntegerField(default=0)
+    updated_rows = models.PositiveIntegerField(default=0)
+
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Import Job'
+        verbose_name_plural = 'Import Jobs'
+
+    def __str__(self):
+        return f"Import job {self.pk} — {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ImportJob, StagedImport, StagedImportRow
+
+
+STAGE_BATCH_SIZE = 2000
+
+
+def purge_expired_imports(now=None) -> int:
+    """Delete staged imports past their expiry, unless their job is waiting for or held by a worker; returns how many."""
+    expired = StagedImport.objects.filter(expires_at__lte=now or timezone.now()).exclude(
+        job__status__in=ImportJob.ACTIVE_STATUSES,
+    )
+    _, by_model = expired.delete()
+    return by_model.get(StagedImport._meta.label, 0)
+
+
+def stage_rows(user: Any, model_key: str, file_name: str, rows: Iterable[tuple[dict[str, Any], list[str]]]) -> StagedImport:
+    """
+    Store ``(raw, errors)`` pairs as a new StagedImport, inserting
+    STAGE_BATCH_SIZE rows at a time, and drop any expired imports first.
+    """
+    purge_expired_imports()
+    with transaction.atomic():
+        staged = StagedImport.objects.create(
+            user=user,
+            model_key=model_key,
+            file_name=file_name[:255],
+            expires_at=timezone.now() + timedelta(seconds=settings.DATA_IMPORT_STAGING_TTL),
+        )
+        batch = []
+        for row_number, (raw, errors) in enumerate(rows, start=1):
+            batch.append(StagedImportRow(
+                staged_import=staged, row_number=row_number, raw=raw, errors=errors, has_errors=bool(errors),
+            ))
+            staged.total_rows += 1
+            staged.error_rows += bool(errors)
+            if len(batch) >= STAGE_BATCH_SIZE:
+                StagedImportRow.objects.bulk_create(batch)
+                batch = []
+        StagedImportRow.objects.bulk_create(batch)
+        staged.save(update_fields=['total_rows', 'error_rows'])
+    return staged
+
+
+def get_staged_import(user: Any, model_key: str, token: str | None) -> StagedImport | None:
+    """The user's unexpired staged import for ``token``, or None."""
+    if not token:
+        return None
+    try:
+        return StagedImport.objects.filter(
+            token=token, user=user, model_key=model_key, expires_at__gt=timezone.now(),
+        ).first()
+    except ValidationError:
+        # Not a token, e.g. a session written before imports were staged server-side.
+        return None
+
@@ -0,0 +1,294 @@
+import csv
+import io
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.query_budget import QueryRecorder
+from core.tests import CRMVolumeFixtures
+from crm_analytics.models import SnapshotDirtyKey
+from crm_doctors.models import Doctor, DoctorVisit
+from crm_products.models import Division
+from crm_sales.models import MedicalRepresentative
+
+from .bulk import bulk_insert
+from .config import DATA_MODELS, ImportResolver, export_queryset, export_value, parse_row
+from .importer import commit_rows
+from .jobs import (claim_next_job, commit_job, create_job, live_commit_progress, request_commit, retry_validation,
+                   run_job, run_job_now)
+from .models import ImportJob, StagedImport
+from .staging import purge_expired_imports
+from .validation import validate_rows, validation_executor
+from .views import _export_lines
+
+
+class BulkInsertTests(TestCase):
+    def test_auto_codes_use_the_keys_the_database_hands_out(self):
+        Division.objects.create(name='Kept')
+        deleted_pk = Division.objects.create(name='Deleted').pk
+        Division.objects.filter(pk=deleted_pk).delete()
+
+        divisions = bulk_insert(Division, [Division(name=f'Bulk {i}') for i in range(3)])
+        # The deleted row's key is not handed out again, as Max(pk) + 1 would have.
+        self.assertGreater(divisions[0].pk, deleted_pk)
+        self.assertEqual(
+            list(Division.objects.filter(name__startswith='Bulk').values_list('division_id', flat=True)),
+            [f'DIV-{division.pk:04d}' for division in divisions],
+        )
+        self.assertEqual(Division.objects.create(name='After').pk, divisions[-1].pk + 1)
+
+
+class DoctorFixtures:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        division = Division.objects.create(name='North')
+        cls.mrs = [
+            MedicalRepresentative.objects.create(
+                name=f'MR {i}', cnic=f'12345-123456{i}-1', phone_number='0300', division=division,
+            )
+            for i in range(3)
+        ]
+        cls.doctors = [
+            Doctor.objects.create(doctor_name=f'Doctor {i}', specialty='GP', city='Lahore')
+            for i in range(5)
+        ]
+        # Doctor i is assigned MRs 0..i-1 (capped at all three), so the
+        # column holds zero, one and several values.
+        for i, doctor in enumerate(cls.doctors):
+            doctor.assigned_mrs.set(cls.mrs[:i])
+
+
+class ExportTests(DoctorFixtures, TestCase):
+    def _rows(self, lines):
+        return list(csv.reader(io.StringIO(''.join(lines))))
+
+    def test_export_streams_header_and_rows(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('crm_data_tools:export', args=['doctor']))
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="doctors_\d{8}_\d{6}\.csv"$')
+        rows = self._rows(chunk.decode() for chunk in response.streaming_content)
+        self.assertEqual(rows[0], [column.header for column in DATA_MODELS['doctor']['export_columns']])
+        self.assertEqual([row[1] for row in rows[1:]], [doctor.doctor_name for doctor in self.doctors])
+
+    def test_m2m_columns_survive_chunked_prefetch(self):
+        # Chunks of two put the doctors' MR prefetches in separate batches.
+        with self.assertNumQueries(4):
+            rows = self._rows(_export_lines(DATA_MODELS['doctor'], chunk_size=2))
+
+        header = rows[0]
+        assigned = {row[header.index('Doctor ID')]: row[header.index('Assigned MRs')] for row in rows[1:]}
+        self.assertEqual(assigned, {
+            doctor.doctor_id: '; '.join(mr.mr_id for mr in doctor.assigned_mrs.all())
+            for doctor in self.doctors
+        })
+        self.assertEqual(assigned[self.doctors[0].doctor_id], '')
+        self.assertEqual(assigned[self.doctors[4].doctor_id], '; '.join(mr.mr_id for mr in self.mrs))
+
+
+class ImportCoverageTests(DoctorFixtures, TestCase):
+    def test_assigned_mr_changes_queue_coverage_keys(self):
+        SnapshotDirtyKey.objects.all().delete()
+        rows = [
+            # Doctor 2 moves from MRs 0 and 1 to MR 2; doctor 3 keeps its MRs.
+            {'Doctor Name': 'Doctor 2', 'Specialty': 'GP', 'City': 'Lahore', 'Assigned MRs': self.mrs[2].mr_id},
+            {'Doctor Name': 'Doctor 3', 'Specialty': 'GP', 'City': 'Lahore',
+             'Assigned MRs': '; '.join(mr.mr_id for mr in self.mrs)},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(commit_rows(DATA_MODELS['doctor'], rows), (0, 2))
+
+        self.assertEqual(list(self.doctors[2].assigned_mrs.all()), [self.mrs[2]])
+        month = timezone.localdate().replace(day=1)
+        self.assertEqual(
+            sorted(SnapshotDirtyKey.objects.filter(entity='mr', snapshot_month=month).values_list('entity_id', flat=True)),
+            sorted(mr.pk for mr in self.mrs),
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ImportTests(CRMVolumeFixtures, TestCase):
+    def _import_upload(self, model_key, rows):
+        config = DATA_MODELS[model_key]
+        stream = io.StringIO()
+        writer = csv.DictWriter(stream, fieldnames=[column.header for column in config['import_columns']], extrasaction='ignore')
+        writer.writeheader()
+        for obj in export_queryset(config['model'], config['export_columns']).order_by('pk')[:rows]:
+            writer.writerow({column.header: export_value(column, obj) for column in config['export_columns']})
+        return SimpleUploadedFile(f'{model_key}.csv', stream.getvalue().encode('utf-8'), content_type='text/csv')
+
+    @override_settings(DATA_IMPORT_IN_BACKGROUND=False)
+    def test_import_upload_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_data_tools:import', kwargs={'model_key': 'doctor_visit'})
+        # Every measured upload replaces an earlier one.
+        self.client.post(url, {'data_file': self._import_upload('doctor_visit', 1)})
+        counts = []
+        for rows in (1, 100):
+            with QueryRecorder() as recorder:
+                self.client.post(url, {'data_file': self._import_upload('doctor_visit', rows)})
+            staged = StagedImport.objects.get(token=self.client.session['crm_data_tools_pending_doctor_visit'])
+            self.assertEqual((staged.total_rows, staged.error_rows), (rows, 0))
+            counts.append(recorder.count)
+        self.assertEqual(counts[0], counts[1])
+        # Replacing an upload drops the previous staged import.
+        self.assertEqual(StagedImport.objects.count(), 1)
+
+    @override_settings(DATA_IMPORT_IN_BACKGROUND=False)
+    def test_import_preview_is_paged_from_staging(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_data_tools:import', kwargs={'model_key': 'doctor_visit'})
+        response = self.client.post(url, {'data_file': self._import_upload('doctor_visit', 120)})
+        preview_url = reverse('crm_data_tools:import_preview', kwargs={'model_key': 'doctor_visit'})
+        self.assertRedirects(response, preview_url)
+
+        first = self.client.get(preview_url).context['page_obj']
+        second = self.client.get(preview_url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual([row.row_number for row in first], list(range(1, 51)))
+        self.assertEqual([row.row_number for row in second], list(range(51, 101)))
+
+    @override_settings(DATA_IMPORT_IN_BACKGROUND=False)
+    def test_import_confirm_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_data_tools:import', kwargs={'model_key': 'doctor_visit'})
+        counts = []
+        for rows in (1, 50):
+            self.client.post(url, {'data_file': self._import_upload('doctor_visit', rows)})
+            visits = DoctorVisit.objects.count()
+            with QueryRecorder() as recorder:
+                response = self.client.post(url, {'confirm': '1'})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(DoctorVisit.objects.count(), visits)
+            counts.append(recorder.count)
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(DATA_IMPORT_IN_BACKGROUND=True)
+    def test_import_job_runs_in_worker(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_data_tools:import', kwargs={'model_key': 'doctor_visit'})
+        status_url = reverse('crm_data_tools:import_status', kwargs={'model_key': 'doctor_visit'})
+        self.client.post(url, {'data_file': self._import_upload('doctor_visit', 30)})
+        self.assertEqual(self.client.get(status_url).json()['status'], 'pending')
+
+        call_command('run_import_jobs', stdout=io.StringIO())
+        status = self.client.get(status_url).json()
+        self.assertEqual((status['status'], status['validated_rows'], status['error_rows']), ('ready', 30, 0))
+
+        visits = DoctorVisit.objects.count()
+        self.client.post(url, {'confirm': '1'})
+        status = self.client.get(status_url).json()
+        self.assertEqual((status['status'], status['live_progress']), ('queued', False))
+        # A process-local cache cannot show the worker's commit progress, so the page says so.
+        self.assertContains(
+            self.client.get(reverse('crm_data_tools:import_preview', kwargs={'model_key': 'doctor_visit'})),
+            'imported in a single transaction',
+        )
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertTrue(live_commit_progress())
+        call_command('run_import_jobs', stdout=io.StringIO())
+        status = self.client.get(status_url).json()
+        self.assertEqual(
+            (status['status'], status['committed_rows'], status['created_rows'], status['updated_rows']),
+            ('completed', 30, 0, 30),
+        )
+        self.assertEqual(DoctorVisit.objects.count(), visits)
+        self.assertEqual(ImportJob.objects.get().status, 'completed')
+
+    def test_parallel_validation_matches_parse_row(self):
+        upload = self._import_upload('doctor_visit', 12)
+        rows = list(csv.DictReader(io.StringIO(upload.read().decode('utf-8'))))
+        rows[2]['Visit Date'] = '31/31/2024'
+        rows[5]['Doctor Name'] = 'No Such Doctor'
+        rows[7]['MR ID'] = ''
+        rows[7]['Visit Time'] = '25:99'
+
+        columns = DATA_MODELS['doctor_visit']['import_columns']
+        resolver = ImportResolver(columns, rows)
+        expected = [parse_row(columns, row, resolver)[1] for row in rows]
+        self.assertEqual(sum(bool(errors) for errors in expected), 3)
+
+        self.assertEqual(validate_rows('doctor_visit', rows, chunk_size=5), expected)
+        with validation_executor(2) as executor:
+            self.assertEqual(validate_rows('doctor_visit', rows, executor, chunk_size=5), expected)
+
+    @override_settings(DATA_IMPORT_IN_BACKGROUND=False, FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_import_upload_is_streamed_from_disk(self):
+        self.client.force_login(self.user)
+        url = reverse('crm_data_tools:import', kwargs={'model_key': 'doctor_visit'})
+        upload = self._import_upload('doctor_visit', 120)
+        self.assertGreater(upload.size, 1024)
+        response = self.client.post(url, {'data_file': upload})
+        self.assertRedirects(response, reverse('crm_data_tools:import_preview', kwargs={'model_key': 'doctor_visit'}))
+        staged = StagedImport.objects.get(token=self.client.session['crm_data_tools_pending_doctor_visit'])
+        self.assertEqual((staged.total_rows, staged.error_rows, staged.job.status), (120, 0, 'ready'))
+
+    def test_failed_import_commit_is_rolled_back_whole(self):
+        upload = self._import_upload('doctor_visit', 30)
+        rows = list(csv.DictReader(io.StringIO(upload.read().decode('utf-8'))))
+        for row in rows:
+            row['Remarks'] = 'imported'
+        job = run_job_now(create_job(self.user, 'doctor_visit', 'visits.csv', rows))
+        self.assertEqual(job.status, 'ready')
+
+        # A row that passed validation but breaks the commit, in the last of three chunks.
+        job.staged_import.rows.filter(row_number=25).update(raw=['not', 'a', 'row'])
+        self.assertTrue(request_commit(job))
+        job = claim_next_job()
+        with self.assertRaises(AttributeError):
+            commit_job(job, chunk_size=10)
+        self.assertFalse(DoctorVisit.objects.filter(remarks='imported').exists())
+
+        with self.assertLogs('crm_data_tools.jobs', 'ERROR'):
+            run_job(job)
+        self.assertEqual((job.status, job.committed_rows), ('failed', 0))
+        self.assertTrue(job.message.startswith('Nothing was imported'))
+
+        # A retry starts over from the first row.
+        job.staged_import.rows.filter(row_number=25).update(raw=rows[24])
+        self.assertTrue(request_commit(job))
+        run_job_now(job)
+        self.assertEqual((job.status, job.committed_rows, job.updated_rows), ('completed', 30, 30))
+        self.assertEqual(DoctorVisit.objects.filter(remarks='imported').count(), 30)
+
+    def test_crashed_validation_can_be_retried(self):
+        upload = self._import_upload('doctor_visit', 5)
+        rows = list(csv.DictReader(io.StringIO(upload.read().decode('utf-8'))))
+        job = create_job(self.user, 'doctor_visit', 'visits.csv', rows)
+        job.staged_import.rows.filter(row_number=3).update(raw=['not', 'a', 'row'])
+
+        with self.assertLogs('crm_data_tools.jobs', 'ERROR'):
+            run_job_now(job)
+        self.assertEqual((job.status, job.staged_import.error_rows), ('validation_failed', 0))
+        self.assertTrue(job.message.startswith('Validation did not finish'))
+        self.assertFalse(request_commit(job))
+
+        job.staged_import.rows.filter(row_number=3).update(raw=rows[2])
+        self.assertTrue(retry_validation(job))
+        self.assertEqual((job.status, job.validated_rows, job.message), ('pending', 0, ''))
+        self.assertFalse(retry_validation(job))
+        run_job_now(job)
+        self.assertEqual((job.status, job.validated_rows), ('ready', 5))
+
+    def test_purge_keeps_imports_with_active_jobs(self):
+        jobs = {
+            status: create_job(self.user, 'doctor_visit', f'{status}.csv', [])
+            for status in ('pending', 'queued', 'validating', 'committing', 'ready', 'completed')
+        }
+        for status, job in jobs.items():
+            ImportJob.objects.filter(pk=job.pk).update(status=status)
+        StagedImport.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(purge_expired_imports(), 2)
+        self.assertEqual(
+            sorted(ImportJob.objects.values_list('status', flat=True)),
+            sorted(ImportJob.ACTIVE_STATUSES),
+        )
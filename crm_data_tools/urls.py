@@ -7,4 +7,6 @@ urlpatterns = [
     path('<slug:model_key>/export/', views.export_csv, name='export'),
     path('<slug:model_key>/sample/', views.sample_csv, name='sample'),
     path('<slug:model_key>/import/', views.import_upload, name='import'),
+    path('<slug:model_key>/import/preview/', views.import_preview, name='import_preview'),
+    path('<slug:model_key>/import/status/', views.import_status, name='import_status'),
 ]
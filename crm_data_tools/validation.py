@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, repeat
+from typing import Any, Iterator
+
+from django.conf import settings
+
+from .config import DATA_MODELS, ImportResolver, merge_errors, parse_values, resolve_relations
+
+
+# Rows per task sent to a validation worker process.
+VALIDATION_CHUNK_SIZE = 2000
+
+# Below this many rows the cost of starting worker processes outweighs the parsing they save.
+PARALLEL_MIN_ROWS = 20000
+
+
+def _chunk_errors(model_key: str, rows: list[dict[str, Any]]) -> list[list[tuple[int, str]]]:
+    """parse_values errors for each row of one chunk; runs in a worker process."""
+    columns = DATA_MODELS[model_key]['import_columns']
+    return [parse_values(columns, row)[1] for row in rows]
+
+
+def validation_workers(total_rows: int) -> int:
+    """Worker processes worth starting for a file of ``total_rows`` rows; 1 means validate in-process."""
+    if total_rows < PARALLEL_MIN_ROWS or 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    return max(1, settings.DATA_IMPORT_VALIDATION_WORKERS)
+
+
+@contextmanager
+def validation_executor(workers: int) -> Iterator[Executor | None]:
+    """
+    A process pool of ``workers`` for validate_rows, or None for one worker.
+    Workers are forked so they share the configured Django apps; they only
+    parse cells and never use the database connection they inherit.
+    """
+    if workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        yield executor
+
+
+def validate_rows(
+    model_key: str,
+    rows: list[dict[str, Any]],
+    executor: Executor | None = None,
+    chunk_size: int = VALIDATION_CHUNK_SIZE,
+) -> list[list[str]]:
+    """
+    Validation errors for each of ``rows``, in row order, the same as
+    ``parse_row(...)[1]`` would give.
+
+    Cells are parsed in ``chunk_size`` chunks across ``executor``
+    (in-process without one) while FK / M2M values for all the rows are
+    looked up by one ImportResolver; each row's relation errors are then
+    merged with its parse errors.
+    """
+    columns = DATA_MODELS[model_key]['import_columns']
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    if executor is None:
+        parsed = map(_chunk_errors, repeat(model_key), chunks)
+    else:
+        parsed = executor.map(_chunk_errors, repeat(model_key), chunks)
+
+    resolver = ImportResolver(columns, rows)
+    return [
+        merge_errors(errors, resolve_relations(columns, row, resolver)[1])
+        for row, errors in zip(rows, chain.from_iterable(parsed))
+    ]
@@ -4,20 +4,28 @@ import csv
 import io
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib import messages
 from core.auth_utils import crm_access_required
-from django.http import Http404, HttpResponse
+from core.pagination import KeysetPaginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
-from .config import DATA_MODELS, ImportErrorRow, export_value, parse_row
+from .config import DATA_MODELS, ImportErrorRow, export_queryset, export_value
 from .forms import DataUploadForm
-from crm_doctors.models import DoctorPracticeLocation, DoctorVisit
-from crm_stores.models import MedicalStore
+from .jobs import create_job, job_status, live_commit_progress, request_commit, retry_validation, run_job_now
+from .staging import get_staged_import
+from crm_analytics.exports import Echo
 
 
+# Session key prefix holding the token of the user's StagedImport per data set.
 PENDING_SESSION_PREFIX = 'crm_data_tools_pending_'
 
+EXPORT_CHUNK_SIZE = 2000
+
+PREVIEW_PAGE_SIZE = 50
+
 
 def _get_model_config(model_key: str):
     config = DATA_MODELS.get(model_key)
@@ -34,32 +42,35 @@ def _format_filename(prefix: str, suffix: str = 'csv') -> str:
     return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{suffix}'
 
 
-def _build_preview_rows(staged_rows: list[dict[str, object]]) -> list[dict[str, object]]:
-    return [
-        {
-            'row_number': index,
-            'raw': row['raw'],
-            'errors': row['errors'],
-        }
-        for index, row in enumerate(staged_rows, start=1)
-    ]
+def _tool_urls(model_key: str) -> dict[str, str]:
+    return {
+        'sample_url': reverse('crm_data_tools:sample', args=[model_key]),
+        'export_url': reverse('crm_data_tools:export', args=[model_key]),
+        'import_url': reverse('crm_data_tools:import', args=[model_key]),
+        'model_key': model_key,
+    }
+
+
+def _staged_import(request, model_key: str):
+    return get_staged_import(request.user, model_key, request.session.get(_pending_session_key(model_key)))
+
+
+def _export_lines(config, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    columns = config['export_columns']
+    yield writer.writerow([column.header for column in columns])
+    for obj in export_queryset(config['model'], columns).iterator(chunk_size=chunk_size):
+        yield writer.writerow([export_value(column, obj) for column in columns])
 
 
 @crm_access_required
 def export_csv(request, model_key: str):
     config = _get_model_config(model_key)
-    model = config['model']
 
-    response = HttpResponse(content_type='text/csv')
+    # Rows are encoded as they are read, so memory stays flat and the
+    # download starts before the table has been scanned.
+    response = StreamingHttpResponse(_export_lines(config), content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="{_format_filename(config["file_prefix"])}"'
-
-    writer = csv.writer(response)
-    writer.writerow([column.header for column in config['export_columns']])
-
-    queryset = model.objects.all()
-    for obj in queryset:
-        writer.writerow([export_value(column, obj) for column in config['export_columns']])
-
     return response
 
 
@@ -82,104 +93,57 @@ def import_upload(request, model_key: str):
     config = _get_model_config(model_key)
     session_key = _pending_session_key(model_key)
     form = DataUploadForm(request.POST or None, request.FILES or None)
+    preview_url = reverse('crm_data_tools:import_preview', args=[model_key])
+
+    if request.method == 'POST' and request.POST.get('revalidate') == '1':
+        staged = _staged_import(request, model_key)
+        if staged is None:
+            messages.error(request, 'No staged import was found. Please upload the file again.')
+            return redirect(reverse(config['list_url']))
+        if not retry_validation(staged.job):
+            messages.error(request, 'Only an import whose validation did not finish can be validated again.')
+        elif not settings.DATA_IMPORT_IN_BACKGROUND:
+            run_job_now(staged.job)
+        return redirect(preview_url)
 
     if request.method == 'POST' and request.POST.get('confirm') == '1':
-        staged = request.session.get(session_key)
-        if not staged:
+        staged = _staged_import(request, model_key)
+        if staged is None:
             messages.error(request, 'No staged import was found. Please upload the file again.')
             return redirect(reverse(config['list_url']))
 
-        staged_rows = staged.get('rows', [])
-        if any(row['errors'] for row in staged_rows):
-            messages.error(request, 'Resolve the preview errors before confirming the import.')
-            return render(
-                request,
-                'crm/data_tools/import_preview.html',
-                {
-                    'config': config,
-                    'form': DataUploadForm(),
-                    'preview_rows': _build_preview_rows(staged_rows),
-                    'row_errors': sum(1 for row in staged_rows if row['errors']),
-                    'total_rows': len(staged_rows),
-                    'has_errors': True,
-                    'sample_url': reverse('crm_data_tools:sample', args=[model_key]),
-                    'export_url': reverse('crm_data_tools:export', args=[model_key]),
-                    'import_url': reverse('crm_data_tools:import', args=[model_key]),
-                    'model_key': model_key,
-                },
-            )
-
-        created = 0
-        updated = 0
-        model = config['model']
-        lookup_fn = config['lookup']
-
-        for staged_row in staged_rows:
-            raw_row = staged_row['raw']
-            cleaned, errors = parse_row(config['import_columns'], raw_row)
-            if errors:
-                continue
-
-            lookup_data = lookup_fn(raw_row)
-            lookup_data = {key: value for key, value in lookup_data.items() if value not in (None, '')}
-
-            instance = model.objects.filter(**lookup_data).first() if lookup_data else None
-            if instance:
-                updated += 1
+        job = staged.job
+        if not request_commit(job):
+            if staged.error_rows:
+                messages.error(request, 'Resolve the preview errors before confirming the import.')
+            elif job.status == 'validation_failed':
+                messages.error(request, 'Validation did not finish. Validate the file again before confirming.')
             else:
-                instance = model()
-                created += 1
-
-            m2m_assignments = {}
-            special_visit_location_name = raw_row.get('Visit Location') or raw_row.get('Hospital / Clinic Name')
-
-            for field_name, value in cleaned.items():
-                if field_name in {'visit_location_name'}:
-                    continue
-                try:
-                    model._meta.get_field(field_name)
-                except Exception:
-                    continue
-
-                field = model._meta.get_field(field_name)
-                if field.many_to_many:
-                    m2m_assignments[field_name] = value
-                    continue
-
-                setattr(instance, field_name, value)
-
-            if model is DoctorVisit and special_visit_location_name:
-                location = DoctorPracticeLocation.objects.filter(
-                    doctor=cleaned['doctor'],
-                    location_name=special_visit_location_name,
-                ).first()
-                if not location:
-                    location = DoctorPracticeLocation.objects.create(
-                        doctor=cleaned['doctor'],
-                        location_name=special_visit_location_name,
-                        location_type='clinic',
-                        address='',
-                        is_active=True,
-                    )
-                instance.visit_location = location
-                instance.hospital_clinic_name = special_visit_location_name
-
-            if model is MedicalStore and 'linked_doctors' in cleaned:
-                m2m_assignments['linked_doctors'] = cleaned['linked_doctors']
-
-            instance.save()
-
-            for field_name, value in m2m_assignments.items():
-                getattr(instance, field_name).set(value)
+                messages.error(request, f'This import cannot be confirmed while it is {job.get_status_display().lower()}.')
+            return redirect(preview_url)
+
+        if settings.DATA_IMPORT_IN_BACKGROUND:
+            messages.info(request, 'The import has been queued. This page shows its progress.')
+            return redirect(preview_url)
+
+        run_job_now(job)
+        if job.status != 'completed':
+            messages.error(request, f'The import stopped with an error: {job.message}')
+            return redirect(preview_url)
 
+        staged.delete()
         request.session.pop(session_key, None)
-        messages.success(request, f'Imported {created + updated} row(s): {created} created, {updated} updated.')
+        messages.success(
+            request,
+            f'Imported {job.created_rows + job.updated_rows} row(s): {job.created_rows} created, {job.updated_rows} updated.',
+        )
         return redirect(reverse(config['list_url']))
 
     if request.method == 'POST' and form.is_valid():
         upload = request.FILES['data_file']
+        # Rows are read from the spooled upload as they are staged, never all at once.
+        data_stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
         try:
-            data_stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig')
             reader = csv.DictReader(data_stream)
             expected_headers = [column.header for column in config['import_columns']]
             actual_headers = reader.fieldnames or []
@@ -192,48 +156,73 @@ def import_upload(request, model_key: str):
                 return render(request, 'crm/data_tools/import_form.html', {
                     'config': config,
                     'form': form,
-                    'sample_url': reverse('crm_data_tools:sample', args=[model_key]),
-                    'export_url': reverse('crm_data_tools:export', args=[model_key]),
-                    'import_url': reverse('crm_data_tools:import', args=[model_key]),
-                    'model_key': model_key,
+                    **_tool_urls(model_key),
                 })
 
-            staged_rows = []
-            for row in reader:
-                staged_rows.append({
-                    'raw': dict(row),
-                    'errors': parse_row(config['import_columns'], row)[1],
-                })
+            previous = _staged_import(request, model_key)
+            job = create_job(request.user, model_key, upload.name, (dict(row) for row in reader))
+            if previous is not None:
+                previous.delete()
 
-            request.session[session_key] = {
-                'rows': staged_rows,
-                'model_key': model_key,
-            }
-            request.session.modified = True
-
-            return render(request, 'crm/data_tools/import_preview.html', {
-                'config': config,
-                'form': DataUploadForm(),
-                'preview_rows': _build_preview_rows(staged_rows),
-                'row_errors': sum(1 for row in staged_rows if row['errors']),
-                'total_rows': len(staged_rows),
-                'has_errors': any(row['errors'] for row in staged_rows),
-                'sample_url': reverse('crm_data_tools:sample', args=[model_key]),
-                'export_url': reverse('crm_data_tools:export', args=[model_key]),
-                'import_url': reverse('crm_data_tools:import', args=[model_key]),
-                'model_key': model_key,
-            })
+            # Only the token goes into the session; the rows stay in the staging table.
+            request.session[session_key] = str(job.staged_import.token)
+            if not settings.DATA_IMPORT_IN_BACKGROUND:
+                run_job_now(job)
+            return redirect(preview_url)
 
         except ImportErrorRow as exc:
             messages.error(request, str(exc))
         except Exception as exc:
             messages.error(request, f'Could not read the file: {exc}')
+        finally:
+            # Hand the upload back unclosed; Django closes it with the request.
+            data_stream.detach()
 
     return render(request, 'crm/data_tools/import_form.html', {
         'config': config,
         'form': form,
-        'sample_url': reverse('crm_data_tools:sample', args=[model_key]),
-        'export_url': reverse('crm_data_tools:export', args=[model_key]),
-        'import_url': reverse('crm_data_tools:import', args=[model_key]),
-        'model_key': model_key,
+        **_tool_urls(model_key),
     })
+
+
+@crm_access_required
+def import_preview(request, model_key: str):
+    config = _get_model_config(model_key)
+    staged = _staged_import(request, model_key)
+    if staged is None:
+        messages.error(request, 'No staged import was found. Please upload the file again.')
+        return redirect(reverse('crm_data_tools:import', args=[model_key]))
+
+    job = staged.job
+    page_obj = None
+    errors_only = request.GET.get('errors') == '1'
+    # Rows are only worth listing once the worker has validated them.
+    if job.status not in ('pending', 'validating'):
+        rows = staged.rows.all()
+        if errors_only:
+            rows = rows.filter(has_errors=True)
+        page_obj = KeysetPaginator(rows, ('row_number',), per_page=PREVIEW_PAGE_SIZE).get_page(request.GET.get('cursor'))
+
+    return render(request, 'crm/data_tools/import_preview.html', {
+        'config': config,
+        'staged': staged,
+        'job': job,
+        'page_obj': page_obj,
+        'errors_only': errors_only,
+        'row_errors': staged.error_rows,
+        'total_rows': staged.total_rows,
+        'has_errors': staged.error_rows > 0,
+        'can_confirm': job.status in ('ready', 'failed') and not staged.error_rows,
+        'live_progress': live_commit_progress(),
+        'status_url': reverse('crm_data_tools:import_status', args=[model_key]),
+        **_tool_urls(model_key),
+    })
+
+
+@crm_access_required
+def import_status(request, model_key: str):
+    _get_model_config(model_key)
+    staged = _staged_import(request, model_key)
+    if staged is None:
+        return JsonResponse({'status': 'missing'}, status=404)
+    return JsonResponse(job_status(staged.job))
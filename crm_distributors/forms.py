@@ -44,6 +44,11 @@ class DistributorStockEntryForm(forms.ModelForm):
             'near_expiry_quantity':forms.NumberInput(attrs={'placeholder': '0'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Batch labels include the product name.
+        self.fields['batch'].queryset = self.fields['batch'].queryset.select_related('product')
+
 
 class DistributorSalesValueForm(forms.ModelForm):
     class Meta:
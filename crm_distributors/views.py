@@ -5,7 +5,7 @@ from django.contrib.auth.decorators import login_required
 from core.auth_utils import crm_access_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, F
 from django.urls import reverse
 
 from .models import Distributor, DistributorStockEntry, DistributorSalesValue
@@ -54,7 +54,9 @@ def distributor_detail(request, pk):
     dist = get_object_or_404(Distributor, pk=pk)
     entries = dist.stock_entries.select_related('product').order_by('-date_submitted')[:10]
     sales   = dist.sales_values.select_related('product').order_by('-sale_date')[:10]
-    total_sales = sum(s.total_sales_value for s in dist.sales_values.all())
+    total_sales = float(
+        dist.sales_values.aggregate(total=Sum(F('quantity_sold') * F('price_per_unit')))['total'] or 0
+    )
     return render(request, 'crm/distributors/distributor_detail.html', {
         'dist': dist,
         'entries': entries,
@@ -0,0 +1,585 @@
+import random
+import time
+from datetime import date, time as clock, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from crm_analytics.cache import invalidate_months
+from crm_analytics.snapshots import add_months, iter_months, month_start, rebuild_snapshots
+from crm_distributors.models import Distributor, DistributorStockEntry, DistributorSalesValue
+from crm_doctors.models import (
+    Doctor,
+    DoctorPracticeLocation,
+    DoctorVisit,
+    VisitProductDetail,
+    DoctorInvestment,
+)
+from crm_products.models import Division, ProductMaster, BatchManagement, CompanyStock
+from crm_products.stock_positions import refresh_batch_statuses, refresh_stock_positions
+from crm_sales.models import Region, Area, MedicalRepresentative
+from crm_stores.models import MedicalStore, StoreProductTracking
+
+
+BATCH_SIZE = 2000
+
+# Default volumes, roughly a national field force. --scale multiplies every one.
+VOLUMES = {
+    "territories": 50,
+    "regions": 200,
+    "areas": 1000,
+    "mrs": 2000,
+    "products": 200,
+    "batches": 1000,
+    "distributors": 300,
+    "doctors": 100000,
+    "visits": 5000000,
+    "stock_entries": 50000,
+    "sales": 200000,
+    "stores": 20000,
+}
+
+FIRST_NAMES = [
+    "Ali", "Ahmed", "Usman", "Bilal", "Hamza", "Fatima", "Ayesha", "Sana", "Zainab", "Omar",
+    "Hassan", "Imran", "Sadia", "Nadia", "Farhan", "Kashif", "Rabia", "Asad", "Saima", "Tariq",
+]
+LAST_NAMES = [
+    "Khan", "Malik", "Hussain", "Qureshi", "Sheikh", "Chaudhry", "Butt", "Raza", "Siddiqui", "Javed",
+    "Iqbal", "Abbasi", "Mirza", "Akhtar", "Baig",
+]
+# (city, latitude, longitude)
+CITIES = [
+    ("Lahore", 31.5204, 74.3587), ("Karachi", 24.8607, 67.0011), ("Islamabad", 33.6844, 73.0479),
+    ("Rawalpindi", 33.5651, 73.0169), ("Faisalabad", 31.4504, 73.1350), ("Multan", 30.1575, 71.5249),
+    ("Peshawar", 34.0151, 71.5249), ("Quetta", 30.1798, 66.9750), ("Sialkot", 32.4945, 74.5229),
+    ("Hyderabad", 25.3960, 68.3578),
+]
+SPECIALTIES = [
+    "General Physician", "Cardiologist", "Pediatrician", "Gynecologist", "Dermatologist",
+    "ENT Specialist", "Orthopedic Surgeon", "Neurologist", "Pulmonologist", "Diabetologist",
+]
+GENERICS = [
+    "Amoxicillin", "Azithromycin", "Cefixime", "Ciprofloxacin", "Metformin", "Atorvastatin",
+    "Omeprazole", "Esomeprazole", "Paracetamol", "Ibuprofen", "Losartan", "Amlodipine",
+    "Montelukast", "Cetirizine", "Levofloxacin", "Clarithromycin", "Diclofenac", "Sitagliptin",
+]
+STRENGTHS = ["5mg", "10mg", "20mg", "40mg", "250mg", "500mg", "1g"]
+CATEGORIES = ["tablet", "tablet", "tablet", "capsule", "capsule", "syrup", "injection", "cream", "drops", "inhaler"]
+VISIT_TYPES = ["new_visit"] * 6 + ["follow_up"] * 3 + ["emergency"]
+INVESTMENT_TYPES = ["cash", "tour", "goods", "sponsorship", "lunch_dinner", "other"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large, deterministic CRM data set for load tests and benchmarks. "
+        "Rows are written with bulk_create in batches, one transaction per batch, so the "
+        "same --seed, volumes and --end-date always produce the same data. Meant for an "
+        "empty, throwaway database: model signals are bypassed, stock positions are "
+        "rebuilt at the end and --snapshots builds the analytics tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42).")
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiply every default volume, e.g. 0.01 for a quick laptop run (default: 1).",
+        )
+        for name, default in VOLUMES.items():
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                dest=name,
+                type=int,
+                help=f"Number of {name.replace('_', ' ')} (default: {default} × --scale).",
+            )
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=12,
+            help="Months of visit, stock and sales history ending at --end-date (default: 12).",
+        )
+        parser.add_argument("--end-date", help="Last day of generated history (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Rows per bulk_create and per transaction (default: {BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--snapshots",
+            action="store_true",
+            help="Build the performance snapshots for the generated months afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        if options["scale"] <= 0 or options["months"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--scale, --months and --batch-size must be positive.")
+        try:
+            self.end_date = date.fromisoformat(options["end_date"]) if options["end_date"] else timezone.localdate()
+        except ValueError:
+            raise CommandError(f"Invalid --end-date '{options['end_date']}', expected YYYY-MM-DD.")
+
+        self.seed = options["seed"]
+        self.batch_size = options["batch_size"]
+        self.volumes = {
+            name: options[name] if options[name] is not None else max(1, round(default * options["scale"]))
+            for name, default in VOLUMES.items()
+        }
+        self.first_month = add_months(month_start(self.end_date), 1 - options["months"])
+        self.days = (self.end_date - self.first_month).days + 1
+        self.months = list(iter_months(self.first_month, month_start(self.end_date)))
+
+        started = time.perf_counter()
+        self._seed_territories()
+        self._seed_mrs()
+        self._seed_products()
+        self._seed_distributors()
+        self._seed_doctors()
+        self._seed_visits()
+        self._seed_stores()
+        self._reset_sequences()
+
+        first_month, last_month = self.months[0], self.months[-1]
+        if options["snapshots"]:
+            self._step("snapshots", lambda: sum(
+                written for written, _ in rebuild_snapshots(first_month, last_month).values()
+            ))
+        else:
+            invalidate_months(self.months)
+        self.stdout.write(self.style.SUCCESS(f"Seeded scale data in {time.perf_counter() - started:.1f}s."))
+        if not options["snapshots"]:
+            self.stdout.write(
+                f"Run build_performance_snapshots --from {first_month:%Y-%m} --to {last_month:%Y-%m} "
+                "to populate the analytics tables."
+            )
+
+    # ------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------
+
+    def _rng(self, name):
+        # One stream per table, so a table's rows do not depend on the order tables are generated in.
+        return random.Random(f"{self.seed}:{name}")
+
+    def _next_pk(self, model):
+        return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+    def _insert(self, model, objs):
+        for i in range(0, len(objs), self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(objs[i:i + self.batch_size], batch_size=self.batch_size)
+        return len(objs)
+
+    def _step(self, label, build):
+        started = time.perf_counter()
+        written = build()
+        self.stdout.write(f"{label}: {written} row(s) in {time.perf_counter() - started:.1f}s")
+
+    def _person(self, rng):
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def _phone(self, rng):
+        return f"+92 3{rng.randrange(0, 50):02d} {rng.randrange(1000000, 9999999)}"
+
+    def _day(self, rng):
+        return self.first_month + timedelta(days=rng.randrange(self.days))
+
+    def _near(self, rng, city):
+        _, lat, lng = city
+        return (
+            Decimal(f"{lat + rng.uniform(-0.08, 0.08):.7f}"),
+            Decimal(f"{lng + rng.uniform(-0.08, 0.08):.7f}"),
+        )
+
+    def _reset_sequences(self):
+        # Rows were inserted with explicit primary keys; move the sequences past them.
+        models = [
+            Division, Region, Region.division.through, Area, Area.region.through, MedicalRepresentative,
+            ProductMaster, BatchManagement, CompanyStock, Distributor, DistributorStockEntry,
+            DistributorSalesValue, Doctor, Doctor.assigned_mrs.through, DoctorPracticeLocation,
+            DoctorVisit, VisitProductDetail, DoctorInvestment, MedicalStore,
+            MedicalStore.linked_doctors.through, StoreProductTracking,
+        ]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # ------------------------------------------------------------
+    # Territory hierarchy and field force
+    # ------------------------------------------------------------
+
+    def _seed_territories(self):
+        rng = self._rng("territories")
+        volumes = self.volumes
+
+        first = self._next_pk(Division)
+        self.territory_ids = list(range(first, first + volumes["territories"]))
+        self._step("territories", lambda: self._insert(Division, [
+            Division(pk=pk, division_id=f"DIV-{pk:04d}", name=f"Territory {n:03d}", manager_name=self._person(rng))
+            for n, pk in enumerate(self.territory_ids, start=1)
+        ]))
+
+        first = self._next_pk(Region)
+        self.region_ids = list(range(first, first + volumes["regions"]))
+        self.region_territory = {pk: self.territory_ids[n % len(self.territory_ids)] for n, pk in enumerate(self.region_ids)}
+        self.region_names = {pk: f"{CITIES[n % len(CITIES)][0]} Region {n + 1:03d}" for n, pk in enumerate(self.region_ids)}
+        self._step("regions", lambda: self._insert(Region, [
+            Region(pk=pk, region_id=f"REG-{pk:04d}", region_name=self.region_names[pk], regional_manager=self._person(rng))
+            for pk in self.region_ids
+        ]) + self._insert(Region.division.through, [
+            Region.division.through(region_id=pk, division_id=self.region_territory[pk]) for pk in self.region_ids
+        ]))
+
+        first = self._next_pk(Area)
+        self.area_ids = list(range(first, first + volumes["areas"]))
+        self.area_region = {pk: self.region_ids[n % len(self.region_ids)] for n, pk in enumerate(self.area_ids)}
+        self.area_city = {pk: CITIES[n % len(CITIES)] for n, pk in enumerate(self.area_ids)}
+        self._step("areas", lambda: self._insert(Area, [
+            Area(pk=pk, area_id=f"AREA-{pk:04d}", area_name=f"{self.area_city[pk][0]} Area {n:04d}",
+                 area_manager=self._person(rng))
+            for n, pk in enumerate(self.area_ids, start=1)
+        ]) + self._insert(Area.region.through, [
+            Area.region.through(area_id=pk, region_id=self.area_region[pk]) for pk in self.area_ids
+        ]))
+
+    def _seed_mrs(self):
+        rng = self._rng("mrs")
+        first = self._next_pk(MedicalRepresentative)
+        self.mr_ids = list(range(first, first + self.volumes["mrs"]))
+        self.area_mrs = {}
+        mrs = []
+        for pk in self.mr_ids:
+            area_id = rng.choice(self.area_ids)
+            region_id = self.area_region[area_id]
+            self.area_mrs.setdefault(area_id, []).append(pk)
+            mrs.append(MedicalRepresentative(
+                pk=pk,
+                mr_id=f"MR-{pk:05d}",
+                name=self._person(rng),
+                cnic=f"{rng.randrange(10000, 99999)}-{pk:07d}-{rng.randrange(10)}",
+                phone_number=self._phone(rng),
+                division_id=self.region_territory[region_id],
+                region_id=region_id,
+                area_id=area_id,
+                date_of_joining=self.end_date - timedelta(days=rng.randrange(30, 3650)),
+                salary=Decimal(rng.randrange(60, 180) * 1000),
+                status=rng.choices(["active", "on_leave", "inactive"], weights=[92, 4, 4])[0],
+            ))
+        self._step("mrs", lambda: self._insert(MedicalRepresentative, mrs))
+
+    # ------------------------------------------------------------
+    # Products, batches and warehouse stock
+    # ------------------------------------------------------------
+
+    def _seed_products(self):
+        rng = self._rng("products")
+        first = self._next_pk(ProductMaster)
+        self.product_ids = list(range(first, first + self.volumes["products"]))
+        self.trade_price = {}
+        self.distributor_price = {}
+        products = []
+        for pk in self.product_ids:
+            generic, strength = rng.choice(GENERICS), rng.choice(STRENGTHS)
+            cost = Decimal(f"{rng.uniform(8, 200):.2f}")
+            self.trade_price[pk] = (cost * Decimal(f"{rng.uniform(1.5, 2.2):.2f}")).quantize(Decimal("0.01"))
+            self.distributor_price[pk] = (self.trade_price[pk] * Decimal("1.07")).quantize(Decimal("0.01"))
+            products.append(ProductMaster(
+                pk=pk,
+                product_id=f"PROD-{pk:05d}",
+                product_name=f"{generic} {strength}",
+                generic_name=generic,
+                brand_name=f"{generic[:4]}-{pk}",
+                category=rng.choice(CATEGORIES),
+                division_id=rng.choice(self.territory_ids),
+                strength=strength,
+                packing_size=rng.choice(["10x10", "3x10", "1x14", "60ml", "120ml"]),
+                manufacturing_cost_per_unit=cost,
+                trade_price=self.trade_price[pk],
+                retail_price=(self.trade_price[pk] * Decimal("1.2")).quantize(Decimal("0.01")),
+                distributor_price=self.distributor_price[pk],
+                status=rng.choices(["active", "inactive"], weights=[95, 5])[0],
+            ))
+        self._step("products", lambda: self._insert(ProductMaster, products))
+
+        first = self._next_pk(BatchManagement)
+        batch_ids = list(range(first, first + self.volumes["batches"]))
+        self.product_batches = {}
+        batches = []
+        for n, pk in enumerate(batch_ids):
+            product_id = self.product_ids[n % len(self.product_ids)]
+            self.product_batches.setdefault(product_id, []).append(pk)
+            manufactured_on = self.end_date - timedelta(days=rng.randrange(30, 900))
+            quantity = rng.randrange(5, 50) * 1000
+            batches.append(BatchManagement(
+                pk=pk,
+                batch_number=f"SB-{pk:07d}",
+                product_id=product_id,
+                manufacturing_date=manufactured_on,
+                expiry_date=manufactured_on + timedelta(days=rng.choice([540, 730, 1095])),
+                quantity_manufactured=quantity,
+                quantity_sent_to_distributors=int(quantity * rng.uniform(0.3, 1.0)),
+            ))
+        self._step("batches", lambda: self._insert(BatchManagement, batches))
+        refresh_batch_statuses()
+
+        first = self._next_pk(CompanyStock)
+        self._step("company stock", lambda: self._insert(CompanyStock, [
+            CompanyStock(
+                pk=first + n,
+                product_id=batch.product_id,
+                batch_id=batch.pk,
+                warehouse_location=rng.choice(["main", "main", "cold_storage", "secondary"]),
+                low_stock_threshold=rng.choice([100, 500, 1000, 2500]),
+            )
+            for n, batch in enumerate(batches)
+        ]))
+        self._step("stock positions", refresh_stock_positions)
+
+    # ------------------------------------------------------------
+    # Distributors, their stock reports and sales
+    # ------------------------------------------------------------
+
+    def _seed_distributors(self):
+        rng = self._rng("distributors")
+        first = self._next_pk(Distributor)
+        self.distributor_ids = list(range(first, first + self.volumes["distributors"]))
+        distributors = []
+        for pk in self.distributor_ids:
+            city = rng.choice(CITIES)
+            distributors.append(Distributor(
+                pk=pk,
+                distributor_id=f"DIST-{pk:04d}",
+                distributor_name=f"{rng.choice(LAST_NAMES)} Pharma Distributors {pk}",
+                owner_name=self._person(rng),
+                contact_number=self._phone(rng),
+                address=f"Plot {rng.randrange(1, 400)}, Industrial Area, {city[0]}",
+                city=city[0],
+                region=self.region_names[rng.choice(self.region_ids)],
+                license_number=f"DL-{pk:07d}",
+                credit_limit=Decimal(rng.randrange(5, 100) * 100000),
+                status=rng.choices(["active", "inactive"], weights=[95, 5])[0],
+            ))
+        self._step("distributors", lambda: self._insert(Distributor, distributors))
+
+        first = self._next_pk(DistributorStockEntry)
+        entries = []
+        for n in range(self.volumes["stock_entries"]):
+            product_id = rng.choice(self.product_ids)
+            period_start = rng.choice(self.months)
+            opening, received = rng.randrange(0, 2000), rng.randrange(0, 5000)
+            sold = rng.randrange(0, opening + received + 1)
+            expired = rng.randrange(0, max(1, (opening + received - sold) // 10))
+            entries.append(DistributorStockEntry(
+                pk=first + n,
+                distributor_id=rng.choice(self.distributor_ids),
+                product_id=product_id,
+                batch_id=rng.choice(self.product_batches[product_id]) if product_id in self.product_batches else None,
+                opening_stock=opening,
+                received_quantity=received,
+                sold_quantity=sold,
+                expired_quantity=expired,
+                near_expiry_quantity=rng.randrange(0, 200),
+                # Same rule as DistributorStockEntry.save(), which bulk_create bypasses.
+                unsold_quantity=max(0, opening + received - sold - expired),
+                report_period_start=period_start,
+                report_period_end=add_months(period_start, 1) - timedelta(days=1),
+            ))
+        self._step("distributor stock entries", lambda: self._insert(DistributorStockEntry, entries))
+
+        first = self._next_pk(DistributorSalesValue)
+        self._step("distributor sales", lambda: self._insert(DistributorSalesValue, [
+            DistributorSalesValue(
+                pk=first + n,
+                distributor_id=rng.choice(self.distributor_ids),
+                product_id=product_id,
+                quantity_sold=rng.randrange(10, 2000),
+                price_per_unit=self.distributor_price[product_id],
+                sale_date=self._day(rng),
+            )
+            for n, product_id in enumerate(rng.choice(self.product_ids) for _ in range(self.volumes["sales"]))
+        ]))
+
+    # ------------------------------------------------------------
+    # Doctors and visits
+    # ------------------------------------------------------------
+
+    def _seed_doctors(self):
+        rng = self._rng("doctors")
+        first = self._next_pk(Doctor)
+        first_location = self._next_pk(DoctorPracticeLocation)
+        self.doctor_ids = list(range(first, first + self.volumes["doctors"]))
+        self.doctor_area = {}
+        self.doctor_mrs = {}
+        self.doctor_locations = {}      # doctor pk → (first location pk, location count, city)
+        doctors, locations, assignments = [], [], []
+        for pk in self.doctor_ids:
+            area_id = rng.choice(self.area_ids)
+            city = self.area_city[area_id]
+            name = f"Dr. {self._person(rng)}"
+            hospital = f"{city[0]} {rng.choice(['General', 'City', 'Care', 'Medical'])} Hospital"
+            clinic = f"{name.split()[1]} Clinic"
+            self.doctor_area[pk] = area_id
+            doctors.append(Doctor(
+                pk=pk,
+                doctor_id=f"DOC-{pk:05d}",
+                doctor_name=name,
+                specialty=rng.choice(SPECIALTIES),
+                qualification=rng.choice(["MBBS", "MBBS, FCPS", "MBBS, MRCP", "MBBS, MD"]),
+                hospital_name=hospital,
+                clinic_name=clinic,
+                city=city[0],
+                area_id=area_id,
+                contact_number=self._phone(rng),
+                estimated_patients_per_day=rng.randrange(10, 120),
+                estimated_prescription_potential=Decimal(rng.randrange(10, 500) * 1000),
+                status=rng.choices(["active", "inactive"], weights=[96, 4])[0],
+            ))
+
+            count = rng.choice([1, 1, 2])
+            self.doctor_locations[pk] = (first_location + len(locations), count, city)
+            for location_name, location_type in [(hospital, "hospital"), (clinic, "clinic")][:count]:
+                locations.append(DoctorPracticeLocation(
+                    pk=first_location + len(locations),
+                    doctor_id=pk,
+                    location_name=location_name,
+                    location_type=location_type,
+                    address=f"{rng.randrange(1, 200)} Main Road, {city[0]}",
+                ))
+
+            candidates = self.area_mrs.get(area_id) or self.mr_ids
+            self.doctor_mrs[pk] = rng.sample(candidates, min(len(candidates), rng.choice([1, 1, 2])))
+            assignments += [
+                Doctor.assigned_mrs.through(doctor_id=pk, medicalrepresentative_id=mr_id)
+                for mr_id in self.doctor_mrs[pk]
+            ]
+        self._step("doctors", lambda: self._insert(Doctor, doctors))
+        self._step("practice locations", lambda: self._insert(DoctorPracticeLocation, locations))
+        self._step("doctor assignments", lambda: self._insert(Doctor.assigned_mrs.through, assignments))
+
+    def _seed_visits(self):
+        """
+        Visits with their product details and investments, generated and
+        written one --batch-size chunk of visits at a time so memory stays flat.
+        """
+        rng = self._rng("visits")
+        total = self.volumes["visits"]
+        visit_pk = self._next_pk(DoctorVisit)
+        detail_pk = self._next_pk(VisitProductDetail)
+        investment_pk = self._next_pk(DoctorInvestment)
+        counts = {"visits": 0, "product details": 0, "investments": 0}
+        started = time.perf_counter()
+
+        while counts["visits"] < total:
+            visits, details, investments = [], [], []
+            for _ in range(min(self.batch_size, total - counts["visits"] - len(visits))):
+                # Skewed towards the first doctors: key accounts get most of the calls.
+                doctor_id = self.doctor_ids[int(len(self.doctor_ids) * rng.random() ** 1.5)]
+                first_location, location_count, city = self.doctor_locations[doctor_id]
+                location_id = first_location + rng.randrange(location_count)
+                visit_date = self._day(rng)
+                verified = rng.random() < 0.85
+                latitude, longitude = self._near(rng, city) if verified else (None, None)
+                visits.append(DoctorVisit(
+                    pk=visit_pk,
+                    mr_id=rng.choice(self.doctor_mrs[doctor_id]),
+                    doctor_id=doctor_id,
+                    visit_location_id=location_id,
+                    visit_date=visit_date,
+                    visit_time=clock(rng.randrange(9, 20), rng.choice([0, 15, 30, 45])),
+                    visit_type=rng.choice(VISIT_TYPES),
+                    gps_latitude=latitude,
+                    gps_longitude=longitude,
+                    is_gps_verified=verified,
+                    next_follow_up_date=visit_date + timedelta(days=rng.choice([7, 14, 30])),
+                ))
+                for product_id in rng.sample(self.product_ids, min(len(self.product_ids), rng.choice([1, 2, 2, 3]))):
+                    per_day = rng.randrange(0, 25)
+                    details.append(VisitProductDetail(
+                        pk=detail_pk,
+                        visit_id=visit_pk,
+                        product_id=product_id,
+                        samples_given=rng.randrange(0, 10),
+                        estimated_units_prescribed_per_day=per_day,
+                        estimated_units_prescribed_per_month=per_day * 30,
+                        estimated_value_per_month=self.trade_price[product_id] * per_day * 30,
+                    ))
+                    detail_pk += 1
+                for _ in range(rng.choice([0, 1, 1, 2])):
+                    investments.append(DoctorInvestment(
+                        pk=investment_pk,
+                        visit_id=visit_pk,
+                        investment_type=rng.choice(INVESTMENT_TYPES),
+                        amount=Decimal(rng.randrange(5, 500) * 100),
+                    ))
+                    investment_pk += 1
+                visit_pk += 1
+
+            with transaction.atomic():
+                DoctorVisit.objects.bulk_create(visits, batch_size=self.batch_size)
+                VisitProductDetail.objects.bulk_create(details, batch_size=self.batch_size)
+                DoctorInvestment.objects.bulk_create(investments, batch_size=self.batch_size)
+            counts["visits"] += len(visits)
+            counts["product details"] += len(details)
+            counts["investments"] += len(investments)
+            if counts["visits"] % (self.batch_size * 50) < self.batch_size or counts["visits"] == total:
+                self.stdout.write(f"  visits: {counts['visits']}/{total} ({time.perf_counter() - started:.1f}s)")
+
+        for label, written in counts.items():
+            self.stdout.write(f"{label}: {written} row(s) in {time.perf_counter() - started:.1f}s")
+
+    # ------------------------------------------------------------
+    # Medical stores
+    # ------------------------------------------------------------
+
+    def _seed_stores(self):
+        rng = self._rng("stores")
+        first = self._next_pk(MedicalStore)
+        first_tracking = self._next_pk(StoreProductTracking)
+        area_doctors = {}
+        for doctor_id, area_id in self.doctor_area.items():
+            area_doctors.setdefault(area_id, []).append(doctor_id)
+
+        stores, links, tracking = [], [], []
+        for pk in range(first, first + self.volumes["stores"]):
+            area_id = rng.choice(self.area_ids)
+            city = self.area_city[area_id]
+            latitude, longitude = self._near(rng, city)
+            stores.append(MedicalStore(
+                pk=pk,
+                store_id=f"STORE-{pk:05d}",
+                store_name=f"{rng.choice(LAST_NAMES)} Medical Store {pk}",
+                owner_name=self._person(rng),
+                phone=self._phone(rng),
+                address=f"Shop {rng.randrange(1, 300)}, {city[0]}",
+                area_id=area_id,
+                gps_latitude=latitude,
+                gps_longitude=longitude,
+                distributor_id=rng.choice(self.distributor_ids),
+                drug_license_number=f"SL-{pk:07d}",
+                status=rng.choices(["active", "inactive"], weights=[95, 5])[0],
+            ))
+            nearby = area_doctors.get(area_id) or self.doctor_ids
+            links += [
+                MedicalStore.linked_doctors.through(medicalstore_id=pk, doctor_id=doctor_id)
+                for doctor_id in rng.sample(nearby, min(len(nearby), rng.randrange(1, 4)))
+            ]
+            for product_id in rng.sample(self.product_ids, min(len(self.product_ids), 3)):
+                units = rng.randrange(0, 500)
+                tracking.append(StoreProductTracking(
+                    pk=first_tracking + len(tracking),
+                    store_id=pk,
+                    product_id=product_id,
+                    availability=rng.choices(["available", "low_stock", "out_of_stock"], weights=[80, 12, 8])[0],
+                    monthly_sales_estimate=units,
+                    monthly_revenue_estimate=self.trade_price[product_id] * units,
+                ))
+        self._step("stores", lambda: self._insert(MedicalStore, stores))
+        self._step("store doctor links", lambda: self._insert(MedicalStore.linked_doctors.through, links))
+        self._step("store product tracking", lambda: self._insert(StoreProductTracking, tracking))
@@ -1,3 +1,51 @@
+import io
+
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from crm_distributors.models import DistributorSalesValue, DistributorStockEntry
+from crm_products.models import BatchManagement, StockPosition
+from crm_sales.models import MedicalRepresentative
+from crm_stores.models import MedicalStore
+
+from .models import Doctor, DoctorInvestment, DoctorVisit, VisitProductDetail
+
+
+SEEDED_MODELS = [
+    MedicalRepresentative, BatchManagement, StockPosition, DistributorStockEntry, DistributorSalesValue,
+    Doctor, Doctor.assigned_mrs.through, DoctorVisit, VisitProductDetail, DoctorInvestment, MedicalStore,
+]
+
+
+class SeedScaleDataTests(TestCase):
+    def _seed(self, seed):
+        call_command(
+            'seed_scale_data', '--scale', '0.0001', '--seed', str(seed), '--months', '2',
+            '--end-date', '2025-06-30', stdout=io.StringIO(),
+        )
+        return {model._meta.label: self._rows(model) for model in SEEDED_MODELS}
+
+    def _rows(self, model):
+        """Every row of ``model`` without the timestamps stamped at insert time."""
+        fields = [
+            field.attname for field in model._meta.concrete_fields
+            if not (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+        ]
+        return list(model.objects.order_by('pk').values_list(*fields))
+
+    def _seed_and_roll_back(self, seed):
+        sid = transaction.savepoint()
+        tables = self._seed(seed)
+        transaction.savepoint_rollback(sid)
+        return tables
+
+    def test_same_seed_gives_the_same_rows(self):
+        first = self._seed_and_roll_back(42)
+        self.assertFalse(Doctor.objects.exists())
+
+        self.assertEqual(len(first['crm_doctors.DoctorVisit']), 500)
+        self.assertEqual(len(first['crm_doctors.Doctor']), 10)
+        self.assertTrue(all(first.values()))
+        self.assertEqual(self._seed_and_roll_back(42), first)
+        self.assertNotEqual(self._seed_and_roll_back(7)['crm_doctors.DoctorVisit'], first['crm_doctors.DoctorVisit'])
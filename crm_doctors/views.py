@@ -3,12 +3,14 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from core.auth_utils import crm_access_required
+from core.pagination import KeysetPaginator, approximate_count
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, Avg
 from django.forms import inlineformset_factory
 from django.http import JsonResponse
 from django.urls import reverse
+from django.utils import timezone
 
 from .models import (Doctor, DoctorVisit, VisitProductDetail,
                      CompetitorInfo, DoctorInvestment, PharmacyReference,
@@ -60,9 +62,16 @@ def doctor_list(request):
 @crm_access_required
 def doctor_detail(request, pk):
     doctor  = get_object_or_404(Doctor, pk=pk)
-    visits  = doctor.visits.select_related('mr').order_by('-visit_date')
-    total_investment = sum(v.total_investment for v in visits)
-    total_value      = sum(v.total_estimated_value for v in visits)
+    visits  = (doctor.visits.select_related('mr')
+               .prefetch_related('investments', 'product_details')
+               .order_by('-visit_date'))
+    total_investment = float(
+        DoctorInvestment.objects.filter(visit__doctor=doctor).aggregate(total=Sum('amount'))['total'] or 0
+    )
+    total_value = float(
+        VisitProductDetail.objects.filter(visit__doctor=doctor)
+        .aggregate(total=Sum('estimated_value_per_month'))['total'] or 0
+    )
 
     paginator = Paginator(visits, 10)
     page = paginator.get_page(request.GET.get('page'))
@@ -112,7 +121,9 @@ def doctor_delete(request, pk):
 
 @crm_access_required
 def visit_list(request):
-    qs = DoctorVisit.objects.select_related('mr', 'doctor', 'visit_location').order_by('-visit_date', '-visit_time')
+    qs = (DoctorVisit.objects.select_related('mr', 'doctor', 'visit_location')
+          .prefetch_related('investments', 'product_details')
+          .order_by('-visit_date', '-visit_time'))
 
     q          = request.GET.get('q', '')
     mr_id      = request.GET.get('mr', '')
@@ -142,19 +153,20 @@ def visit_list(request):
     from crm_sales.models import MedicalRepresentative
     mrs = MedicalRepresentative.objects.filter(status='active')
 
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get('page'))
+    # Keyset pagination: no OFFSET scans and only bounded counts on deep lists.
+    paginator = KeysetPaginator(qs, ('-visit_date', '-visit_time', '-id'), per_page=20, approximate_total=True)
+    page = paginator.get_page(request.GET.get('cursor'))
+    gps_total, gps_exact = approximate_count(qs.filter(is_gps_verified=True))
 
     return render(request, 'crm/doctors/visit_list.html', {
         'page_obj':    page,
         'query':       q,
         'mrs':         mrs,
-        'total':       qs.count(),
-        'gps_total':   qs.filter(is_gps_verified=True).count(),
-        'today_count': qs.filter(visit_date=__import__('django.utils.timezone', fromlist=['now']).now().date()).count()
-            if False else DoctorVisit.objects.filter(
-                visit_date=__import__('datetime').date.today()
-            ).count(),
+        'total':       paginator.total,
+        'total_exact': paginator.total_is_exact,
+        'gps_total':   gps_total,
+        'gps_exact':   gps_exact,
+        'today_count': DoctorVisit.objects.filter(visit_date=timezone.localdate()).count(),
         'visit_types': DoctorVisit.VISIT_TYPE_CHOICES,
         'export_url': reverse('crm_data_tools:export', args=['doctor_visit']),
         'sample_url': reverse('crm_data_tools:sample', args=['doctor_visit']),
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CrmProductsConfig(AppConfig):
     name = 'crm_products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -57,4 +57,9 @@ class CompanyStockForm(forms.ModelForm):
         fields = ['product', 'batch', 'warehouse_location', 'low_stock_threshold']
         widgets = {
             'low_stock_threshold': forms.NumberInput(attrs={'placeholder': '100'}),
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Batch labels include the product name.
+        self.fields['batch'].queryset = self.fields['batch'].queryset.select_related('product')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from crm_products.stock_positions import refresh_stock_positions
+
+
+class Command(BaseCommand):
+    help = "Recompute the StockPosition table from CompanyStock and BatchManagement (e.g. after bulk updates that bypass signals)."
+
+    def handle(self, *args, **options):
+        written = refresh_stock_positions()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} stock position(s)."))
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_stock_positions(apps, schema_editor):
+    CompanyStock = apps.get_model('crm_products', 'CompanyStock')
+    StockPosition = apps.get_model('crm_products', 'StockPosition')
+
+    positions = []
+    rows = CompanyStock.objects.values_list(
+        'pk', 'product_id', 'low_stock_threshold',
+        'batch__quantity_manufactured', 'batch__quantity_sent_to_distributors', 'batch__batch_status',
+    )
+    for pk, product_id, threshold, manufactured, sent, status in rows.iterator(chunk_size=2000):
+        available = max(0, manufactured - sent)
+        positions.append(StockPosition(
+            stock_id=pk, product_id=product_id, available_stock=available,
+            low_stock_threshold=threshold, is_low_stock=available <= threshold, batch_status=status,
+        ))
+    StockPosition.objects.bulk_create(positions, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_products', '0003_alter_productmaster_product_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPosition',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='position', serialize=False, to='crm_products.companystock')),
+                ('available_stock', models.PositiveIntegerField(default=0)),
+                ('low_stock_threshold', models.PositiveIntegerField(default=100)),
+                ('is_low_stock', models.BooleanField(default=False)),
+                ('batch_status', models.CharField(choices=[('active', 'Active'), ('near_expiry', 'Near Expiry'), ('expired', 'Expired')], default='active', max_length=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_positions', to='crm_products.productmaster')),
+            ],
+            options={
+                'verbose_name': 'Stock Position',
+                'verbose_name_plural': 'Stock Positions',
+                'indexes': [models.Index(fields=['is_low_stock', 'available_stock'], name='stockpos_low_available_idx'), models.Index(fields=['batch_status'], name='stockpos_batch_status_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_positions, migrations.RunPython.noop),
+    ]
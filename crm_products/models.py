@@ -288,4 +288,44 @@ class CompanyStock(models.Model):
 
     @property
     def is_near_expiry(self):
-        return self.batch.batch_status == 'near_expiry'
\ No newline at end of file
+        return self.batch.batch_status == 'near_expiry'
+
+class StockPosition(models.Model):
+    """
+    Denormalized stock position, one row per CompanyStock.
+    Holds the warehouse quantity and low-stock flag so counts and lists are
+    single indexed queries. Kept current by crm_products/signals.py whenever
+    a CompanyStock or its BatchManagement row is saved.
+    """
+
+    stock = models.OneToOneField(
+        CompanyStock,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='position'
+    )
+    product = models.ForeignKey(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        related_name='stock_positions'
+    )
+    available_stock = models.PositiveIntegerField(default=0)
+    low_stock_threshold = models.PositiveIntegerField(default=100)
+    is_low_stock = models.BooleanField(default=False)
+    batch_status = models.CharField(
+        max_length=15,
+        choices=BatchManagement.BATCH_STATUS_CHOICES,
+        default='active'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Stock Position'
+        verbose_name_plural = 'Stock Positions'
+        indexes = [
+            models.Index(fields=['is_low_stock', 'available_stock'], name='stockpos_low_available_idx'),
+            models.Index(fields=['batch_status'], name='stockpos_batch_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Position #{self.stock_id}: {self.available_stock}"
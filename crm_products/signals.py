@@ -0,0 +1,25 @@
+# ============================================================
+# CRM PRODUCTS APP — crm_products/signals.py
+# Keeps StockPosition in step with CompanyStock and BatchManagement.
+# ============================================================
+
+from django.db.models.signals import post_save
+
+from .models import BatchManagement, CompanyStock
+from .stock_positions import refresh_stock_positions
+
+
+def refresh_position_for_stock(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_stock_positions(stock_ids=[instance.pk])
+
+
+def refresh_positions_for_batch(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_stock_positions(batch_ids=[instance.pk])
+
+
+post_save.connect(refresh_position_for_stock, sender=CompanyStock, dispatch_uid='stock_position_stock_save')
+post_save.connect(refresh_positions_for_batch, sender=BatchManagement, dispatch_uid='stock_position_batch_save')
@@ -0,0 +1,99 @@
+# ============================================================
+# CRM PRODUCTS APP — crm_products/stock_positions.py
+# Set-based maintenance of the StockPosition table and of the
+# expiry-driven batch statuses it mirrors.
+# ============================================================
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, CharField, F, Value, When
+from django.utils import timezone
+
+from .models import BatchManagement, CompanyStock, StockPosition
+
+
+BATCH_SIZE = 2000
+
+POSITION_FIELDS = ['product', 'available_stock', 'low_stock_threshold', 'is_low_stock', 'batch_status', 'updated_at']
+
+
+def refresh_stock_positions(stock_ids=None, batch_ids=None):
+    """
+    Recompute the StockPosition rows for the given CompanyStock or batch ids
+    (every stock row when both are None) with one read and one upsert per
+    ``BATCH_SIZE`` rows. Returns the number of rows written.
+    """
+    qs = CompanyStock.objects.all()
+    if stock_ids is not None:
+        qs = qs.filter(pk__in=stock_ids)
+    if batch_ids is not None:
+        qs = qs.filter(batch_id__in=batch_ids)
+
+    rows = qs.values_list(
+        'pk', 'product_id', 'low_stock_threshold',
+        'batch__quantity_manufactured', 'batch__quantity_sent_to_distributors', 'batch__batch_status',
+    ).order_by('pk')
+
+    written = 0
+    positions = []
+    for pk, product_id, threshold, manufactured, sent, status in rows.iterator(chunk_size=BATCH_SIZE):
+        # Same rule as BatchManagement.quantity_available_in_company.
+        available = max(0, manufactured - sent)
+        positions.append(StockPosition(
+            stock_id=pk,
+            product_id=product_id,
+            available_stock=available,
+            low_stock_threshold=threshold,
+            is_low_stock=available <= threshold,
+            batch_status=status,
+        ))
+        if len(positions) >= BATCH_SIZE:
+            written += _upsert(positions)
+            positions = []
+    if positions:
+        written += _upsert(positions)
+    return written
+
+
+def _upsert(positions):
+    StockPosition.objects.bulk_create(
+        positions,
+        update_conflicts=True,
+        unique_fields=['stock'],
+        update_fields=POSITION_FIELDS,
+    )
+    return len(positions)
+
+
+def refresh_batch_statuses(batches=None):
+    """
+    Bring ``batch_status`` in line with the expiry date for ``batches`` (a
+    BatchManagement queryset, every batch when None) — the same rule as
+    BatchManagement.save(), applied with one UPDATE per status that changed
+    instead of a save() per row. Returns the number of batches updated.
+    """
+    today = timezone.now().date()
+    expected = Case(
+        When(expiry_date__lte=today, then=Value('expired')),
+        When(expiry_date__lte=today + timedelta(days=90), then=Value('near_expiry')),
+        default=Value('active'),
+        output_field=CharField(),
+    )
+    qs = BatchManagement.objects.all() if batches is None else batches.order_by()
+    stale = defaultdict(list)
+    for pk, status in (
+        qs.annotate(expected_status=expected)
+        .exclude(batch_status=F('expected_status'))
+        .values_list('pk', 'expected_status')
+    ):
+        stale[status].append(pk)
+    if not stale:
+        return 0
+
+    now = timezone.now()
+    for status, pks in stale.items():
+        BatchManagement.objects.filter(pk__in=pks).update(batch_status=status, updated_at=now)
+    changed = [pk for pks in stale.values() for pk in pks]
+    refresh_stock_positions(batch_ids=changed)
+    return len(changed)
@@ -1,3 +1,110 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BatchManagement, CompanyStock, Division, ProductMaster, StockPosition
+from .stock_positions import refresh_batch_statuses
+
+
+class StockFixtures:
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.product = ProductMaster.objects.create(
+            product_name='Panadol', generic_name='Paracetamol', brand_name='GSK',
+            category='tablet', strength='500mg', packing_size='10x10',
+            division=Division.objects.create(name='North'),
+        )
+
+    @classmethod
+    def make_stock(cls, number, expires_in, sent, threshold=100):
+        batch = BatchManagement.objects.create(
+            batch_number=f'B{number:03d}', product=cls.product,
+            manufacturing_date=cls.today - timedelta(days=200),
+            expiry_date=cls.today + timedelta(days=expires_in),
+            quantity_manufactured=1000, quantity_sent_to_distributors=sent,
+        )
+        return CompanyStock.objects.create(product=cls.product, batch=batch, low_stock_threshold=threshold)
+
+
+class StockPositionTests(StockFixtures, TestCase):
+    def test_position_follows_stock_and_batch_writes(self):
+        stock = self.make_stock(1, expires_in=400, sent=100)
+        position = StockPosition.objects.get(stock=stock)
+        self.assertEqual(
+            (position.product_id, position.available_stock, position.low_stock_threshold,
+             position.is_low_stock, position.batch_status),
+            (self.product.pk, 900, 100, False, 'active'),
+        )
+
+        stock.low_stock_threshold = 950
+        stock.save()
+        position.refresh_from_db()
+        self.assertEqual((position.low_stock_threshold, position.is_low_stock), (950, True))
+
+        batch = stock.batch
+        batch.quantity_sent_to_distributors = 1200
+        batch.expiry_date = self.today + timedelta(days=30)
+        batch.save()
+        position.refresh_from_db()
+        self.assertEqual(
+            (position.available_stock, position.is_low_stock, position.batch_status),
+            (0, True, 'near_expiry'),
+        )
+
+        stock.delete()
+        self.assertFalse(StockPosition.objects.filter(pk=position.pk).exists())
+
+        other = self.make_stock(2, expires_in=400, sent=0)
+        other.batch.delete()
+        self.assertFalse(StockPosition.objects.exists())
+
+    def test_refresh_batch_statuses_fixes_stale_batches_and_positions(self):
+        stocks = [self.make_stock(i, expires_in=400, sent=0) for i in range(3)]
+        # A queryset update skips BatchManagement.save() and the signals.
+        BatchManagement.objects.filter(pk=stocks[0].batch_id).update(expiry_date=self.today - timedelta(days=1))
+        BatchManagement.objects.filter(pk=stocks[1].batch_id).update(expiry_date=self.today + timedelta(days=30))
+
+        self.assertEqual(refresh_batch_statuses(), 2)
+        self.assertEqual(
+            list(BatchManagement.objects.order_by('batch_number').values_list('batch_status', flat=True)),
+            ['expired', 'near_expiry', 'active'],
+        )
+        self.assertEqual(
+            list(StockPosition.objects.order_by('stock__batch__batch_number').values_list('batch_status', flat=True)),
+            ['expired', 'near_expiry', 'active'],
+        )
+        self.assertEqual(refresh_batch_statuses(), 0)
+
+    def test_refresh_batch_statuses_only_touches_the_given_batches(self):
+        stocks = [self.make_stock(i, expires_in=400, sent=0) for i in range(2)]
+        BatchManagement.objects.update(expiry_date=self.today + timedelta(days=30))
+
+        self.assertEqual(refresh_batch_statuses(BatchManagement.objects.filter(pk=stocks[0].batch_id)), 1)
+        self.assertEqual(
+            list(StockPosition.objects.order_by('stock__batch__batch_number').values_list('batch_status', flat=True)),
+            ['near_expiry', 'active'],
+        )
+
+    def test_low_stock_counts_match_company_stock_properties(self):
+        for i in range(12):
+            self.make_stock(i, expires_in=30 * i - 30, sent=90 * i, threshold=50 * (i % 4))
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'pass12345')
+        self.client.force_login(user)
+
+        all_stock = list(CompanyStock.objects.select_related('batch'))
+        expected_low = sum(1 for s in all_stock if s.is_low_stock)
+        expected_near_expiry = sum(1 for s in all_stock if s.is_near_expiry)
+        self.assertGreater(expected_low, 0)
+        self.assertGreater(expected_near_expiry, 0)
+
+        response = self.client.get(reverse('crm_products:stock_list'))
+        self.assertEqual(response.context['low_count'], expected_low)
+        self.assertEqual(response.context['exp_count'], expected_near_expiry)
+        self.assertEqual(StockPosition.objects.filter(is_low_stock=True).count(), expected_low)
 
-# Create your tests here.
+        response = self.client.get(reverse('crm_products:stock_list'), {'alert': 'low'})
+        self.assertEqual(response.context['total'], expected_low)
@@ -8,8 +8,9 @@ from django.utils import timezone
 from datetime import timedelta
 from django.urls import reverse
 
-from .models import Division, ProductMaster, BatchManagement, CompanyStock
+from .models import Division, ProductMaster, BatchManagement, CompanyStock, StockPosition
 from .forms import DivisionForm, ProductMasterForm, BatchManagementForm, CompanyStockForm
+from .stock_positions import refresh_batch_statuses
 
 
 # ─────────────────────────────────────────
@@ -18,7 +19,7 @@ from .forms import DivisionForm, ProductMasterForm, BatchManagementForm, Company
 
 @crm_access_required
 def division_list(request):
-    qs = Division.objects.annotate(product_count=Count('products'))
+    qs = Division.objects.annotate(product_count=Count('products')).order_by('name')
     q = request.GET.get('q', '')
     if q:
         qs = qs.filter(Q(name__icontains=q) | Q(manager_name__icontains=q))
@@ -115,12 +116,17 @@ def product_list(request):
 def product_detail(request, pk):
     product = get_object_or_404(ProductMaster, pk=pk)
     batches = product.batches.order_by('expiry_date')
+    counts = batches.aggregate(
+        active=Count('pk', filter=Q(batch_status='active')),
+        near_expiry=Count('pk', filter=Q(batch_status='near_expiry')),
+        expired=Count('pk', filter=Q(batch_status='expired')),
+    )
     return render(request, 'crm/products/product_detail.html', {
         'product': product,
         'batches': batches,
-        'active_batches': batches.filter(batch_status='active').count(),
-        'near_expiry_batches': batches.filter(batch_status='near_expiry').count(),
-        'expired_batches': batches.filter(batch_status='expired').count(),
+        'active_batches': counts['active'],
+        'near_expiry_batches': counts['near_expiry'],
+        'expired_batches': counts['expired'],
     })
 
 
@@ -178,9 +184,7 @@ def batch_list(request):
         qs = qs.filter(product_id=product)
 
     # Update batch statuses before display
-    today = timezone.now().date()
-    for batch in qs:
-        batch.save()  # triggers auto status update
+    refresh_batch_statuses(qs)
 
     paginator = Paginator(qs.order_by('expiry_date'), 20)
     page      = paginator.get_page(request.GET.get('page'))
@@ -256,20 +260,28 @@ def stock_list(request):
     if loc:
         qs = qs.filter(warehouse_location=loc)
 
+    # Alert counts come from the indexed StockPosition table, over the same
+    # search/location filters as the list.
+    counts = StockPosition.objects.filter(stock__in=qs).aggregate(
+        low_count=Count('pk', filter=Q(is_low_stock=True)),
+        exp_count=Count('pk', filter=Q(batch_status='near_expiry')),
+    )
+
+    if alert == 'low':
+        qs = qs.filter(position__is_low_stock=True)
+    elif alert == 'near_expiry':
+        qs = qs.filter(position__batch_status='near_expiry')
+
     paginator = Paginator(qs, 20)
     page      = paginator.get_page(request.GET.get('page'))
 
-    # Filter by alert AFTER pagination fetch (using properties)
-    all_stock  = list(qs)
-    low_count  = sum(1 for s in all_stock if s.is_low_stock)
-    exp_count  = sum(1 for s in all_stock if s.is_near_expiry)
-
     return render(request, 'crm/products/stock_list.html', {
         'page_obj':  page,
         'query':     q,
         'total':     qs.count(),
-        'low_count': low_count,
-        'exp_count': exp_count,
+        'low_count': counts['low_count'],
+        'exp_count': counts['exp_count'],
+        'alert':     alert,
         'locations': CompanyStock.WAREHOUSE_CHOICES,
         'export_url': reverse('crm_data_tools:export', args=['company_stock']),
         'sample_url': reverse('crm_data_tools:sample', args=['company_stock']),
@@ -18,7 +18,10 @@ from .forms import RegionForm, AreaForm, MedicalRepresentativeForm
 
 @crm_access_required
 def region_list(request):
-    qs = Region.objects.prefetch_related('division').annotate(area_count=Count('areas'))
+    qs = Region.objects.prefetch_related('division').annotate(
+        area_count=Count('areas', distinct=True),
+        mr_count=Count('mrs', distinct=True),
+    ).order_by('region_name')
     q = request.GET.get('q', '')
     div = request.GET.get('division', '')
     if q:
@@ -73,7 +76,10 @@ def region_delete(request, pk):
 
 @crm_access_required
 def area_list(request):
-    qs = Area.objects.prefetch_related('region__division','region').annotate(mr_count=Count('mrs'))
+    qs = Area.objects.prefetch_related('region__division','region').annotate(
+        mr_count=Count('mrs', distinct=True),
+        doctor_count=Count('doctors', distinct=True),
+    ).order_by('area_name')
     q = request.GET.get('q', '')
     region = request.GET.get('region', '')
     if q:
@@ -128,7 +134,9 @@ def area_delete(request, pk):
 
 @crm_access_required
 def mr_list(request):
-    qs = MedicalRepresentative.objects.select_related('division', 'region', 'area')
+    qs = MedicalRepresentative.objects.select_related('division', 'region', 'area').annotate(
+        visit_count=Count('doctor_visits'),
+    ).order_by('name')
     q      = request.GET.get('q', '')
     status = request.GET.get('status', '')
     region = request.GET.get('region', '')
@@ -5,7 +5,7 @@ from django.contrib.auth.decorators import login_required
 from core.auth_utils import crm_access_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.urls import reverse
 
 from crm_stores.models import MedicalStore, StoreProductTracking
@@ -14,7 +14,9 @@ from crm_stores.forms import MedicalStoreForm, StoreProductTrackingForm
 
 @crm_access_required
 def store_list(request):
-    qs = MedicalStore.objects.select_related('area', 'distributor')
+    qs = MedicalStore.objects.select_related('area', 'distributor').annotate(
+        linked_doctor_count=Count('linked_doctors'),
+    ).order_by('store_name')
     q      = request.GET.get('q', '')
     status = request.GET.get('status', '')
     area   = request.GET.get('area', '')